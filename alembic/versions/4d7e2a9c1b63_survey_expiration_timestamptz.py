@@ -0,0 +1,48 @@
+"""survey expiration timestamptz
+
+Revision ID: 4d7e2a9c1b63
+Revises: 8b3f1c2d9e47
+Create Date: 2026-10-18 19:48:03.512764
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4d7e2a9c1b63"
+down_revision = "8b3f1c2d9e47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "surveys",
+        "expiration",
+        existing_type=sa.String(),
+        type_=sa.DateTime(timezone=True),
+        existing_nullable=False,
+        postgresql_using="expiration::timestamptz",
+    )
+    op.create_index(
+        "ix_surveys_symbol_size_expiration",
+        "surveys",
+        ["symbol", "size", "expiration"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_surveys_symbol_size_expiration", table_name="surveys")
+    op.alter_column(
+        "surveys",
+        "expiration",
+        existing_type=sa.DateTime(timezone=True),
+        type_=sa.String(),
+        existing_nullable=False,
+        postgresql_using=(
+            "to_char(expiration AT TIME ZONE 'UTC', "
+            '\'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"\')'
+        ),
+    )
@@ -7,8 +7,30 @@ print(":rocket: Paul's SpaceTraders.io client :moon:")
 async def gather_functions(funcs):
     import asyncio
 
+    from src.api import request_metrics
+    from src.api.metrics import report_metrics
+    from src.settings import config
+
+    interval = config.getfloat("api", "metrics_interval", fallback=0)
+    reporter = None
+    if interval:
+        reporter = asyncio.create_task(
+            report_metrics(
+                request_metrics.stats,
+                interval=interval,
+                path=config.get("api", "metrics_file", fallback="") or None,
+            )
+        )
     tasks = [asyncio.create_task(f) for f in funcs]
-    return await asyncio.gather(*tasks)
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        from src.db.writer import writer
+
+        await writer.close()
+        if reporter:
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
 
 
 def run(funcs):
@@ -17,6 +39,26 @@ def run(funcs):
     return asyncio.run(gather_functions(funcs))
 
 
+def run_fleet(make_job, ship_symbols, workers=1):
+    """
+    Run each ship's action as a job, e.g. MiningJob for MiningLoop, through
+    the fleet scheduler, sharded across `workers` processes if there is
+    more than one.
+    """
+    if workers > 1:
+        from src.logic.sharding import FleetShards
+
+        return FleetShards(make_job, processes=workers).run(list(ship_symbols))
+
+    from src.logic.scheduler import FleetScheduler, register_gauges
+
+    scheduler = FleetScheduler()
+    register_gauges(scheduler)
+    for symbol in ship_symbols:
+        scheduler.add(make_job(ship_symbol=symbol))
+    return run([scheduler.run()])
+
+
 @click.group()
 def cli_group():
     """
@@ -79,7 +121,7 @@ def contracts(depth):
 
     from src.schemas.contracts import ContractManager
 
-    result = ContractManager.all()
+    result = run([ContractManager.all()])[0]
     for contract in result.contracts:
         pprint(contract, max_depth=int(depth))
 
@@ -166,7 +208,7 @@ def ships(content):
 
     console = Console()
 
-    result = ShipsManager.all()
+    result = run([ShipsManager.all()])[0]
     if content == "cargo":
         for ship in result.ships:
             console.rule(f"{ship.symbol}")
@@ -190,7 +232,7 @@ def system_waypoints(symbol, depth):
 
     from src.schemas.systems import SystemWaypoints
 
-    result = SystemWaypoints.get(symbol=symbol)
+    result = run([SystemWaypoints.get(symbol=symbol)])[0]
     pprint(result, max_depth=int(depth))
 
 
@@ -236,9 +278,13 @@ def buy_ship(ship, waypoint, depth):
     """
     from rich.pretty import pprint
 
-    from src.schemas.ships import ShipsManager
+    from src.db.models.ships import ShipAssignmentModel
+    from src.schemas.ships import Ship, ShipsManager
 
-    result = run([ShipsManager.buy_ship(ship_type=ship, waypoint_symbol=waypoint)])
+    result = run([ShipsManager.buy_ship(ship_type=ship, waypoint_symbol=waypoint)])[0]
+    if isinstance(result, Ship):
+        # Idle, so the next `work` process with an idle action takes it on
+        ShipAssignmentModel.register_idle(result.symbol)
     pprint(result, max_depth=int(depth))
 
 
@@ -275,16 +321,20 @@ def contract_mining(ship, id, mine):
 @click.option(
     "--surveys", default=False, help="Try and use surveys stored in the DB to help"
 )
-def mining(ship, dest, surveys):
+@click.option("--workers", "-w", help="Processes to share the ships out", default=1)
+def mining(ship, dest, surveys, workers):
     """
     Set ships on the mining loop
     """
-    from src.logic.main import mining_loop
+    from functools import partial
 
-    funcs = [
-        mining_loop(ship_symbol=s, destination=dest, with_surveys=surveys) for s in ship
-    ]
-    run(funcs)
+    from src.logic.jobs import MiningJob
+
+    run_fleet(
+        partial(MiningJob, destination=dest, with_surveys=surveys),
+        ship,
+        workers=workers,
+    )
 
 
 @click.command()
@@ -325,20 +375,20 @@ def jump_ship(ship, dest):
 @click.command()
 @click.option("--ship", "-s", help="ship symbol", multiple=True, required=True)
 @click.option("--dest", "-d", help="destination", required=True)
-def survey(ship, dest):
+@click.option("--workers", "-w", help="Processes to share the ships out", default=1)
+def survey(ship, dest, workers):
     """
     Set ships to navigate to a destination and survey it endlessly
     """
-    from src.logic.actions.surveys import SurveyDestinationAction
+    from functools import partial
 
-    funcs = [
-        SurveyDestinationAction(
-            ship_symbol=s, destination=dest, clean_up_old_surveys=True
-        ).process()
-        for s in ship
-    ]
+    from src.logic.jobs import SurveyJob
 
-    run(funcs)
+    run_fleet(
+        partial(SurveyJob, destination=dest, clean_up_old_surveys=True),
+        ship,
+        workers=workers,
+    )
 
 
 @click.command()
@@ -354,6 +404,138 @@ def explore(ship):
     run(funcs)
 
 
+@click.command()
+@click.option("--ship", "-s", help="ship symbol", multiple=True, required=True)
+@click.option("--action", "-a", type=click.Choice(["mining", "survey"]), required=True)
+@click.option("--dest", "-d", help="destination", required=True)
+@click.option(
+    "--surveys", default=False, help="Try and use surveys stored in the DB to help"
+)
+def assign(ship, action, dest, surveys):
+    """
+    Give ships an action for `work` processes to carry out
+    """
+    from src.db.models.ships import ShipAssignmentModel
+
+    parameters = {"destination": dest}
+    if action == "mining":
+        parameters["with_surveys"] = surveys
+    elif action == "survey":
+        parameters["clean_up_old_surveys"] = True
+    for s in ship:
+        ShipAssignmentModel.assign(s, action=action, parameters=parameters)
+
+
+@click.command()
+@click.option("--ship", "-s", help="ship symbol", multiple=True, required=True)
+def idle(ship):
+    """
+    Put ships in IDLE, whoever is running them lets them go
+    """
+    from src.db.models.ships import ShipAssignmentModel
+
+    for s in ship:
+        ShipAssignmentModel.assign(s, action=None, parameters={})
+
+
+@click.command()
+def assignments():
+    """
+    What every ship has been assigned and who is working it
+    """
+    from rich.console import Console
+    from rich.table import Table
+
+    from src.db.models.ships import ShipAssignmentModel
+
+    table = Table(title="Ship assignments")
+    for column in ["ship", "status", "action", "parameters", "worker", "lease expires"]:
+        table.add_column(column)
+    for a in ShipAssignmentModel.all():
+        table.add_row(
+            a.ship_symbol,
+            a.status,
+            a.action or "",
+            str(a.parameters or ""),
+            a.worker or "",
+            str(a.lease_expires or ""),
+        )
+    Console().print(table)
+
+
+@click.command()
+@click.option(
+    "--action",
+    "-a",
+    type=click.Choice(["mining", "survey"]),
+    multiple=True,
+    help="Actions to claim ships for, all of them if not given",
+)
+@click.option("--max-ships", "-m", help="Most ships to run at once", default=100)
+@click.option(
+    "--idle-action",
+    type=click.Choice(["mining", "survey"]),
+    help="Also claim idle ships and give them this action",
+)
+@click.option("--dest", "-d", help="Destination for idle ships' action")
+def work(action, max_ships, idle_action, dest):
+    """
+    Claim assigned ships from the database and run them, until stopped
+    """
+    from src.logic.assignments import JOBS, AssignmentWorker
+
+    if idle_action and not dest:
+        raise click.UsageError("--idle-action needs a --dest")
+    worker = AssignmentWorker(
+        actions=list(action) or list(JOBS),
+        max_ships=max_ships,
+        idle_action=idle_action,
+        idle_parameters={"destination": dest} if idle_action else None,
+    )
+    run([worker.run()])
+
+
+@click.command()
+@click.option(
+    "--dest", "-d", help="Where to mine, the nearest asteroid field if not given"
+)
+@click.option(
+    "--interval", "-i", help="Seconds between summaries", default=60.0, type=float
+)
+def loop(dest, interval):
+    """
+    Run the whole fleet, every ship on the job for its role
+    """
+    from rich.console import Console
+
+    from src.logic.supervisor import FleetSupervisor
+
+    supervisor = FleetSupervisor(console=Console(), interval=interval, destination=dest)
+    run([supervisor.run()])
+
+
+@click.command()
+@click.option("--dest", "-d", help="Waypoint the ships look up", required=True)
+@click.option("--ships", "-n", help="Ships querying at once", default=50)
+@click.option("--rounds", "-r", help="Lookups per ship", default=20)
+def bench_db(dest, ships, rounds):
+    """
+    Measure event loop lag while ships query the database, sync against async
+    """
+    from src.logic.benchmarks import loop_lag
+    from src.support.tables import yellow
+
+    for use_async in (False, True):
+        lag = run([loop_lag(dest, ships=ships, rounds=rounds, use_async=use_async)])[0]
+        print(
+            f"{'async' if use_async else 'sync'}: {lag.queries} queries from "
+            f"{lag.ships} ships in {lag.seconds:.2f}s, loop lag "
+            f"p50 {yellow(f'{lag.percentile(0.5) * 1000:.1f}ms')} "
+            f"p99 {yellow(f'{lag.percentile(0.99) * 1000:.1f}ms')} "
+            f"max {yellow(f'{lag.max * 1000:.1f}ms')}"
+        )
+
+
 cli_group.add_command(register)
 cli_group.add_command(me)
 cli_group.add_command(contracts)
@@ -373,6 +555,12 @@ cli_group.add_command(survey)
 cli_group.add_command(jump_gate)
 cli_group.add_command(jump_ship)
 cli_group.add_command(explore)
+cli_group.add_command(assign)
+cli_group.add_command(idle)
+cli_group.add_command(assignments)
+cli_group.add_command(work)
+cli_group.add_command(loop)
+cli_group.add_command(bench_db)
 
 if __name__ == "__main__":
     cli_group()
@@ -1,2 +1,4 @@
 from .paths import PATHS  # noqa
+from .scheduler import Priority  # noqa
 from .client import *  # noqa
+from .pagination import Paginator, sync_paginate  # noqa
@@ -0,0 +1,155 @@
+import threading
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from .cache import cache_rule
+from .concurrency import AdaptiveLimit
+from .limiter import TokenBucket
+from .scheduler import Priority, RequestScheduler
+from .transport import ApiRequest
+
+# The agent whose token is `[api] key`, until we know its symbol
+DEFAULT_AGENT = ""
+
+# The segment after each of these is owned by a single agent
+OWNED_PATH_SEGMENTS = ("ships", "contracts")
+
+
+class AgentBudget:
+    """
+    One agent's token with its own rate budget and connections.
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        token: str,
+        limiter: TokenBucket,
+        concurrency: AdaptiveLimit,
+        client: httpx.Client,
+        async_client: httpx.AsyncClient,
+    ) -> None:
+        self.symbol = symbol
+        self.token = token
+        self.limiter = limiter
+        self.scheduler = RequestScheduler(limiter=limiter)
+        self.concurrency = concurrency
+        self.client = client
+        self.async_client = async_client
+
+    def load(self) -> float:
+        """
+        How far behind this agent's budget is, in tokens. Lower is better.
+        """
+        queued = sum(self.scheduler.queue_depth(p) for p in Priority)
+        queued += self.concurrency.queue_depth
+        return queued - self.limiter.available()
+
+
+class AgentPool:
+    """
+    Every agent we can send requests as, and which of them owns what.
+
+    The rate limit is per token, so each agent gets its own limiter,
+    scheduler, concurrency limit and httpx clients. Requests about a ship
+    or contract go to its owner; requests anyone may make go to the least
+    busy agent, unless what comes back depends on who asks.
+    """
+
+    def __init__(
+        self,
+        make_limiter: Callable[[], TokenBucket],
+        make_concurrency: Callable[[], AdaptiveLimit],
+        make_client: Callable[[], httpx.Client],
+        make_async_client: Callable[[], httpx.AsyncClient],
+    ) -> None:
+        self.make_limiter = make_limiter
+        self.make_concurrency = make_concurrency
+        self.make_client = make_client
+        self.make_async_client = make_async_client
+        self.agents: Dict[str, AgentBudget] = {}
+        # Ship symbols and contract ids to the agent that owns them
+        self.owners: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, symbol: str, token: str) -> AgentBudget:
+        with self._lock:
+            if symbol not in self.agents:
+                self.agents[symbol] = AgentBudget(
+                    symbol=symbol,
+                    token=token,
+                    limiter=self.make_limiter(),
+                    concurrency=self.make_concurrency(),
+                    client=self.make_client(),
+                    async_client=self.make_async_client(),
+                )
+            return self.agents[symbol]
+
+    @property
+    def default(self) -> AgentBudget:
+        return self.agents.get(DEFAULT_AGENT) or next(iter(self.agents.values()))
+
+    def share_limiters(self, limiters: Dict[str, TokenBucket]) -> None:
+        """
+        Swap in rate limiters shared with other processes, by agent symbol.
+        """
+        with self._lock:
+            for symbol, limiter in limiters.items():
+                if symbol in self.agents:
+                    self.agents[symbol].limiter = limiter
+                    self.agents[symbol].scheduler.limiter = limiter
+
+    def assign(self, key: str, agent: str) -> None:
+        """
+        Route requests about this ship or contract to `agent`.
+        """
+        self.owners[key] = agent
+
+    def budget(self, agent: Optional[str]) -> AgentBudget:
+        if agent is None:
+            return self.default
+        return self.agents.get(agent, self.default)
+
+    def owner(self, key: str) -> Optional[str]:
+        """
+        The agent that owns a ship or contract. Ship symbols start with
+        their agent's symbol, so those are found even before they are assigned.
+        """
+        if key in self.owners:
+            return self.owners[key]
+        prefix = key.rsplit("-", 1)[0]
+        if prefix in self.agents:
+            return prefix
+        return None
+
+    def route(self, request: ApiRequest) -> AgentBudget:
+        """
+        The agent to send the request as. Remembered on the request so
+        every stage and every retry agrees.
+        """
+        if "agent" in request.context:
+            return request.context["agent"]
+        budget = self._route(request)
+        request.context["agent"] = budget
+        return budget
+
+    def _route(self, request: ApiRequest) -> AgentBudget:
+        if request.agent is not None:
+            return self.budget(request.agent)
+        parts = httpx.URL(request.path).path.split("/")
+        for i, part in enumerate(parts[:-1]):
+            if part in OWNED_PATH_SEGMENTS:
+                return self.budget(self.owner(parts[i + 1]))
+        if request.data and "shipSymbol" in request.data:
+            return self.budget(self.owner(request.data["shipSymbol"]))
+        if "/my/" in request.path or not request.authenticated:
+            return self.default
+        rule = cache_rule(request.path)
+        if rule is not None and rule.per_agent:
+            # A market only shows prices to an agent with a ship there, so
+            # ask as the same agent every time rather than whoever is free
+            return self.default
+        # Anyone can look at systems and waypoints
+        with self._lock:
+            return min(self.agents.values(), key=lambda a: a.load())
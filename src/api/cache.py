@@ -0,0 +1,203 @@
+import re
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from time import monotonic
+from typing import Any, Dict, List, Optional, Set
+
+import attrs
+
+from .paths import PATHS
+
+DAY = 24 * 60 * 60
+
+
+@attrs.define
+class CacheRule:
+    """
+    A class of endpoint and how long its responses may be kept.
+    A ttl of 0 means never cache. Responses that depend on who is asking
+    are kept `per_agent`, the rest are shared by every agent. A response
+    whose data is missing the `complete` field is not kept at all.
+    """
+
+    name: str
+    pattern: re.Pattern
+    ttl: float
+    per_agent: bool = False
+    complete: Optional[str] = None
+
+
+# First match wins, anything that matches nothing is not cached.
+CACHE_RULES: List[CacheRule] = [
+    # Ship, agent and contract state changes with every action
+    CacheRule("ships", re.compile(r"/my/ships(/.*)?$"), 0),
+    CacheRule("agent", re.compile(r"/my/agent$"), 0),
+    CacheRule("contracts", re.compile(r"/my/contracts(/.*)?$"), 0),
+    # Jump gates never change
+    CacheRule("jump_gate", re.compile(r"/waypoints/[^/]+/jump-gate$"), 7 * DAY),
+    # Prices move, but not that fast. Only an agent with a ship there
+    # sees the prices, so each agent gets its own copy, and one without
+    # them would still be served once one of its ships has arrived.
+    CacheRule(
+        "market", re.compile(r"/waypoints/[^/]+/market$"), 3 * 60, True, "tradeGoods"
+    ),
+    CacheRule(
+        "shipyard", re.compile(r"/waypoints/[^/]+/shipyard$"), 10 * 60, True, "ships"
+    ),
+    CacheRule("waypoint", re.compile(r"/systems/[^/]+/waypoints/[^/]+$"), DAY),
+    CacheRule("system_waypoints", re.compile(r"/systems/[^/]+/waypoints$"), DAY),
+    CacheRule("system", re.compile(r"/systems/[^/]+$"), 7 * DAY),
+    CacheRule("factions", re.compile(r"/factions(/.*)?$"), DAY),
+]
+
+
+def base_path(path: str) -> str:
+    return path.split("?")[0]
+
+
+def cache_rule(path: str) -> Optional[CacheRule]:
+    path = base_path(path)
+    for rule in CACHE_RULES:
+        if rule.pattern.search(path):
+            return rule
+    return None
+
+
+@attrs.define
+class CacheEntry:
+    value: Any
+    expires_at: float
+    size: int
+
+
+@attrs.define
+class CacheStats:
+    """
+    Counters for the response cache.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    # Entries dropped to stay under the memory bound
+    evictions: int = 0
+    # Entries dropped because their ttl ran out
+    expirations: int = 0
+    # Entries dropped because a POST changed them
+    invalidations: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of API response data, keyed by path.
+
+    How long a response is kept, and whether it is kept for each agent
+    or shared between them, depends on the class of endpoint it came
+    from, see CACHE_RULES. Endpoints about our own agent, ships and
+    contracts are never kept. The cache is bounded by the total size
+    of the response bodies it holds. Callers always get their own copy
+    as the schema `build` methods change the data they are given.
+    """
+
+    def __init__(self, max_size: int = 32 * 1024 * 1024) -> None:
+        self.max_size = max_size
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        # Every key held for a path, whatever its page or agent
+        self.keys: Dict[str, Set[str]] = {}
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path: str, rule: CacheRule, agent: Optional[str]) -> str:
+        return f"{path} {agent}" if rule.per_agent else path
+
+    def get(self, path: str, agent: Optional[str] = None) -> Optional[Any]:
+        rule = cache_rule(path)
+        if rule is None or rule.ttl <= 0:
+            return None
+        key = self.key(path, rule, agent)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if entry.expires_at < monotonic():
+                self._drop(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return deepcopy(entry.value)
+
+    def set(
+        self, path: str, value: Any, size: int, agent: Optional[str] = None
+    ) -> None:
+        rule = cache_rule(path)
+        if rule is None or rule.ttl <= 0 or size > self.max_size:
+            return
+        if rule.complete and rule.complete not in (value.get("data") or {}):
+            return
+        key = self.key(path, rule, agent)
+        with self._lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = CacheEntry(
+                value=deepcopy(value), expires_at=monotonic() + rule.ttl, size=size
+            )
+            self.keys.setdefault(base_path(path), set()).add(key)
+            self.stats.size += size
+            while self.stats.size > self.max_size:
+                oldest = next(iter(self.entries))
+                self._drop(oldest)
+                self.stats.evictions += 1
+            self.stats.entries = len(self.entries)
+
+    def delete(self, path: str) -> None:
+        """
+        Drop everything kept for a path: every page of it and every
+        agent's copy.
+        """
+        with self._lock:
+            for key in list(self.keys.get(base_path(path), ())):
+                self._drop(key)
+                self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.keys.clear()
+            self.stats.entries = 0
+            self.stats.size = 0
+
+    def invalidate_after_post(
+        self, path: str, data: Optional[Dict], result: Dict
+    ) -> None:
+        """
+        Drop anything a successful POST has made stale.
+        """
+        transaction = result.get("transaction")
+        if transaction and transaction.get("waypointSymbol"):
+            # Selling, buying and refueling move market prices
+            self.delete(PATHS.market(symbol=transaction["waypointSymbol"]))
+        if path == PATHS.MY_SHIPS and data and data.get("waypointSymbol"):
+            # Buying a ship changes what the shipyard has for sale
+            self.delete(PATHS.shipyard(symbol=data["waypointSymbol"]))
+        waypoint = result.get("waypoint")
+        if waypoint and waypoint.get("symbol"):
+            # Charting changes the waypoint
+            self.delete(PATHS.waypoint(symbol=waypoint["symbol"]))
+            self.delete(PATHS.system_waypoints(symbol=waypoint["symbol"]))
+
+    def _drop(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        path = base_path(key.split(" ")[0])
+        keys = self.keys.get(path)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys[path]
+        self.stats.size -= entry.size
+        self.stats.entries = len(self.entries)
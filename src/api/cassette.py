@@ -0,0 +1,130 @@
+import asyncio
+import atexit
+import gzip
+import json
+import threading
+from collections import defaultdict, deque
+from time import sleep
+from typing import Any, Deque, Dict, Optional
+
+import attrs
+import httpx
+
+# Only these response headers are worth keeping, the rest is noise
+RECORDED_HEADERS = ("date", "x-ratelimit-")
+
+
+def request_key(method: str, path: str, data: Optional[Dict]) -> str:
+    """
+    What a replayed request is matched on: method, path and query, and body.
+    The host is left out so a cassette recorded against the mock replays anywhere.
+    """
+    url = httpx.URL(path)
+    target = url.raw_path.decode()
+    body = json.dumps(data, sort_keys=True) if data else ""
+    return f"{method} {target} {body}"
+
+
+@attrs.define
+class Interaction:
+    """
+    One recorded request and the response it got.
+    """
+
+    method: str
+    path: str
+    data: Optional[Dict[str, Any]]
+    status_code: int
+    body: Dict[str, Any]
+    headers: Dict[str, str]
+    elapsed: float
+
+    @property
+    def key(self) -> str:
+        return request_key(self.method, self.path, self.data)
+
+
+class Cassette:
+    """
+    Recorded interactions on disk, as gzipped JSON lines.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Optional[gzip.GzipFile] = None
+        self._lock = threading.Lock()
+
+    def record(self, interaction: Interaction) -> None:
+        line = json.dumps(attrs.asdict(interaction), separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "wb")
+                atexit.register(self.close)
+            self._file.write(line.encode() + b"\n")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def load(self) -> Dict[str, Deque[Interaction]]:
+        """
+        Every interaction, queued per request in the order they were recorded.
+        """
+        interactions: Dict[str, Deque[Interaction]] = defaultdict(deque)
+        with gzip.open(self.path, "rb") as f:
+            try:
+                for line in f:
+                    interaction = Interaction(**json.loads(line))
+                    interactions[interaction.key].append(interaction)
+            except EOFError:
+                # The recording process was killed before it closed the file
+                pass
+        return interactions
+
+
+class Replay:
+    """
+    Serves a cassette back in place of the network.
+
+    Identical requests get their responses in the order they were recorded,
+    after the recorded latency multiplied by `latency_scale`
+    (0 to measure the client on its own).
+    """
+
+    def __init__(self, cassette: Cassette, latency_scale: float = 1.0) -> None:
+        self.interactions = cassette.load()
+        self.latency_scale = latency_scale
+        self.missed = 0
+        self._lock = threading.Lock()
+
+    def _next(self, request: httpx.Request) -> Optional[Interaction]:
+        data = json.loads(request.content) if request.content else None
+        key = request_key(request.method, str(request.url), data)
+        with self._lock:
+            queued = self.interactions.get(key)
+            if queued:
+                return queued.popleft()
+            self.missed += 1
+            return None
+
+    def _response(self, interaction: Optional[Interaction]) -> httpx.Response:
+        if interaction is None:
+            error = {"message": "No recorded response for this request", "code": 404}
+            return httpx.Response(404, json={"error": error})
+        return httpx.Response(
+            interaction.status_code, json=interaction.body, headers=interaction.headers
+        )
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._next(request)
+        if interaction and self.latency_scale:
+            sleep(interaction.elapsed * self.latency_scale)
+        return self._response(interaction)
+
+    async def respond_async(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._next(request)
+        if interaction and self.latency_scale:
+            await asyncio.sleep(interaction.elapsed * self.latency_scale)
+        return self._response(interaction)
@@ -1,112 +1,319 @@
-import asyncio
-from time import sleep
-from typing import Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import httpx
-from rich.pretty import pprint
 
 from src.schemas.errors import Error
 from src.settings import config
+from src.support.datetime import server_clock
 
-headers = {"Authorization": f"Bearer {config.get('api', 'key')}"}
+from .agents import DEFAULT_AGENT, AgentPool
+from .cache import ResponseCache, cache_rule
+from .cassette import Cassette, Replay
+from .coalesce import SingleFlight
+from .concurrency import AdaptiveLimit
+from .cooldowns import CooldownRegistry
+from .limiter import TokenBucket
+from .metrics import GaugeValues
+from .middleware import (
+    AuthMiddleware,
+    CacheMiddleware,
+    ClockMiddleware,
+    ConcurrencyMiddleware,
+    CooldownMiddleware,
+    MetricsMiddleware,
+    RateLimitMiddleware,
+    RecordMiddleware,
+    RetryMiddleware,
+)
+from .retry import RetryEngine, RetryPolicy
+from .scheduler import Priority
+from .transport import ApiRequest, ApiResponse, Transport
 
-client = httpx.Client(headers=headers)
-async_client = httpx.AsyncClient(headers=headers)
-# Mostly for making registration calls
+# Every request helper retries through here, and pauses while the API is down.
+retry_engine = RetryEngine(
+    policy=RetryPolicy(
+        max_attempts=config.getint("api", "retry_max_attempts", fallback=8),
+        deadline=config.getfloat("api", "retry_deadline", fallback=300.0),
+    )
+)
+# Identical GETs that are in flight at the same time are only sent once.
+single_flight = SingleFlight()
+# GET responses are kept here for as long as their endpoint class allows.
+response_cache = ResponseCache(
+    max_size=config.getint("api", "cache_max_size", fallback=32 * 1024 * 1024)
+)
+
+# With a cassette, responses are either recorded to it or replayed from it
+cassette_path = config.get("api", "cassette", fallback="")
+cassette_mode = config.get("api", "cassette_mode", fallback="record")
+replay: Optional[Replay] = None
+if cassette_path and cassette_mode == "replay":
+    replay = Replay(
+        Cassette(cassette_path),
+        latency_scale=config.getfloat("api", "replay_latency_scale", fallback=1.0),
+    )
+
+
+def _make_limiter() -> TokenBucket:
+    return TokenBucket(
+        rate=config.getfloat("api", "rate_limit_per_second", fallback=2.0),
+        burst=config.getint("api", "rate_limit_burst", fallback=10),
+    )
+
+
+max_concurrency = config.getint("api", "max_concurrency", fallback=32)
+
+
+def _make_concurrency() -> AdaptiveLimit:
+    return AdaptiveLimit(
+        initial=config.getint("api", "initial_concurrency", fallback=4),
+        maximum=max_concurrency,
+    )
+
+
+# One connection per request we may have in flight, kept open between requests
+connection_limits = httpx.Limits(
+    max_connections=max_concurrency,
+    max_keepalive_connections=max_concurrency,
+    keepalive_expiry=config.getfloat("api", "keepalive_expiry", fallback=30.0),
+)
+
+
+def _make_client() -> httpx.Client:
+    if replay:
+        return httpx.Client(transport=httpx.MockTransport(replay.respond))
+    return httpx.Client(limits=connection_limits)
+
+
+def _make_async_client() -> httpx.AsyncClient:
+    if replay:
+        return httpx.AsyncClient(transport=httpx.MockTransport(replay.respond_async))
+    return httpx.AsyncClient(limits=connection_limits)
+
+
+# Every agent we send requests as, each with its own rate limiter, scheduler
+# and connections. `[api] key` is the default, more can be added under `[agents]`.
+agent_pool = AgentPool(
+    make_limiter=_make_limiter,
+    make_concurrency=_make_concurrency,
+    make_client=_make_client,
+    make_async_client=_make_async_client,
+)
+agent_pool.add(DEFAULT_AGENT, config.get("api", "key"))
+if config.has_section("agents"):
+    for symbol, token in config.items("agents"):
+        # configparser lower cases keys, agent symbols are upper case
+        agent_pool.add(symbol.upper(), token)
+
+# The default agent's rate limiter, scheduler and clients.
+rate_limiter = agent_pool.default.limiter
+scheduler = agent_pool.default.scheduler
+client = agent_pool.default.client
+async_client = agent_pool.default.async_client
+# For calls that skip the request pipeline, like the server status
 bare_client = httpx.Client()
 
+request_metrics = MetricsMiddleware()
+# When each ship's reactor is ready again
+cooldowns = CooldownRegistry(clock=server_clock)
+# Every request helper below goes through this pipeline, in this order.
+pipeline = [
+    AuthMiddleware(pool=agent_pool),
+    CacheMiddleware(cache=response_cache),
+    # Before the rate limiter, so a ship cooling down does not hold a token
+    CooldownMiddleware(registry=cooldowns),
+    RetryMiddleware(engine=retry_engine),
+    RateLimitMiddleware(pool=agent_pool),
+    ConcurrencyMiddleware(pool=agent_pool),
+    ClockMiddleware(clock=server_clock),
+    request_metrics,
+]
+if cassette_path and cassette_mode == "record":
+    pipeline.append(RecordMiddleware(Cassette(cassette_path)))
+transport = Transport(middleware=pipeline, client=client, async_client=async_client)
+# Stages can be switched off by name, to benchmark the others on their own
+transport.disable(
+    *[
+        name.strip()
+        for name in config.get("api", "disable_middleware", fallback="").split(",")
+        if name.strip()
+    ]
+)
+
+
+def _per_agent(read) -> GaugeValues:
+    return [
+        ({"agent": a.symbol or "default"}, read(a)) for a in agent_pool.agents.values()
+    ]
+
+
+request_metrics.stats.gauge(
+    "concurrency_limit",
+    "Async requests each agent may have in flight",
+    lambda: _per_agent(lambda a: a.concurrency.limit),
+)
+request_metrics.stats.gauge(
+    "requests_in_flight",
+    "Async requests each agent has in flight",
+    lambda: _per_agent(lambda a: a.concurrency.in_flight),
+)
+request_metrics.stats.gauge(
+    "concurrency_queue_depth",
+    "Async requests waiting for a free slot",
+    lambda: _per_agent(lambda a: a.concurrency.queue_depth),
+)
+request_metrics.stats.gauge(
+    "scheduler_queue_depth",
+    "Async requests waiting for a rate limiter token",
+    lambda: [
+        (
+            {"agent": a.symbol or "default", "priority": p.name},
+            a.scheduler.queue_depth(p),
+        )
+        for a in agent_pool.agents.values()
+        for p in Priority
+    ],
+)
+request_metrics.stats.gauge(
+    "ships_cooling_down",
+    "Ships whose reactor is cooling down",
+    lambda: [({}, cooldowns.cooling_down())],
+)
+request_metrics.stats.gauge(
+    "cooldown_requests_held",
+    "Requests held back until their ship's cooldown ended",
+    lambda: [({}, cooldowns.stats.held)],
+)
+
+
+def _result(response: Union[ApiResponse, Error]) -> Union[Any, Error]:
+    match response:
+        case Error():
+            return response
+        case _:
+            return response.result()
 
-def sync_get(*, path: str) -> dict | Error:
-    try:
-        response = client.get(path)
-    except httpx.HTTPError as exc:
-        pprint(f"HTTP Exception for {exc.request.url} - {exc}")
-        sleep(1)
-        return sync_get(path=path)
-    api_data = response.json()
-    if api_data.get("error"):
-        error = Error(**api_data["error"])
-        if error.code == 429 and error.data:
-            # We've hit a rate limit, sleep a bit and call the API again
-            sleep(error.data["retryAfter"])
-            return sync_get(path=path)
-        # Return other errors
-        return error
-    else:
-        api_data = api_data["data"]
-        return api_data
-
-
-async def safe_get(*, path: str) -> Union[Dict, Error]:
+
+def _page(response: Union[ApiResponse, Error]) -> Union[Tuple[List[Dict], Dict], Error]:
+    match response:
+        case Error():
+            return response
+        case _:
+            result = response.result()
+            if isinstance(result, Error):
+                return result
+            return result, response.body["meta"]
+
+
+def sync_get(*, path: str, agent: Optional[str] = None) -> dict | Error:
+    request = ApiRequest(method="GET", path=path, agent=agent)
+    return _result(transport.send_sync(request))
+
+
+def sync_get_page(
+    *, path: str, page: int, limit: int, agent: Optional[str] = None
+) -> Tuple[List[Dict], Dict] | Error:
     """
-    Like client.get but handles API limits safely by sleeping
-    for the amount of time set by the API before trying again.
+    Like sync_get, but for a single page of a list endpoint.
+    Returns the items and the `meta` of the page.
     """
-    try:
-        response = await async_client.get(path)
-    except httpx.HTTPError as exc:
-        pprint(f"HTTP Exception for {exc.request.url} - {exc}")
-        await asyncio.sleep(1)
-        return await safe_get(path=path)
-    api_data = response.json()
-    if api_data.get("error"):
-        error = Error(**api_data["error"])
-        if error.code == 429 and error.data:
-            # We've hit a rate limit, sleep a bit and call the API again
-            await asyncio.sleep(error.data["retryAfter"])
-            return await safe_get(path=path)
-        # Return other errors
-        return error
-    else:
-        api_data = api_data["data"]
-        return api_data
-
-
-async def safe_post(*, path: str, data: Optional[Dict] = None) -> Union[Dict, Error]:
+    request = ApiRequest(
+        method="GET", path=f"{path}?page={page}&limit={limit}", agent=agent
+    )
+    return _page(transport.send_sync(request))
+
+
+def sync_post(
+    *,
+    path: str,
+    data: Optional[Dict] = None,
+    authenticated: bool = True,
+    agent: Optional[str] = None,
+) -> dict | Error:
+    request = ApiRequest(
+        method="POST", path=path, data=data, authenticated=authenticated, agent=agent
+    )
+    return _result(transport.send_sync(request))
+
+
+async def safe_get(
+    *, path: str, priority: Priority = Priority.MARKET, agent: Optional[str] = None
+) -> Union[Dict, Error]:
     """
-    Like client.post but handles API limits safely
-    by sleeping for the amount of time set by the API before trying again.
+    Like client.get but waits for its turn on the shared rate limiter before sending,
+    and retries through the shared retry engine on network errors, 5xx and 429s.
+    `priority` decides who goes first when requests are queued.
+    Concurrent calls for the same path share a single request,
+    and responses are served from the response cache while they are fresh.
+    It is sent as `agent`, or the agent the agent pool routes it to.
     """
-    try:
-        response = await async_client.post(path, json=data)
-    except httpx.HTTPError as exc:
-        pprint(f"HTTP Exception for {exc.request.url} - {exc}")
-        await asyncio.sleep(1)
-        return await safe_post(path=path, data=data)
-    api_data = response.json()
-    if api_data.get("error"):
-        error = Error(**api_data["error"])
-        if error.code == 429 and error.data:
-            # We've hit a rate limit, sleep a bit and call the API again
-            await asyncio.sleep(error.data["retryAfter"])
-            return await safe_post(path=path, data=data)
-        # Return other errors
-        return error
-    else:
-        api_data = api_data["data"]
-        return api_data
-
-
-async def safe_patch(*, path: str, data: Optional[Dict] = None) -> Union[Dict, Error]:
+    request = ApiRequest(method="GET", path=path, priority=priority, agent=agent)
+    return _result(await _coalesced(request))
+
+
+async def safe_get_page(
+    *,
+    path: str,
+    page: int,
+    limit: int,
+    priority: Priority = Priority.BULK,
+    agent: Optional[str] = None,
+) -> Union[Tuple[List[Dict], Dict], Error]:
     """
-    Like client.patch but handles API limits safely
-    by sleeping for the amount of time set by the API before trying again.
+    Like safe_get, but for a single page of a list endpoint.
+    Returns the items and the `meta` of the page.
     """
-    try:
-        response = await async_client.patch(path, json=data)
-    except httpx.HTTPError as exc:
-        pprint(f"HTTP Exception for {exc.request.url} - {exc}")
-        await asyncio.sleep(1)
-        return await safe_patch(path=path, data=data)
-    api_data = response.json()
-    if api_data.get("error"):
-        error = Error(**api_data["error"])
-        if error.code == 429 and error.data:
-            # We've hit a rate limit, sleep a bit and call the API again
-            await asyncio.sleep(error.data["retryAfter"])
-            return await safe_patch(path=path, data=data)
-        # Return other errors
-        return error
-    else:
-        api_data = api_data["data"]
-        return api_data
+    request = ApiRequest(
+        method="GET",
+        path=f"{path}?page={page}&limit={limit}",
+        priority=priority,
+        agent=agent,
+    )
+    return _page(await _coalesced(request))
+
+
+async def safe_post(
+    *,
+    path: str,
+    data: Optional[Dict] = None,
+    priority: Priority = Priority.SHIP_ACTION,
+    agent: Optional[str] = None,
+) -> Union[Dict, Error]:
+    """
+    Like client.post but waits for its turn on the shared rate limiter before sending,
+    and retries through the shared retry engine on network errors, 5xx and 429s.
+    `priority` decides who goes first when requests are queued.
+    It is sent as `agent`, or the agent the agent pool routes it to.
+    """
+    request = ApiRequest(
+        method="POST", path=path, data=data, priority=priority, agent=agent
+    )
+    return _result(await transport.send(request))
+
+
+async def safe_patch(
+    *,
+    path: str,
+    data: Optional[Dict] = None,
+    priority: Priority = Priority.SHIP_ACTION,
+    agent: Optional[str] = None,
+) -> Union[Dict, Error]:
+    """
+    Like client.patch but waits for its turn on the shared rate limiter before sending,
+    and retries through the shared retry engine on network errors, 5xx and 429s.
+    `priority` decides who goes first when requests are queued.
+    It is sent as `agent`, or the agent the agent pool routes it to.
+    """
+    request = ApiRequest(
+        method="PATCH", path=path, data=data, priority=priority, agent=agent
+    )
+    return _result(await transport.send(request))
+
+
+async def _coalesced(request: ApiRequest) -> Union[ApiResponse, Error]:
+    key = request.path
+    rule = cache_rule(request.path)
+    if request.agent is not None or (rule is not None and rule.per_agent):
+        # The same path asked for by different agents can have different answers
+        key = f"{agent_pool.route(request).symbol} {key}"
+    return await single_flight.do(key, lambda: transport.send(request))
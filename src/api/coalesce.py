@@ -0,0 +1,50 @@
+import asyncio
+from copy import deepcopy
+from typing import Any, Callable, Coroutine, Dict
+
+import attrs
+
+
+@attrs.define
+class SingleFlightStats:
+    """
+    Counters for request coalescing.
+    """
+
+    # Requests that were actually sent
+    sent: int = 0
+    # Requests that shared the result of one already in flight
+    coalesced: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent requests.
+
+    The first caller for a key starts the request, everybody else who asks
+    for the same key while it is in flight waits for that one result.
+    Each caller gets its own copy, as the schema `build` methods
+    pop keys out of the data they are given.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = SingleFlightStats()
+
+    async def do(self, key: str, request: Callable[[], Coroutine[Any, Any, Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        task = self.in_flight.get(key)
+        if task is not None and task.get_loop() is loop:
+            self.stats.coalesced += 1
+        else:
+            self.stats.sent += 1
+            task = loop.create_task(request())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        # Shielded so a caller that gives up does not cancel it for the others
+        result = await asyncio.shield(task)
+        return deepcopy(result)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
@@ -0,0 +1,131 @@
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import Deque, Optional
+
+import attrs
+
+# How much each response moves the recent and the usual latency averages:
+# the recent one follows about the last 10 responses, the usual one 100
+RECENT_WEIGHT = 0.2
+BASELINE_WEIGHT = 0.02
+# Responses seen before latency alone may cut the limit
+LATENCY_WARMUP = 20
+
+
+@attrs.define
+class ConcurrencyStats:
+    """
+    Counters for an adaptive concurrency limit.
+    """
+
+    increases: int = 0
+    decreases: int = 0
+    # Requests that had to wait for a free slot
+    queued: int = 0
+    max_in_flight: int = 0
+
+
+class AdaptiveLimit:
+    """
+    How many async requests may be in flight at once, adjusted by AIMD.
+
+    While responses come back healthy and the limit is being used, it grows
+    by one per round trip's worth of responses. A 429, 5xx or network error
+    cuts it by `backoff`, as does the recent average latency rising above
+    `latency_tolerance` times the usual one: a sustained slow down, not one
+    slow response. It is cut at most once per round trip, so a burst of
+    failures counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        # Moving averages of the latency of the last few responses
+        # and of the usual latency
+        self.recent: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.samples = 0
+        self.last_decrease = 0.0
+        self.stats = ConcurrencyStats()
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+    async def acquire(self) -> None:
+        """
+        Wait for a free slot. Every acquire must be matched by a release.
+        """
+        if self.in_flight < int(self.limit) and not self.queue_depth:
+            self._take()
+            return
+        self.stats.queued += 1
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Given a slot just as we were cancelled
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def record(self, latency: Optional[float], overloaded: bool = False) -> None:
+        """
+        Adjust the limit after a response, `latency` None if there was none.
+        """
+        now = monotonic()
+        if latency is not None:
+            self.samples += 1
+            if self.recent is None or self.baseline is None:
+                self.recent = self.baseline = latency
+            else:
+                self.recent += (latency - self.recent) * RECENT_WEIGHT
+                self.baseline += (latency - self.baseline) * BASELINE_WEIGHT
+        slow = (
+            latency is not None
+            and self.samples >= LATENCY_WARMUP
+            and self.recent is not None
+            and self.baseline is not None
+            and self.recent > self.baseline * self.latency_tolerance
+        )
+        if overloaded or slow:
+            round_trip = max(self.baseline or 0.0, 0.1)
+            if now - self.last_decrease > round_trip:
+                self.last_decrease = now
+                self.limit = max(float(self.minimum), self.limit * self.backoff)
+                self.stats.decreases += 1
+        elif self.in_flight + 1 >= int(self.limit):
+            # Only grow while we are actually using what we have
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.stats.increases += 1
+            self._wake()
+
+    def _take(self) -> None:
+        self.in_flight += 1
+        self.stats.max_in_flight = max(self.stats.max_in_flight, self.in_flight)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.done() or future.get_loop().is_closed():
+                continue
+            self._take()
+            future.set_result(None)
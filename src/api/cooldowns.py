@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from time import sleep
+from typing import Any, Dict, Optional
+
+import attrs
+import httpx
+
+from src.support.datetime import ServerClock
+
+# Ship actions that use the reactor and are refused while it cools down
+COOLDOWN_ACTIONS = ("extract", "survey", "jump", "siphon")
+
+
+@attrs.define
+class CooldownStats:
+    """
+    Counters for the cooldown registry.
+    """
+
+    # Cooldowns learned from responses
+    recorded: int = 0
+    # Requests held back until their ship's cooldown ended
+    held: int = 0
+    held_seconds: float = 0.0
+
+
+class CooldownRegistry:
+    """
+    When each ship's reactor cooldown ends, by the server's clock.
+
+    Fed from every response that carries a cooldown, successful or not,
+    so callers can wait for a ship to be ready instead of sending a
+    request the API will refuse.
+    """
+
+    def __init__(self, clock: ServerClock) -> None:
+        self.clock = clock
+        self.expirations: Dict[str, datetime] = {}
+        self.stats = CooldownStats()
+        self._lock = threading.Lock()
+
+    def record(self, cooldown: Dict[str, Any]) -> None:
+        """
+        Remember a cooldown as the API sends it.
+        """
+        symbol = cooldown.get("shipSymbol")
+        if not symbol:
+            return
+        if cooldown.get("expiration"):
+            expiration = datetime.fromisoformat(cooldown["expiration"])
+        else:
+            seconds = cooldown.get("remainingSeconds", 0)
+            expiration = self.clock.now() + timedelta(seconds=seconds)
+        with self._lock:
+            self.expirations[symbol] = expiration
+            self.stats.recorded += 1
+
+    def remaining(self, symbol: str) -> float:
+        """
+        Seconds until the ship can use its reactor again, 0 if it can now.
+        """
+        expiration = self.expirations.get(symbol)
+        if expiration is None:
+            return 0.0
+        # Err on the late side, an early request is refused
+        remaining = self.clock.seconds_until(expiration) + self.clock.uncertainty
+        if remaining <= 0:
+            with self._lock:
+                if self.expirations.get(symbol) == expiration:
+                    del self.expirations[symbol]
+            return 0.0
+        return remaining
+
+    async def wait(self, symbol: str) -> float:
+        """
+        Wait for the ship's cooldown to end, returns how long that took.
+        """
+        waited = 0.0
+        # A response may extend the cooldown while we wait
+        while remaining := self.remaining(symbol):
+            await asyncio.sleep(remaining)
+            waited += remaining
+        return waited
+
+    def wait_sync(self, symbol: str) -> float:
+        waited = 0.0
+        while remaining := self.remaining(symbol):
+            sleep(remaining)
+            waited += remaining
+        return waited
+
+    def cooling_down(self) -> int:
+        return sum(1 for symbol in list(self.expirations) if self.remaining(symbol))
+
+
+def cooldown_ship(method: str, path: str) -> Optional[str]:
+    """
+    The ship a request would be refused for while it cools down, if any.
+    """
+    if method != "POST":
+        return None
+    parts = httpx.URL(path).path.split("/")
+    # .../my/ships/{shipSymbol}/{action}, extract also has /extract/survey
+    for i in range(1, len(parts) - 2):
+        if parts[i - 1 : i + 1] == ["my", "ships"] and parts[i + 2] in COOLDOWN_ACTIONS:
+            return parts[i + 1]
+    return None
@@ -0,0 +1,192 @@
+import multiprocessing
+import multiprocessing.synchronize
+import threading
+from time import monotonic
+from typing import Mapping, Optional, Union
+
+import attrs
+
+# Defaults for the SpaceTraders v2 API, used until the
+# rate limit headers on a response tell us otherwise.
+DEFAULT_RATE_PER_SECOND = 2.0
+DEFAULT_BURST = 10
+
+
+@attrs.define
+class RateLimiterStats:
+    """
+    Counters for the rate limiter.
+    """
+
+    # Number of requests that acquired a token
+    requests: int = 0
+    # Number of requests that had to wait for a token
+    delayed: int = 0
+    # Total and worst case seconds spent waiting for a token
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    # 429 responses that still got through the limiter
+    rate_limited: int = 0
+
+
+class TokenBucket:
+    """
+    A token bucket (steady rate plus burst), one per agent token.
+
+    Callers reserve a token before sending a request and are told how
+    long to wait before they may send it. The bucket may go into debt
+    so concurrent callers are spaced out instead of all waking together.
+    Because it only hands out wait times it is shared by the sync
+    and async clients: they sleep in their own way.
+    """
+
+    _lock: Union[threading.Lock, multiprocessing.synchronize.Lock]
+
+    def __init__(
+        self, rate: float = DEFAULT_RATE_PER_SECOND, burst: int = DEFAULT_BURST
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = monotonic()
+        self.stats = RateLimiterStats()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Take a token and return the seconds to wait before using it.
+        """
+        with self._lock:
+            self._refill(monotonic())
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            self.stats.requests += 1
+            if wait > 0:
+                self.stats.delayed += 1
+                self.stats.total_wait += wait
+                self.stats.max_wait = max(self.stats.max_wait, wait)
+            return wait
+
+    def refund(self) -> None:
+        """
+        Give back a reserved token that was not used after all.
+        """
+        with self._lock:
+            self._refill(monotonic())
+            self.tokens = min(float(self.burst), self.tokens + 1)
+            self.stats.requests -= 1
+
+    def available(self) -> float:
+        """
+        Tokens that can be taken right now, negative while callers are waiting.
+        """
+        with self._lock:
+            self._refill(monotonic())
+            return self.tokens
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Sync the bucket with the x-ratelimit-* headers from an API response.
+        """
+        rate = _header_float(headers, "x-ratelimit-limit-per-second")
+        burst = _header_float(headers, "x-ratelimit-limit-burst")
+        remaining = _header_float(headers, "x-ratelimit-remaining")
+        with self._lock:
+            self._refill(monotonic())
+            if rate:
+                self.rate = rate
+            if burst:
+                self.burst = int(burst)
+            if remaining is not None:
+                # Never hand out more than the server says we have left
+                self.tokens = min(self.tokens, remaining)
+
+    def rate_limited(self, retry_after: float) -> None:
+        """
+        A 429 got through: hold back every caller for `retry_after` seconds.
+        """
+        with self._lock:
+            self._refill(monotonic())
+            self.tokens = min(self.tokens, -retry_after * self.rate)
+            self.stats.rate_limited += 1
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    A token bucket shared by several processes sending as the same agent.
+
+    The bucket lives in shared memory behind a process lock, so the
+    per-token budget holds across the whole fleet rather than per process.
+    monotonic() is the system-wide CLOCK_MONOTONIC on Linux, so every
+    process agrees on when the bucket was last refilled. Stats stay per
+    process.
+    """
+
+    _lock: multiprocessing.synchronize.Lock
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+        context: Optional[multiprocessing.context.BaseContext] = None,
+    ) -> None:
+        context = context or multiprocessing.get_context()
+        # tokens, updated_at, rate, burst
+        self._state = context.RawArray("d", [float(burst), monotonic(), rate, burst])
+        self._lock = context.Lock()
+        self.stats = RateLimiterStats()
+
+    def __getstate__(self) -> dict:
+        # Fresh stats in each process, the bucket itself is shared
+        return {"_state": self._state, "_lock": self._lock}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.stats = RateLimiterStats()
+
+    @property  # type: ignore[override]
+    def tokens(self) -> float:
+        return self._state[0]
+
+    @tokens.setter
+    def tokens(self, value: float) -> None:
+        self._state[0] = value
+
+    @property  # type: ignore[override]
+    def updated_at(self) -> float:
+        return self._state[1]
+
+    @updated_at.setter
+    def updated_at(self, value: float) -> None:
+        self._state[1] = value
+
+    @property  # type: ignore[override]
+    def rate(self) -> float:
+        return self._state[2]
+
+    @rate.setter
+    def rate(self, value: float) -> None:
+        self._state[2] = value
+
+    @property  # type: ignore[override]
+    def burst(self) -> int:
+        return int(self._state[3])
+
+    @burst.setter
+    def burst(self, value: int) -> None:
+        self._state[3] = value
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
@@ -0,0 +1,278 @@
+import asyncio
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import attrs
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+from .paths import BASE_PATH
+
+# Upper bounds in seconds, like a Prometheus histogram
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The segment after each of these is a symbol or id, not part of the endpoint
+PATH_PARAMETERS = {
+    "ships": "{shipSymbol}",
+    "contracts": "{contractId}",
+    "systems": "{systemSymbol}",
+    "waypoints": "{waypointSymbol}",
+    "factions": "{factionSymbol}",
+}
+
+
+def endpoint_template(path: str) -> str:
+    """
+    The endpoint a path belongs to, e.g. `/my/ships/{shipSymbol}/extract`
+    for every ship's extract.
+    """
+    segments = httpx.URL(path).path.removeprefix(httpx.URL(BASE_PATH).path)
+    parts = [p for p in segments.split("/") if p]
+    for i in range(1, len(parts)):
+        if parts[i - 1] in PATH_PARAMETERS:
+            parts[i] = PATH_PARAMETERS[parts[i - 1]]
+    return "/" + "/".join(parts)
+
+
+@attrs.define
+class Histogram:
+    """
+    Counts of observations at or under each of `LATENCY_BUCKETS`.
+    """
+
+    counts: List[int] = attrs.field(factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    count: int = 0
+    sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        The bucket bound the `q` quantile falls under. Good enough to rank endpoints.
+        """
+        if not self.count:
+            return 0.0
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return bound
+        return float("inf")
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+
+@attrs.define
+class EndpointStats:
+    """
+    Counters for the requests to one endpoint that went over the network.
+    """
+
+    requests: int = 0
+    # Requests that never got a response
+    exceptions: int = 0
+    statuses: Counter = attrs.field(factory=Counter)
+    # The `code` of API errors, e.g. 4000 for a cooldown
+    error_codes: Counter = attrs.field(factory=Counter)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    latency: Histogram = attrs.field(factory=Histogram)
+    # Seconds spent waiting for the rate limiter before sending
+    rate_limit_wait: float = 0.0
+
+    def merge(self, other: "EndpointStats") -> None:
+        self.requests += other.requests
+        self.exceptions += other.exceptions
+        self.statuses.update(other.statuses)
+        self.error_codes.update(other.error_codes)
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.latency.merge(other.latency)
+        self.rate_limit_wait += other.rate_limit_wait
+
+
+# Label values and the current value, for every series of a gauge
+GaugeValues = List[Tuple[Dict[str, str], float]]
+
+
+@attrs.define
+class Gauge:
+    """
+    A value read when the metrics are exported, like a queue depth.
+    """
+
+    name: str
+    help: str
+    read: Callable[[], GaugeValues]
+
+
+class RequestMetrics:
+    """
+    EndpointStats for every method and endpoint template we have called,
+    and gauges for the state of the request pipeline.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: Dict[Tuple[str, str], EndpointStats] = {}
+        self.gauges: List[Gauge] = []
+        self._lock = threading.Lock()
+
+    def gauge(self, name: str, help: str, read: Callable[[], GaugeValues]) -> None:
+        self.gauges.append(Gauge(name=name, help=help, read=read))
+
+    def endpoint(self, method: str, path: str) -> EndpointStats:
+        key = (method, endpoint_template(path))
+        with self._lock:
+            if key not in self.endpoints:
+                self.endpoints[key] = EndpointStats()
+            return self.endpoints[key]
+
+    def total(self) -> EndpointStats:
+        total = EndpointStats()
+        with self._lock:
+            for stats in self.endpoints.values():
+                total.merge(stats)
+        return total
+
+    def by_time(self) -> List[Tuple[Tuple[str, str], EndpointStats]]:
+        """
+        Endpoints with the ones taking the most time first.
+        """
+        with self._lock:
+            endpoints = list(self.endpoints.items())
+        return sorted(
+            endpoints,
+            key=lambda e: e[1].latency.sum + e[1].rate_limit_wait,
+            reverse=True,
+        )
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def render_prometheus(metrics: RequestMetrics, prefix: str = "spacetraders") -> str:
+    """
+    The metrics in the Prometheus text exposition format.
+    """
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help: str) -> str:
+        lines.append(f"# HELP {prefix}_{name} {help}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        return f"{prefix}_{name}"
+
+    endpoints = metrics.by_time()
+
+    name = family("request_duration_seconds", "histogram", "API request latency")
+    for (method, endpoint), stats in endpoints:
+        labels = _labels(method=method, endpoint=endpoint)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats.latency.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats.latency.count}')
+        lines.append(f"{name}_sum{{{labels}}} {stats.latency.sum}")
+        lines.append(f"{name}_count{{{labels}}} {stats.latency.count}")
+
+    name = family("responses_total", "counter", "API responses by HTTP status")
+    for (method, endpoint), stats in endpoints:
+        for status, count in sorted(stats.statuses.items()):
+            labels = _labels(method=method, endpoint=endpoint, status=str(status))
+            lines.append(f"{name}{{{labels}}} {count}")
+
+    name = family("errors_total", "counter", "API errors by error code")
+    for (method, endpoint), stats in endpoints:
+        for code, count in sorted(stats.error_codes.items()):
+            labels = _labels(method=method, endpoint=endpoint, code=str(code))
+            lines.append(f"{name}{{{labels}}} {count}")
+
+    simple = [
+        ("exceptions_total", "Requests that got no response", "exceptions"),
+        ("request_bytes_total", "Request body bytes sent", "bytes_sent"),
+        ("response_bytes_total", "Response bytes received", "bytes_received"),
+        (
+            "rate_limit_wait_seconds_total",
+            "Seconds waited for the rate limiter",
+            "rate_limit_wait",
+        ),
+    ]
+    for metric, help, field in simple:
+        name = family(metric, "counter", help)
+        for (method, endpoint), stats in endpoints:
+            labels = _labels(method=method, endpoint=endpoint)
+            lines.append(f"{name}{{{labels}}} {getattr(stats, field)}")
+
+    for gauge in metrics.gauges:
+        name = family(gauge.name, "gauge", gauge.help)
+        for labels, value in gauge.read():
+            lines.append(f"{name}{{{_labels(**labels)}}} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def summary_table(metrics: RequestMetrics, limit: int = 15) -> Table:
+    """
+    The endpoints that take the most time, as a rich table.
+    """
+    table = Table(title="API requests by endpoint")
+    table.add_column("Endpoint")
+    for column in ["Requests", "Errors", "p50", "p95", "Total s", "Waited s", "KB"]:
+        table.add_column(column, justify="right")
+    for (method, endpoint), stats in metrics.by_time()[:limit]:
+        errors = stats.exceptions + sum(stats.error_codes.values())
+        table.add_row(
+            f"{method} {endpoint}",
+            str(stats.requests),
+            str(errors),
+            f"{stats.latency.quantile(0.5):g}",
+            f"{stats.latency.quantile(0.95):g}",
+            f"{stats.latency.sum:.1f}",
+            f"{stats.rate_limit_wait:.1f}",
+            f"{(stats.bytes_sent + stats.bytes_received) / 1024:.0f}",
+        )
+    table.caption = "  ".join(
+        f"{gauge.name}{_caption_labels(labels)}={value:g}"
+        for gauge in metrics.gauges
+        for labels, value in gauge.read()
+    )
+    return table
+
+
+def _caption_labels(labels: Dict[str, str]) -> str:
+    values = [v for v in labels.values() if v]
+    return f"({','.join(values)})" if values else ""
+
+
+async def report_metrics(
+    metrics: RequestMetrics, interval: float, path: Optional[str] = None
+) -> None:
+    """
+    Print the summary table every `interval` seconds, and once more when cancelled,
+    and write the Prometheus text to `path` for a textfile collector.
+    """
+    console = Console()
+
+    def report():
+        console.print(summary_table(metrics))
+        if path:
+            with open(path, "w") as f:
+                f.write(render_prometheus(metrics))
+
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            report()
+    except asyncio.CancelledError:
+        # One last time, for the requests since the last report
+        report()
+        raise
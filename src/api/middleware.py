@@ -0,0 +1,302 @@
+import asyncio
+import json
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep, time
+from typing import Optional, Union
+
+import httpx
+
+from src.support.datetime import ServerClock
+
+from .agents import AgentPool
+from .cache import ResponseCache
+from .cassette import RECORDED_HEADERS, Cassette, Interaction
+from .cooldowns import CooldownRegistry, cooldown_ship
+from .metrics import EndpointStats, RequestMetrics
+from .retry import RetryAttempt, RetryEngine
+from .transport import ApiRequest, ApiResponse, Middleware
+
+
+class AuthMiddleware(Middleware):
+    """
+    Sends every request as the agent the pool routes it to:
+    with its token, over its connections.
+    """
+
+    name = "auth"
+
+    def __init__(self, pool: AgentPool) -> None:
+        self.pool = pool
+
+    def before(self, request: ApiRequest) -> Optional[ApiResponse]:
+        agent = self.pool.route(request)
+        if request.authenticated:
+            request.headers["Authorization"] = f"Bearer {agent.token}"
+        request.context["client"] = agent.client
+        request.context["async_client"] = agent.async_client
+        return None
+
+
+class CacheMiddleware(Middleware):
+    """
+    Serves GETs from the response cache and keeps it fresh.
+    """
+
+    name = "cache"
+
+    def __init__(self, cache: ResponseCache) -> None:
+        self.cache = cache
+
+    @staticmethod
+    def _agent(request: ApiRequest) -> Optional[str]:
+        # Set by the auth middleware, which runs first
+        agent = request.context.get("agent")
+        return agent.symbol if agent is not None else request.agent
+
+    def before(self, request: ApiRequest) -> Optional[ApiResponse]:
+        if request.method != "GET":
+            return None
+        cached = self.cache.get(request.path, agent=self._agent(request))
+        if cached is None:
+            return None
+        return ApiResponse(status_code=200, body=cached)
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        if response.error or response.status_code >= 400:
+            return
+        if request.method == "GET":
+            self.cache.set(
+                request.path,
+                response.body,
+                size=response.size,
+                agent=self._agent(request),
+            )
+        elif isinstance(response.body.get("data"), dict):
+            self.cache.invalidate_after_post(
+                request.path, request.data, response.body["data"]
+            )
+
+
+class CooldownMiddleware(Middleware):
+    """
+    Holds reactor actions back until their ship's cooldown has ended,
+    and learns cooldowns from every response that carries one.
+    """
+
+    name = "cooldown"
+
+    def __init__(self, registry: CooldownRegistry) -> None:
+        self.registry = registry
+
+    def _held(self, waited: float) -> None:
+        if waited:
+            self.registry.stats.held += 1
+            self.registry.stats.held_seconds += waited
+
+    async def acquire(self, request: ApiRequest) -> None:
+        symbol = cooldown_ship(request.method, request.path)
+        if symbol:
+            self._held(await self.registry.wait(symbol))
+
+    def acquire_sync(self, request: ApiRequest) -> None:
+        symbol = cooldown_ship(request.method, request.path)
+        if symbol:
+            self._held(self.registry.wait_sync(symbol))
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        # Actions have it in their data, refusals in their error data
+        # and the ship cooldown endpoint returns it as its data
+        data = response.body.get("data") or (response.body.get("error") or {}).get(
+            "data"
+        )
+        if not isinstance(data, dict):
+            return
+        cooldown = data.get("cooldown", data)
+        if isinstance(cooldown, dict) and "shipSymbol" in cooldown:
+            if "remainingSeconds" in cooldown:
+                self.registry.record(cooldown)
+
+
+class RetryMiddleware(Middleware):
+    """
+    Retries network errors, 5xx and 429s through the shared retry engine,
+    and holds requests back while its circuit breaker is open.
+    """
+
+    name = "retry"
+
+    def __init__(self, engine: RetryEngine) -> None:
+        self.engine = engine
+
+    def _attempt(self, request: ApiRequest) -> RetryAttempt:
+        if "retry" not in request.context:
+            request.context["retry"] = self.engine.begin()
+        return request.context["retry"]
+
+    async def acquire(self, request: ApiRequest) -> None:
+        attempt = self._attempt(request)
+        while (wait := attempt.before_send()) > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, request: ApiRequest) -> None:
+        attempt = self._attempt(request)
+        while (wait := attempt.before_send()) > 0:
+            sleep(wait)
+
+    def retry(
+        self, request: ApiRequest, outcome: Union[ApiResponse, httpx.HTTPError]
+    ) -> Optional[float]:
+        attempt = self._attempt(request)
+        if isinstance(outcome, httpx.HTTPError) or outcome.status_code >= 500:
+            return attempt.failed(outage=True)
+        attempt.succeeded()
+        error = outcome.error
+        if error and error.code == 429 and error.data:
+            # The rate limiter holds everyone back, so go again straight away
+            return attempt.failed(delay=0)
+        return None
+
+
+class RateLimitMiddleware(Middleware):
+    """
+    Takes a token from the rate limiter of the agent sending the request,
+    through its priority scheduler for async requests.
+    """
+
+    name = "rate_limit"
+
+    def __init__(self, pool: AgentPool) -> None:
+        self.pool = pool
+
+    async def acquire(self, request: ApiRequest) -> None:
+        started = monotonic()
+        await self.pool.route(request).scheduler.acquire(request.priority)
+        request.context["rate_limit_wait"] = monotonic() - started
+
+    def acquire_sync(self, request: ApiRequest) -> None:
+        wait = self.pool.route(request).limiter.reserve()
+        sleep(wait)
+        request.context["rate_limit_wait"] = wait
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        limiter = self.pool.route(request).limiter
+        limiter.update_from_headers(response.headers)
+        error = response.error
+        if error and error.code == 429 and error.data:
+            limiter.rate_limited(error.data["retryAfter"])
+
+
+class ConcurrencyMiddleware(Middleware):
+    """
+    Caps the async requests in flight for each agent with an adaptive limit,
+    which grows while responses are healthy and is cut on 429s, 5xx,
+    network errors and rising latency.
+    """
+
+    name = "concurrency"
+
+    def __init__(self, pool: AgentPool) -> None:
+        self.pool = pool
+
+    async def acquire(self, request: ApiRequest) -> None:
+        await self.pool.route(request).concurrency.acquire()
+        request.context["concurrency"] = True
+
+    def release(self, request: ApiRequest) -> None:
+        if request.context.pop("concurrency", False):
+            self.pool.route(request).concurrency.release()
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        overloaded = response.status_code == 429 or response.status_code >= 500
+        self.pool.route(request).concurrency.record(response.elapsed, overloaded)
+
+    def on_exception(self, request: ApiRequest, exc: httpx.HTTPError) -> None:
+        self.pool.route(request).concurrency.record(None, overloaded=True)
+
+
+class ClockMiddleware(Middleware):
+    """
+    Follows the API's clock from the Date header of every response, so
+    waits for arrivals end when the server says the ship has arrived.
+    """
+
+    name = "clock"
+
+    def __init__(self, clock: ServerClock) -> None:
+        self.clock = clock
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        date = response.headers.get("date")
+        if not date or not response.elapsed:
+            # Served from the cache, it says nothing about the clock now
+            return
+        try:
+            server_time = parsedate_to_datetime(date)
+        except (TypeError, ValueError):
+            return
+        received = time()
+        self.clock.observe(
+            server_time, sent=received - response.elapsed, received=received
+        )
+
+
+class RecordMiddleware(Middleware):
+    """
+    Writes every response that came over the network to a cassette,
+    so it can be replayed later without the API.
+    """
+
+    name = "record"
+
+    def __init__(self, cassette: Cassette) -> None:
+        self.cassette = cassette
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        headers = {
+            k: v
+            for k, v in response.headers.items()
+            if k.lower().startswith(RECORDED_HEADERS)
+        }
+        self.cassette.record(
+            Interaction(
+                method=request.method,
+                path=request.path,
+                data=request.data,
+                status_code=response.status_code,
+                body=response.body,
+                headers=headers,
+                elapsed=response.elapsed,
+            )
+        )
+
+
+class MetricsMiddleware(Middleware):
+    """
+    Counts requests, responses, the time they took and the time they waited
+    for the rate limiter, per endpoint.
+    """
+
+    name = "metrics"
+
+    def __init__(self) -> None:
+        self.stats = RequestMetrics()
+
+    def _endpoint(self, request: ApiRequest) -> EndpointStats:
+        stats = self.stats.endpoint(request.method, request.path)
+        stats.requests += 1
+        stats.rate_limit_wait += request.context.pop("rate_limit_wait", 0.0)
+        if request.data:
+            stats.bytes_sent += len(json.dumps(request.data))
+        return stats
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        stats = self._endpoint(request)
+        stats.statuses[response.status_code] += 1
+        stats.bytes_received += response.size
+        stats.latency.observe(response.elapsed)
+        error = response.error
+        if error and error.code:
+            stats.error_codes[error.code] += 1
+
+    def on_exception(self, request: ApiRequest, exc: httpx.HTTPError) -> None:
+        self._endpoint(request).exceptions += 1
@@ -0,0 +1,104 @@
+import asyncio
+import math
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Union
+
+from src.schemas.errors import Error
+
+from .client import safe_get_page, sync_get_page
+from .scheduler import Priority
+
+# The largest page the API will give us
+PAGE_SIZE = 20
+
+
+class Paginator:
+    """
+    Streams every item of a list endpoint.
+
+    The first page tells us `meta.total`. After that the remaining pages
+    are requested concurrently, at most `prefetch` at a time, and the
+    scheduler keeps them within the rate budget. Items are yielded in order.
+    If a page fails the stream ends early and `error` is set.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        priority: Priority = Priority.BULK,
+        prefetch: int = 5,
+        agent: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.priority = priority
+        self.agent = agent
+        self.prefetch = prefetch
+        self.total = 0
+        self.pages = 0
+        self.error: Optional[Error] = None
+
+    def __aiter__(self) -> AsyncIterator[Dict]:
+        return self._items()
+
+    async def all(self) -> Union[List[Dict], Error]:
+        """
+        Every item as a list, or the Error that stopped us getting them.
+        """
+        items = [item async for item in self]
+        if self.error:
+            return self.error
+        return items
+
+    async def _items(self) -> AsyncIterator[Dict]:
+        first = await self._page(1)
+        if isinstance(first, Error):
+            self.error = first
+            return
+        items, meta = first
+        self.total = meta["total"]
+        self.pages = max(1, math.ceil(self.total / PAGE_SIZE))
+        for item in items:
+            yield item
+
+        pending: Deque[asyncio.Task] = deque()
+        next_page = 2
+        try:
+            while pending or next_page <= self.pages:
+                while next_page <= self.pages and len(pending) < self.prefetch:
+                    pending.append(asyncio.create_task(self._page(next_page)))
+                    next_page += 1
+                result = await pending.popleft()
+                if isinstance(result, Error):
+                    self.error = result
+                    return
+                for item in result[0]:
+                    yield item
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _page(self, page: int):
+        return await safe_get_page(
+            path=self.path,
+            page=page,
+            limit=PAGE_SIZE,
+            priority=self.priority,
+            agent=self.agent,
+        )
+
+
+def sync_paginate(path: str, agent: Optional[str] = None) -> Union[List[Dict], Error]:
+    """
+    Every item of a list endpoint, one page after another.
+    """
+    items: List[Dict] = []
+    page = 1
+    while True:
+        result = sync_get_page(path=path, page=page, limit=PAGE_SIZE, agent=agent)
+        if isinstance(result, Error):
+            return result
+        page_items, meta = result
+        items.extend(page_items)
+        if page * PAGE_SIZE >= meta["total"] or not page_items:
+            return items
+        page += 1
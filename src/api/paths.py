@@ -1,6 +1,9 @@
 import attrs
 
-BASE_PATH = "https://api.spacetraders.io/v2"
+from src.settings import config
+
+# Point this somewhere else, like the mock server, with `[api] base_path`
+BASE_PATH = config.get("api", "base_path", fallback="https://api.spacetraders.io/v2")
 
 
 @attrs.define
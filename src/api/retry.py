@@ -0,0 +1,180 @@
+import enum
+import random
+import threading
+from time import monotonic
+from typing import Optional
+
+import attrs
+
+
+@attrs.define
+class RetryPolicy:
+    """
+    How hard a single request tries before giving up.
+    """
+
+    max_attempts: int = 8
+    # Exponential backoff: base_delay * 2 ** (attempt - 1), capped at max_delay
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    # Total seconds a request may spend retrying
+    deadline: float = 300.0
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full jitter backoff, so callers that failed together
+        do not all retry together.
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+
+class CircuitState(enum.StrEnum):
+    # Requests flow as normal
+    CLOSED = "closed"
+    # The API is down, everyone waits
+    OPEN = "open"
+    # Letting one request through to see if the API is back
+    HALF_OPEN = "half_open"
+
+
+@attrs.define
+class RetryStats:
+    """
+    Counters for the retry engine and circuit breaker.
+    """
+
+    # Requests that were sent again after a failure
+    retries: int = 0
+    # Requests that ran out of attempts or time
+    gave_up: int = 0
+    # Times the circuit opened, and for how long in total
+    circuit_opened: int = 0
+    open_seconds: float = 0.0
+
+
+class RetryEngine:
+    """
+    Shared retry policy and circuit breaker for every request helper.
+
+    After `failure_threshold` outage failures in a row (network errors, 5xx)
+    the circuit opens and all callers pause for `reset_timeout` seconds.
+    Then a single probe request is let through. If it succeeds the circuit
+    closes, otherwise it opens again.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[RetryPolicy] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 15.0,
+    ) -> None:
+        self.policy = policy or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_sent_at = 0.0
+        self.stats = RetryStats()
+        self._lock = threading.Lock()
+
+    def begin(self) -> "RetryAttempt":
+        """
+        Start tracking the attempts of a single request.
+        """
+        return RetryAttempt(engine=self)
+
+    def circuit_wait(self) -> float:
+        """
+        Seconds a caller must wait before sending. 0 means go ahead.
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return 0.0
+            now = monotonic()
+            if self.state == CircuitState.OPEN:
+                remaining = self.opened_at + self.reset_timeout - now
+                if remaining > 0:
+                    return remaining
+                self.state = CircuitState.HALF_OPEN
+                self.probe_in_flight = False
+            # A probe that never reported back (e.g. it was cancelled) is replaced
+            if (
+                not self.probe_in_flight
+                or now - self.probe_sent_at > self.reset_timeout
+            ):
+                self.probe_in_flight = True
+                self.probe_sent_at = now
+                return 0.0
+            # Somebody else is checking whether the API is back
+            return 1.0
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != CircuitState.CLOSED:
+                self.stats.open_seconds += monotonic() - self.opened_at
+                self.state = CircuitState.CLOSED
+                self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == CircuitState.HALF_OPEN:
+                # Still down, keep the time it has been open and wait again
+                self.state = CircuitState.OPEN
+                self.stats.open_seconds += monotonic() - self.opened_at
+                self.opened_at = monotonic()
+                self.probe_in_flight = False
+            elif (
+                self.state == CircuitState.CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = CircuitState.OPEN
+                self.opened_at = monotonic()
+                self.stats.circuit_opened += 1
+
+
+@attrs.define
+class RetryAttempt:
+    """
+    The retry budget of a single request.
+    """
+
+    engine: RetryEngine
+    attempt: int = 0
+    started_at: float = attrs.field(factory=monotonic)
+
+    def before_send(self) -> float:
+        """
+        Seconds to wait for the circuit breaker before sending.
+        Call again after waiting until it returns 0.
+        """
+        return self.engine.circuit_wait()
+
+    def succeeded(self) -> None:
+        self.engine.record_success()
+
+    def failed(
+        self, outage: bool = False, delay: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Record a failed attempt and return how long to wait before the next one,
+        or None if the request should give up.
+        `outage` failures count towards opening the circuit.
+        `delay` replaces the backoff, for when the API told us how long to wait.
+        """
+        self.attempt += 1
+        if outage:
+            self.engine.record_failure()
+        policy = self.engine.policy
+        if delay is None:
+            delay = policy.backoff(self.attempt)
+        elapsed = monotonic() - self.started_at
+        if self.attempt >= policy.max_attempts or elapsed + delay > policy.deadline:
+            self.engine.stats.gave_up += 1
+            return None
+        self.engine.stats.retries += 1
+        return delay
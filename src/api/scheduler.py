@@ -0,0 +1,120 @@
+import asyncio
+import enum
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import attrs
+
+from .limiter import TokenBucket
+
+
+class Priority(enum.IntEnum):
+    # Ship actions that make money: extract, navigate, sell, refuel, dock...
+    SHIP_ACTION = 0
+    # Market refreshes, agent and contract lookups
+    MARKET = 1
+    # Exploration and bulk reads of systems, waypoints and jump gates
+    BULK = 2
+
+
+# Out of every 10 tokens handed out while all classes are waiting,
+# ship actions get 6, market refreshes 3 and bulk calls 1.
+# No class is ever starved.
+PRIORITY_WEIGHTS: Dict[Priority, int] = {
+    Priority.SHIP_ACTION: 6,
+    Priority.MARKET: 3,
+    Priority.BULK: 1,
+}
+
+
+@attrs.define
+class PriorityStats:
+    """
+    Counters for a single priority class.
+    """
+
+    # Requests that have been given a token
+    dispatched: int = 0
+    # Total seconds requests spent queued in this class
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class RequestScheduler:
+    """
+    Hands out rate limiter tokens to waiting async requests.
+
+    Requests queue up in their priority class. A single dispatcher
+    waits for each token and only then picks who gets it, so a ship action
+    that arrives late still goes ahead of a queue of bulk calls.
+    Classes share tokens by weighted round robin.
+    """
+
+    def __init__(
+        self, limiter: TokenBucket, weights: Dict[Priority, int] = PRIORITY_WEIGHTS
+    ) -> None:
+        self.limiter = limiter
+        self.weights = weights
+        self.credits = dict(weights)
+        self.queues: Dict[Priority, Deque[asyncio.Future]] = {
+            p: deque() for p in Priority
+        }
+        self.stats: Dict[Priority, PriorityStats] = {
+            p: PriorityStats() for p in Priority
+        }
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def queue_depth(self, priority: Priority) -> int:
+        return len(self.queues[priority])
+
+    async def acquire(self, priority: Priority) -> None:
+        """
+        Wait until this request is allowed to be sent.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queued_at = loop.time()
+        self.queues[priority].append(future)
+        if (
+            self._dispatcher is None
+            or self._dispatcher.done()
+            or self._dispatcher.get_loop() is not loop
+        ):
+            self._dispatcher = loop.create_task(self._dispatch())
+        await future
+        waited = loop.time() - queued_at
+        stats = self.stats[priority]
+        stats.dispatched += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+
+    async def _dispatch(self) -> None:
+        while self._has_waiters():
+            await asyncio.sleep(self.limiter.reserve())
+            future = self._next_waiter()
+            if future:
+                future.set_result(None)
+            else:
+                # Everyone waiting gave up while we waited for the token
+                self.limiter.refund()
+
+    def _has_waiters(self) -> bool:
+        for queue in self.queues.values():
+            while queue and queue[0].done():
+                # Cancelled while waiting
+                queue.popleft()
+            if queue:
+                return True
+        return False
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        if not self._has_waiters():
+            return None
+        waiting = [p for p in Priority if self.queues[p]]
+        if all(self.credits[p] <= 0 for p in waiting):
+            self.credits = dict(self.weights)
+        for priority in waiting:
+            if self.credits[priority] > 0:
+                self.credits[priority] -= 1
+                return self.queues[priority].popleft()
+        return None
@@ -0,0 +1,243 @@
+import asyncio
+from time import monotonic, sleep
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import attrs
+import httpx
+from rich.pretty import pprint
+
+from src.schemas.errors import Error
+
+from .scheduler import Priority
+
+
+@attrs.define
+class ApiRequest:
+    """
+    A single call to the API, as it passes through the middleware.
+    """
+
+    method: str
+    path: str
+    data: Optional[Dict] = None
+    priority: Priority = Priority.MARKET
+    # False for calls like registration that must not send our token
+    authenticated: bool = True
+    # Symbol of the agent to send it as, None to let the agent pool decide
+    agent: Optional[str] = None
+    headers: Dict[str, str] = attrs.field(factory=dict)
+    # Scratch space for middleware to keep state across hooks and attempts
+    context: Dict[str, Any] = attrs.field(factory=dict)
+
+
+@attrs.define
+class ApiResponse:
+    """
+    A response from the API with its JSON body already parsed.
+    """
+
+    status_code: int
+    body: Dict[str, Any]
+    headers: Mapping[str, str] = attrs.field(factory=dict)
+    # Bytes transferred and seconds taken, 0 when it didn't touch the network
+    size: int = 0
+    elapsed: float = 0.0
+
+    @classmethod
+    def build(cls, response: httpx.Response, elapsed: float = 0.0) -> "ApiResponse":
+        body: Dict[str, Any]
+        if response.is_success and not response.content:
+            # No content, e.g. the cooldown of a ship that doesn't have one
+            body = {"data": {}}
+        else:
+            try:
+                body = response.json()
+            except ValueError:
+                # Usually an HTML error page from a proxy in front of the API
+                body = {
+                    "error": {"message": response.text, "code": response.status_code}
+                }
+        return cls(
+            status_code=response.status_code,
+            body=body,
+            headers=response.headers,
+            size=len(response.content),
+            elapsed=elapsed,
+        )
+
+    @property
+    def error(self) -> Optional[Error]:
+        if self.body.get("error"):
+            return Error(**self.body["error"])
+        return None
+
+    def result(self) -> Union[Any, Error]:
+        """
+        The `data` of the response, or an Error if there was one.
+        """
+        return self.error or self.body["data"]
+
+
+class Middleware:
+    """
+    A stage of the request pipeline. Every hook is optional.
+
+    For each attempt the transport calls, in middleware order:
+    `before` (a response returned here is used without sending anything),
+    `acquire` / `acquire_sync` (wait until the request may be sent),
+    then sends it and calls `release`, `after` or `on_exception`,
+    and finally `retry` to decide whether to go again.
+    """
+
+    name: str = ""
+
+    def before(self, request: ApiRequest) -> Optional[ApiResponse]:
+        return None
+
+    async def acquire(self, request: ApiRequest) -> None:
+        pass
+
+    def acquire_sync(self, request: ApiRequest) -> None:
+        pass
+
+    def release(self, request: ApiRequest) -> None:
+        """
+        Called after every attempt, even if `acquire` did not finish.
+        """
+
+    def after(self, request: ApiRequest, response: ApiResponse) -> None:
+        pass
+
+    def on_exception(self, request: ApiRequest, exc: httpx.HTTPError) -> None:
+        pass
+
+    def retry(
+        self, request: ApiRequest, outcome: Union[ApiResponse, httpx.HTTPError]
+    ) -> Optional[float]:
+        """
+        Seconds to wait before sending the request again, None to stop here.
+        """
+        return None
+
+
+class Transport:
+    """
+    The single request pipeline behind every request helper.
+
+    The sync and async front-ends share the same middleware and only
+    differ in how they wait and which httpx client sends the request.
+    Middleware can send a request with another client by putting it in
+    the request's context as `client` or `async_client`.
+    """
+
+    def __init__(
+        self,
+        middleware: List[Middleware],
+        client: httpx.Client,
+        async_client: httpx.AsyncClient,
+    ) -> None:
+        self.middleware = middleware
+        self.client = client
+        self.async_client = async_client
+
+    def disable(self, *names: str) -> None:
+        """
+        Take stages out of the pipeline by name, e.g. to benchmark without them.
+        """
+        self.middleware = [m for m in self.middleware if m.name not in names]
+
+    def stage(self, name: str) -> Optional[Middleware]:
+        for m in self.middleware:
+            if m.name == name:
+                return m
+        return None
+
+    async def send(self, request: ApiRequest) -> Union[ApiResponse, Error]:
+        while True:
+            short_circuit = self._before(request)
+            if short_circuit:
+                return short_circuit
+            try:
+                for m in self.middleware:
+                    await m.acquire(request)
+                started = monotonic()
+                async_client = request.context.get("async_client", self.async_client)
+                response = await async_client.request(
+                    request.method,
+                    request.path,
+                    json=request.data,
+                    headers=request.headers,
+                )
+                outcome: Union[ApiResponse, httpx.HTTPError] = ApiResponse.build(
+                    response, elapsed=monotonic() - started
+                )
+            except httpx.HTTPError as exc:
+                outcome = exc
+            finally:
+                self._release(request)
+            delay = self._after(request, outcome)
+            if delay is None:
+                return self._finish(request, outcome)
+            await asyncio.sleep(delay)
+
+    def send_sync(self, request: ApiRequest) -> Union[ApiResponse, Error]:
+        while True:
+            short_circuit = self._before(request)
+            if short_circuit:
+                return short_circuit
+            try:
+                for m in self.middleware:
+                    m.acquire_sync(request)
+                started = monotonic()
+                client = request.context.get("client", self.client)
+                response = client.request(
+                    request.method,
+                    request.path,
+                    json=request.data,
+                    headers=request.headers,
+                )
+                outcome: Union[ApiResponse, httpx.HTTPError] = ApiResponse.build(
+                    response, elapsed=monotonic() - started
+                )
+            except httpx.HTTPError as exc:
+                outcome = exc
+            finally:
+                self._release(request)
+            delay = self._after(request, outcome)
+            if delay is None:
+                return self._finish(request, outcome)
+            sleep(delay)
+
+    def _before(self, request: ApiRequest) -> Optional[ApiResponse]:
+        for m in self.middleware:
+            response = m.before(request)
+            if response is not None:
+                return response
+        return None
+
+    def _release(self, request: ApiRequest) -> None:
+        for m in reversed(self.middleware):
+            m.release(request)
+
+    def _after(
+        self, request: ApiRequest, outcome: Union[ApiResponse, httpx.HTTPError]
+    ) -> Optional[float]:
+        if isinstance(outcome, httpx.HTTPError):
+            pprint(f"HTTP Exception for {request.path} - {outcome}")
+            for m in self.middleware:
+                m.on_exception(request, outcome)
+        else:
+            for m in self.middleware:
+                m.after(request, outcome)
+        for m in self.middleware:
+            delay = m.retry(request, outcome)
+            if delay is not None:
+                return delay
+        return None
+
+    def _finish(
+        self, request: ApiRequest, outcome: Union[ApiResponse, httpx.HTTPError]
+    ) -> Union[ApiResponse, Error]:
+        if isinstance(outcome, httpx.HTTPError):
+            return Error(message=f"HTTP Exception for {request.path} - {outcome}")
+        return outcome
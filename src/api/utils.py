@@ -4,14 +4,12 @@ from httpx import Response
 
 from src.schemas.errors import Error
 
+from .transport import ApiResponse
+
 
 def data_or_error(api_response: Response) -> Union[Dict, Error]:
     """
     If `error` exists on the response, return an Error object
     otherwise returns the `data` attribute from a response if one exists.
     """
-    api_data = api_response.json()
-    if api_data.get("error"):
-        return Error(**api_data["error"])
-    api_data = api_data["data"]
-    return api_data
+    return ApiResponse.build(api_response).result()
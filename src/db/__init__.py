@@ -1,7 +1,7 @@
-from contextlib import contextmanager
-from typing import Generator
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Generator
 
-from .session import SessionLocal
+from .session import AsyncSessionLocal, SessionLocal
 
 
 @contextmanager
@@ -9,3 +9,10 @@ def get_db() -> Generator:
     db = SessionLocal()
     yield db
     db.close()
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncGenerator:
+    db = AsyncSessionLocal()
+    yield db
+    await db.close()
@@ -5,3 +5,4 @@ from .models.surveys import SurveyModel  # noqa
 from .models.charts import ChartModel  # noqa
 from .models.waypoints import WaypointModel  # noqa
 from .models.systems import SystemModel, SystemMappingStatusModel  # noqa
+from .models.ships import ShipAssignmentModel  # noqa
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, List, Optional, Tuple
+
+import asyncpg
+import attrs
+from sqlalchemy import func, select
+from sqlalchemy.sql import Executable
+from structlog import get_logger
+
+from src.api import request_metrics
+from src.settings import config
+
+from .session import DATABASE_URL
+
+log = get_logger(__name__)
+
+# Postgres channel other processes are told about invalidations on
+CHANNEL = "object_cache"
+
+# Seconds before listening again after losing the connection
+LISTEN_RETRY = 5.0
+
+
+@attrs.define
+class ObjectCacheStats:
+    """
+    Counters for the object cache.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    # Entries dropped to stay under the bound
+    evictions: int = 0
+    # Entries dropped because the row changed, here or in another process
+    invalidations: int = 0
+
+
+class ObjectCache:
+    """
+    In-process LRU cache of schema objects built from database rows,
+    keyed by kind and symbol.
+
+    An entry is dropped when this process changes its row. With `notify`
+    that change is sent to every other process over Postgres
+    LISTEN/NOTIFY, in the same transaction, and they drop it too. Callers
+    always get their own copy, as the objects are changed in place.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = None, notify: Optional[bool] = None
+    ) -> None:
+        self.max_entries = max_entries or config.getint(
+            "database", "cache_max_entries", fallback=10000
+        )
+        self.notify = (
+            notify
+            if notify is not None
+            else config.getboolean("database", "cache_notify", fallback=False)
+        )
+        self.entries: OrderedDict[Tuple[str, str], Any] = OrderedDict()
+        self.stats = ObjectCacheStats()
+        self._lock = threading.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    def get(self, kind: str, symbol: str) -> Optional[Any]:
+        with self._lock:
+            value = self.entries.get((kind, symbol))
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self.entries.move_to_end((kind, symbol))
+            self.stats.hits += 1
+            return deepcopy(value)
+
+    def set(self, kind: str, symbol: str, value: Any) -> None:
+        with self._lock:
+            self.entries[(kind, symbol)] = deepcopy(value)
+            self.entries.move_to_end((kind, symbol))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, kind: str, symbol: str) -> None:
+        with self._lock:
+            if self.entries.pop((kind, symbol), None) is not None:
+                self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+    def notifications(self, kind: str, symbol: str) -> List[Executable]:
+        """
+        Statements telling the other processes an entry's row has changed,
+        to run in the transaction that changes it.
+        """
+        if not self.notify:
+            return []
+        return [select(func.pg_notify(CHANNEL, f"{kind}:{symbol}"))]
+
+    def listen(self) -> None:
+        """
+        Start dropping entries other processes invalidate, if we are
+        told about them and are not listening already.
+        """
+        if self.notify and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        def received(connection: Any, pid: int, channel: str, payload: str) -> None:
+            kind, _, symbol = payload.partition(":")
+            self.delete(kind, symbol)
+
+        while True:
+            try:
+                connection = await asyncpg.connect(DATABASE_URL)
+            except (OSError, asyncpg.PostgresError):
+                log.exception("Could not listen for cache invalidations")
+                await asyncio.sleep(LISTEN_RETRY)
+                continue
+            try:
+                await connection.add_listener(CHANNEL, received)
+                # Anything could have changed while we were not listening
+                self.clear()
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await closed.wait()
+                log.warning("Stopped listening for cache invalidations")
+                self.clear()
+            finally:
+                await connection.close()
+
+
+db_cache = ObjectCache()
+
+request_metrics.stats.gauge(
+    "db_cache_lookups",
+    "Lookups in the object cache, by outcome",
+    lambda: [
+        ({"outcome": "hit"}, db_cache.stats.hits),
+        ({"outcome": "miss"}, db_cache.stats.misses),
+    ],
+)
+request_metrics.stats.gauge(
+    "db_cache_entries",
+    "Objects held in the object cache",
+    lambda: [({}, len(db_cache.entries))],
+)
@@ -0,0 +1,161 @@
+import enum
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Self
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+from sqlalchemy.dialects.postgresql import insert
+
+from src.db import get_db
+from src.db.base_class import Base
+from src.support.datetime import utc_now
+
+
+class ShipStatusEnum(enum.StrEnum):
+    # No action, free for any worker to give it one
+    IDLE = "idle"
+    # Has an action, run by whichever worker holds its lease
+    WORKING = "working"
+
+
+class ShipAssignmentModel(Base):
+    """
+    What each ship should be doing and which worker is doing it.
+
+    A worker holds a ship for as long as it keeps renewing the lease.
+    If it crashes the lease runs out and another worker claims the ship
+    and carries on with the same action and parameters.
+    """
+
+    __tablename__ = "ship_assignments"
+
+    ship_symbol: orm.Mapped[str] = orm.mapped_column(primary_key=True)
+    status: orm.Mapped[ShipStatusEnum] = orm.mapped_column(
+        default=ShipStatusEnum.IDLE, index=True
+    )
+    action: orm.Mapped[Optional[str]]
+    parameters: orm.Mapped[Dict[str, Any]] = orm.mapped_column(default=lambda: {})
+    worker: orm.Mapped[Optional[str]]
+    lease_expires: orm.Mapped[Optional[datetime]] = orm.mapped_column(
+        sa.DateTime(timezone=True), index=True
+    )
+    heartbeat: orm.Mapped[Optional[datetime]] = orm.mapped_column(
+        sa.DateTime(timezone=True)
+    )
+
+    @classmethod
+    def register_idle(cls, ship_symbol: str) -> None:
+        """
+        Add a ship as idle, unless we already know about it.
+        """
+        with get_db() as db:
+            db.execute(
+                insert(cls)
+                .values(ship_symbol=ship_symbol, status=ShipStatusEnum.IDLE)
+                .on_conflict_do_nothing(index_elements=[cls.ship_symbol])
+            )
+            db.commit()
+
+    @classmethod
+    def assign(
+        cls, ship_symbol: str, action: Optional[str], parameters: Dict[str, Any]
+    ) -> None:
+        """
+        Give a ship an action, or None to make it idle. Whoever holds the
+        ship lets it go at their next heartbeat and it is claimed afresh.
+        """
+        values = dict(
+            action=action,
+            parameters=parameters,
+            status=ShipStatusEnum.WORKING if action else ShipStatusEnum.IDLE,
+            worker=None,
+            lease_expires=None,
+        )
+        with get_db() as db:
+            db.execute(
+                insert(cls)
+                .values(ship_symbol=ship_symbol, **values)
+                .on_conflict_do_update(index_elements=[cls.ship_symbol], set_=values)
+            )
+            db.commit()
+
+    @classmethod
+    def claim(
+        cls,
+        worker: str,
+        actions: List[str],
+        limit: int,
+        lease: float,
+        idle_action: Optional[str] = None,
+        idle_parameters: Optional[Dict[str, Any]] = None,
+    ) -> List[Self]:
+        """
+        Take up to `limit` ships doing one of `actions` that nobody holds.
+        With `idle_action`, idle ships are taken too and given that action.
+        Rows another worker is claiming at the same moment are skipped.
+        """
+        now = utc_now()
+        free = sa.or_(cls.lease_expires.is_(None), cls.lease_expires < now)
+        wanted = cls.action.in_(actions)
+        if idle_action:
+            wanted = sa.or_(wanted, cls.action.is_(None))
+        with get_db() as db:
+            claimed = (
+                db.query(cls)
+                .filter(free, wanted)
+                .order_by(cls.ship_symbol)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            for assignment in claimed:
+                if assignment.action is None:
+                    assignment.action = idle_action
+                    assignment.parameters = idle_parameters or {}
+                assignment.status = ShipStatusEnum.WORKING
+                assignment.worker = worker
+                assignment.heartbeat = now
+                assignment.lease_expires = now + timedelta(seconds=lease)
+            db.commit()
+            for assignment in claimed:
+                db.expunge(assignment)
+        return claimed
+
+    @classmethod
+    def renew(cls, worker: str, ship_symbols: List[str], lease: float) -> List[str]:
+        """
+        Extend the worker's lease on its ships. Returns the ones it still
+        holds, a ship missing from it was taken away or reassigned.
+        """
+        now = utc_now()
+        with get_db() as db:
+            result = db.execute(
+                sa.update(cls)
+                .where(cls.worker == worker, cls.ship_symbol.in_(ship_symbols))
+                .values(heartbeat=now, lease_expires=now + timedelta(seconds=lease))
+                .returning(cls.ship_symbol)
+            )
+            held = [row.ship_symbol for row in result]
+            db.commit()
+        return held
+
+    @classmethod
+    def release(cls, worker: str, ship_symbol: str, finished: bool) -> None:
+        """
+        Let go of a ship. If its action is `finished` the ship becomes idle.
+        """
+        values: Dict[str, Any] = dict(worker=None, lease_expires=None)
+        if finished:
+            values.update(action=None, parameters={}, status=ShipStatusEnum.IDLE)
+        with get_db() as db:
+            db.execute(
+                sa.update(cls)
+                .where(cls.worker == worker, cls.ship_symbol == ship_symbol)
+                .values(**values)
+            )
+            db.commit()
+
+    @classmethod
+    def all(cls) -> List[Self]:
+        with get_db() as db:
+            return db.query(cls).order_by(cls.ship_symbol).all()
@@ -1,5 +1,7 @@
+from datetime import datetime
 from typing import Any, Dict, List
 
+import sqlalchemy as sa
 from sqlalchemy import orm
 
 from src.db.base_class import Base
@@ -7,9 +9,13 @@ from src.db.base_class import Base
 
 class SurveyModel(Base):
     __tablename__ = "surveys"
+    # Finding the best survey at a waypoint only looks at the ones unexpired
+    __table_args__ = (
+        sa.Index("ix_surveys_symbol_size_expiration", "symbol", "size", "expiration"),
+    )
 
     signature: orm.Mapped[str] = orm.mapped_column(primary_key=True)
     symbol: orm.Mapped[str]
     deposits: orm.Mapped[List[Dict[str, Any]]]
-    expiration: orm.Mapped[str]
+    expiration: orm.Mapped[datetime] = orm.mapped_column(sa.DateTime(timezone=True))
     size: orm.Mapped[str]
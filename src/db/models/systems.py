@@ -3,9 +3,10 @@ from datetime import datetime
 from typing import Any, Dict, List, Self
 from uuid import UUID, uuid4
 
-from sqlalchemy import orm
+from sqlalchemy import func, orm, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db import get_db
+from src.db import get_async_db, get_db
 from src.db.base_class import Base
 from src.support.datetime import utc_now
 
@@ -46,6 +47,28 @@ class SystemMappingStatusModel(Base):
             db.add(sm)
             db.commit()
 
+    @classmethod
+    async def async_set_mapping(
+        cls, db: AsyncSession, symbol: str, mapped: MappedEnum, ship_symbol: str
+    ) -> None:
+        """
+        Like set_mapping, but in the caller's async session. Committing is
+        left to the caller so it goes in with their other changes.
+        """
+        already_exists = await db.scalar(
+            select(func.count())
+            .select_from(cls)
+            .where(
+                cls.ship_symbol == ship_symbol,
+                cls.mapped == SystemMappingMappedEnum.INCOMPLETE,
+                cls.symbol == symbol,
+                cls.mapped == mapped,
+            )
+        )
+        if already_exists == 1:
+            return
+        db.add(cls(symbol=symbol, mapped=mapped, ship_symbol=ship_symbol))
+
     @classmethod
     def in_progress_for_ship(cls, ship_symbol: str) -> List[Self]:
         """
@@ -59,6 +82,23 @@ class SystemMappingStatusModel(Base):
             )
         return results
 
+    @classmethod
+    async def async_in_progress(cls, ship_symbol: str, symbol: str) -> bool:
+        """
+        True if this ship is part way through mapping the system.
+        """
+        async with get_async_db() as db:
+            count = await db.scalar(
+                select(func.count())
+                .select_from(cls)
+                .where(
+                    cls.ship_symbol == ship_symbol,
+                    cls.mapped == SystemMappingMappedEnum.INCOMPLETE,
+                    cls.symbol == symbol,
+                )
+            )
+        return count == 1
+
 
 class SystemModel(Base):
     __tablename__ = "systems"
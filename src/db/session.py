@@ -1,9 +1,19 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from src.settings import database_url
 
 DATABASE_URL = database_url()
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
 engine = create_engine(url=DATABASE_URL, pool_size=20, max_overflow=-1)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# For coroutines, so a query waits on the event loop instead of blocking it
+async_engine = create_async_engine(
+    url=ASYNC_DATABASE_URL, pool_size=20, max_overflow=-1
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
@@ -0,0 +1,195 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+import attrs
+from sqlalchemy.dialects.postgresql import Insert, insert
+from structlog import get_logger
+
+from src.api import request_metrics
+from src.db import get_async_db
+from src.db.base_class import Base
+from src.settings import config
+
+log = get_logger(__name__)
+
+# A row to write: its model, the columns an upsert leaves alone, its values
+Pending = Tuple[Type[Base], Tuple[str, ...], Dict[str, Any]]
+# Where rows go in one statement: their model and the columns it leaves alone
+Statement = Tuple[Type[Base], Tuple[str, ...]]
+
+
+def row_values(row: Base) -> Dict[str, Any]:
+    return {c.name: getattr(row, c.name) for c in type(row).__table__.columns}
+
+
+def upsert(
+    model: Type[Base], rows: List[Dict[str, Any]], keep: Sequence[str] = ()
+) -> Insert:
+    """
+    Insert `rows`, replacing any already there with the same primary key
+    except for the columns in `keep`.
+    """
+    primary_key = [c.name for c in model.__table__.primary_key]
+    statement = insert(model).values(rows)
+    updates = {
+        c.name: statement.excluded[c.name]
+        for c in model.__table__.columns
+        if c.name not in primary_key and c.name not in keep
+    }
+    return statement.on_conflict_do_update(index_elements=primary_key, set_=updates)
+
+
+@attrs.define
+class WriteStats:
+    """
+    Counters for the write behind queue.
+    """
+
+    rows: int = 0
+    batches: int = 0
+    # Rows for the same key queued again before the last one was written
+    merged: int = 0
+    # Rows lost because their batch could not be written
+    failed: int = 0
+
+
+class WriteBehind:
+    """
+    Collects rows to persist and writes them in batches, off the path of
+    the ship that produced them.
+
+    Rows are written every `interval` seconds, or sooner once
+    `batch_size` are waiting, one multi-row upsert per table. A row for a
+    key already in the database replaces it, so saving something twice is
+    not an error. Once `max_pending` rows are waiting, whoever adds the
+    next one waits while the batch is written.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        self.batch_size = batch_size or config.getint(
+            "database", "write_batch_size", fallback=200
+        )
+        self.interval = interval or config.getfloat(
+            "database", "write_interval", fallback=1.0
+        )
+        self.max_pending = max_pending or config.getint(
+            "database", "write_max_pending", fallback=5000
+        )
+        self.pending: List[Pending] = []
+        self.stats = WriteStats()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._closing = False
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, row: Base, keep: Sequence[str] = ()) -> None:
+        """
+        Queue a model instance to be upserted. Columns in `keep` are only
+        set when the row is new, an existing row keeps its values for them.
+        """
+        self._start()
+        while len(self.pending) >= self.max_pending:
+            await self.flush()
+        self.pending.append((type(row), tuple(keep), row_values(row)))
+        if len(self.pending) >= self.batch_size:
+            assert self._wake is not None
+            self._wake.set()
+
+    async def flush(self) -> None:
+        """
+        Write everything queued so far.
+        """
+        if self._lock is None:
+            return
+        async with self._lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                # Cancelled mid write: the batch may not be in, so queue it
+                # again. Writing it twice is harmless, it is an upsert.
+                self.pending = batch + self.pending
+                raise
+
+    async def close(self) -> None:
+        """
+        Stop writing in the background and write what is left.
+        """
+        if self._task is None:
+            return
+        assert self._wake is not None
+        # Let the loop finish the batch it may be writing, rather than
+        # cancelling it half way through
+        self._closing = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+        self._task = None
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while not self._closing:
+            # Not wait_for, which can swallow close()'s cancellation if
+            # the event is set at the same moment
+            try:
+                async with asyncio.timeout(self.interval):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def _write(self, batch: List[Pending]) -> None:
+        # One statement per table, and one row per key: an upsert can not
+        # touch the same row twice, so the last one queued wins.
+        tables: Dict[Statement, Dict[Tuple, Dict[str, Any]]] = {}
+        for model, keep, values in batch:
+            key = tuple(values[c.name] for c in model.__table__.primary_key)
+            rows = tables.setdefault((model, keep), {})
+            if key in rows:
+                self.stats.merged += 1
+            rows[key] = values
+        try:
+            async with get_async_db() as db:
+                for (model, keep), rows in tables.items():
+                    await db.execute(upsert(model, list(rows.values()), keep))
+                await db.commit()
+        except Exception:
+            lost = sum(len(rows) for rows in tables.values())
+            self.stats.failed += lost
+            log.exception("Could not write batch", rows=lost)
+            return
+        self.stats.batches += 1
+        self.stats.rows += sum(len(rows) for rows in tables.values())
+
+
+writer = WriteBehind()
+
+request_metrics.stats.gauge(
+    "db_write_pending",
+    "Rows waiting in the write behind queue",
+    lambda: [({}, len(writer.pending))],
+)
+request_metrics.stats.gauge(
+    "db_write_rows",
+    "Rows written by the write behind queue, by outcome",
+    lambda: [
+        ({"outcome": "written"}, writer.stats.rows),
+        ({"outcome": "merged"}, writer.stats.merged),
+        ({"outcome": "failed"}, writer.stats.failed),
+    ],
+)
@@ -46,11 +46,11 @@ class ShipExplore(AbstractShipNavigate, AbstractShipJump, AbstractShipChart):
                 # If it is a shipyard
                 # Record what ships are for sale and what price.
                 # Record that we have visited it, what it is, what the traits are, etc.
-                waypoint.set_mapped()
+                await waypoint.async_set_mapped()
                 self.console.print(
                     f"{blue(ship.symbol)} mapped waypoint {yellow(waypoint.symbol)}"
                 )
-        current_system.mapping_complete(ship_symbol=ship.symbol)
+        await current_system.async_mapping_complete(ship_symbol=ship.symbol)
         self.console.print(
             f"{blue(ship.symbol)} mapped system {yellow(current_system.symbol)}"
         )
@@ -62,18 +62,15 @@ class ShipExplore(AbstractShipNavigate, AbstractShipJump, AbstractShipChart):
         self.console.print(f"{blue(ship.symbol)} @ {yellow(current_system.symbol)}")
         if current_system.mapped == MappedEnum.UN_MAPPED:
             # Claim it!
-            current_system.mapping_in_progress(ship.symbol)
+            await current_system.async_mapping_in_progress(ship.symbol)
             self.console.print(
                 f"{blue(ship.symbol)} mapping {yellow(current_system.symbol)}"
             )
             self.mapping_this_system = True
         if current_system.mapped == MappedEnum.INCOMPLETE:
             # Are we the one working on it?
-            ship_mapping_this = (
-                SystemMappingStatusModel.in_progress_for_ship(ship.symbol)
-                .filter(SystemMappingStatusModel.symbol == current_system.symbol)
-                .count()
-                == 1
+            ship_mapping_this = await SystemMappingStatusModel.async_in_progress(
+                ship_symbol=ship.symbol, symbol=current_system.symbol
             )
             if ship_mapping_this:
                 self.console.print(
@@ -20,12 +20,14 @@ class MiningLoop(AbstractShipNavigate, AbstractSellCargo, AbstractMining):
     def name(self) -> str:
         return f"Ship {self.ship_symbol} mining loop @ {self.destination}"
 
+    def report_earnings(self, ship: Ship) -> None:
+        self.console.print(
+            f"{blue(ship.symbol)} total earned from mining = {pink(self.cargo_sales - self.expenses)}"
+        )
+
     async def process(self):
         ship = await Ship.get(symbol=self.ship_symbol)
         ship = await self.navigate_to(ship, self.destination)
         ship = await self.mine_until_cargo_full(ship, self.destination)
         ship = await self.sell_cargo(ship)
-
-        self.console.print(
-            f"{blue(ship.symbol)} total earned from mining = {pink(self.cargo_sales - self.expenses)}"
-        )
+        self.report_earnings(ship)
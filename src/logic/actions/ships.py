@@ -1,7 +1,7 @@
 import asyncio
 from abc import ABC
 from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 import attrs
 from rich.console import Console
@@ -13,10 +13,12 @@ from src.schemas.ships import Cargo, Nav, Ship
 from src.schemas.systems import JumpGate, System
 from src.schemas.transactions import Transaction
 from src.schemas.waypoint import Chart, Waypoint
-from src.support.datetime import local_now
 from src.support.distance import euclidean_distance
 from src.support.tables import blue, pink, report_result, yellow
 
+# Seconds to wait past the arrival time before checking the ship is there
+ARRIVAL_MARGIN = 0.5
+
 
 class AbstractMining(ABC):
     with_surveys: bool
@@ -24,58 +26,58 @@ class AbstractMining(ABC):
 
     async def mine_until_cargo_full(self, ship: Ship, destination: str) -> Ship:
         await ship.orbit()
-        cargo_status = await ship.cargo_status()
-        match cargo_status:
-            case Error():
-                report_result(cargo_status, Cargo)
-            case Cargo():
-                if cargo_status.units == cargo_status.capacity:
-                    self.console.print(f"{blue(ship.symbol)} cargo is full")
-                    report_result(cargo_status, Cargo)
-                    return ship
+        # Every extraction brings back the new cargo, so ship.cargo stays current
+        if ship.cargo.units == ship.cargo.capacity:
+            self.console.print(f"{blue(ship.symbol)} cargo is full")
+            report_result(ship.cargo, Cargo)
+            return ship
+
+        self.console.print(f"{blue(ship.symbol)} mining @ {yellow(destination)}")
+        mining_results: Dict[str, int] = defaultdict(int)
+        while ship.cargo.units < ship.cargo.capacity:
+            result = await self.extract(ship, destination, mining_results)
+            if isinstance(result, Error):
+                await asyncio.sleep(1)
+            # The next extraction is held back until the cooldown is over
+        self.report_mining(ship, mining_results)
+        return ship
 
+    async def extract(
+        self, ship: Ship, destination: str, mining_results: Dict[str, int]
+    ) -> Union[Dict, Error]:
+        """
+        Extract once, with the best survey of the destination if we are
+        using them, adding the yield to `mining_results`.
+        """
+        valid_survey = None
+        if self.with_surveys:
+            valid_survey = await Survey.async_best(symbol=destination)
+            if valid_survey:
                 self.console.print(
-                    f"{blue(ship.symbol)} mining @ {yellow(destination)}"
+                    f"{blue(ship.symbol)} using survey {blue(valid_survey.signature)} to mine"
                 )
-                mining_results: Dict[str, int] = defaultdict(int)
-                mining_table = Table(title=f"{blue(ship.symbol)} mining results")
-                mining_table.add_column("symbol")
-                mining_table.add_column("yield")
-                while cargo_status.units < cargo_status.capacity:
-                    valid_survey = None
-                    if self.with_surveys:
-                        surveys = Survey.filter(
-                            symbol=destination, size=["MODERATE", "LARGE"]
-                        )
-                        for s in surveys:
-                            if s.expiration.local_time > local_now():
-                                valid_survey = s
-                        if valid_survey:
-                            self.console.print(
-                                f"{blue(ship.symbol)} using survey {blue(valid_survey.signature)} to mine"
-                            )
-                    result = await ship.extract(survey=valid_survey)
-                    match result:
-                        case Error():
-                            if result.data:
-                                cooldown = result.data.get("cooldown")
-                                if cooldown:
-                                    await asyncio.sleep(cooldown["remainingSeconds"])
-                            self.console.print(result)
-                            await asyncio.sleep(1)
-                        case dict():
-                            extraction: Extraction = result["extraction"]
-                            mining_results[
-                                extraction.yield_["symbol"]
-                            ] += extraction.yield_["units"]
-                            cooldown = result["cooldown"].remainingSeconds
-                            await asyncio.sleep(cooldown)
-                    cargo_status = await ship.cargo_status()
-                for symbol, units in mining_results.items():
-                    mining_table.add_row(symbol, str(units))
+        result = await ship.extract(survey=valid_survey)
+        match result:
+            case Error():
+                if result.code == 4228:
+                    # The hold is full after all, our cargo was out of date
+                    await ship.cargo_status()
+                self.console.print(result)
+            case dict():
+                extraction: Extraction = result["extraction"]
+                mining_results[extraction.yield_["symbol"]] += extraction.yield_[
+                    "units"
+                ]
+        return result
+
+    def report_mining(self, ship: Ship, mining_results: Dict[str, int]) -> None:
+        mining_table = Table(title=f"{blue(ship.symbol)} mining results")
+        mining_table.add_column("symbol")
+        mining_table.add_column("yield")
+        for symbol, units in mining_results.items():
+            mining_table.add_row(symbol, str(units))
         self.console.print(f"{blue(ship.symbol)} finished mining")
         self.console.print(mining_table)
-        return ship
 
 
 class AbstractSellCargo(ABC):
@@ -88,43 +90,39 @@ class AbstractSellCargo(ABC):
         Sell all the contents of the cargo except trade good.
         """
         await ship.dock()
-        cargo = await ship.cargo_status()
-
-        match cargo:
-            case Error():
-                report_result(cargo, Cargo)
-            case Cargo():
-                self.console.print(f"{blue(ship.symbol)} selling cargo")
-                this_cargo_sale = 0
-                cargo_table = Table(title=f"{blue(ship.symbol)} cargo sold")
-                cargo_table.add_column("symbol")
-                cargo_table.add_column("units")
-                cargo_table.add_column("price per unit")
-                cargo_table.add_column("total price")
-                items_units = [
-                    (x.symbol, x.units)
-                    for x in cargo.inventory
-                    if x.symbol not in do_not_sell_symbols
-                ]
-                for symbol, units in items_units:
-                    result = await ship.sell(symbol=symbol, amount=units)
-                    match result:
-                        case Error():
-                            report_result(result, Ship)
-                        case dict():
-                            transaction: Transaction = result["transaction"]
-                            cargo_table.add_row(
-                                symbol,
-                                str(units),
-                                str(transaction.pricePerUnit),
-                                str(transaction.totalPrice),
-                            )
-                            self.cargo_sales += transaction.totalPrice
-                            this_cargo_sale += transaction.totalPrice
-                self.console.print(cargo_table)
-                self.console.print(
-                    f"{blue(ship.symbol)} earned from sales: {pink(this_cargo_sale)}"
-                )
+        # Kept current by the responses to our actions, no need to ask again
+        cargo = ship.cargo
+        self.console.print(f"{blue(ship.symbol)} selling cargo")
+        this_cargo_sale = 0
+        cargo_table = Table(title=f"{blue(ship.symbol)} cargo sold")
+        cargo_table.add_column("symbol")
+        cargo_table.add_column("units")
+        cargo_table.add_column("price per unit")
+        cargo_table.add_column("total price")
+        items_units = [
+            (x.symbol, x.units)
+            for x in cargo.inventory
+            if x.symbol not in do_not_sell_symbols
+        ]
+        for symbol, units in items_units:
+            result = await ship.sell(symbol=symbol, amount=units)
+            match result:
+                case Error():
+                    report_result(result, Ship)
+                case dict():
+                    transaction: Transaction = result["transaction"]
+                    cargo_table.add_row(
+                        symbol,
+                        str(units),
+                        str(transaction.pricePerUnit),
+                        str(transaction.totalPrice),
+                    )
+                    self.cargo_sales += transaction.totalPrice
+                    this_cargo_sale += transaction.totalPrice
+        self.console.print(cargo_table)
+        self.console.print(
+            f"{blue(ship.symbol)} earned from sales: {pink(this_cargo_sale)}"
+        )
         return ship
 
 
@@ -145,15 +143,25 @@ class AbstractShipNavigate(ABC):
         If dock is true, will attempt to dock when arrived.
         If refuel is true, will refuel if the destination waypoint has a marketplace and is selling fuel.
         """
+        nav = await self.depart(ship, destination)
+        while (wait := self.arrival_wait(ship, nav)) is not None:
+            await asyncio.sleep(wait)
+            nav = await ship.navigation_status()
+        if self.arrived(ship, nav, destination):
+            await self.dock_and_refuel(ship, dock=dock, refuel=refuel)
+        return ship
+
+    async def depart(self, ship: Ship, destination: str) -> Union[Nav, Error]:
+        """
+        Set off for the destination, unless the ship is there or on its
+        way somewhere already. Returns where it is going.
+        """
         self.navigate_waypoint = await Waypoint.get(symbol=destination)
-        if ship.nav.waypointSymbol == destination and ship.nav.status in [
-            "IN_ORBIT",
-            "DOCKED",
-        ]:
-            # Ship is already at this location
-            self.console.print(f"{blue(ship.symbol)} arrived @ {yellow(destination)}")
-            return ship
-        result = await ship.orbit()
+        if ship.nav.current_status == "IN_TRANSIT" or (
+            ship.nav.waypointSymbol == destination
+        ):
+            return ship.nav
+        await ship.orbit()
 
         self.console.print(
             f"{blue(ship.symbol)} navigating to destination {yellow(destination)}"
@@ -162,26 +170,54 @@ class AbstractShipNavigate(ABC):
             # Probes always have a solar-powered drive, so we should always BURN
             self.console.print(f"{blue(ship.symbol)} set flight mode to BURN")
             await ship.update_navigation(flight_mode="BURN")
-        arrived = False
-        await ship.navigate(waypoint=destination)
-        while arrived is False:
-            result = await ship.navigation_status()
-            if result.waypointSymbol == destination and result.status == "IN_ORBIT":
-                arrived = True
-            else:
-                # This will display seconds to arrival
-                result = await ship.navigate(waypoint=destination)
-                report_result(result=result, HappyClass=Nav)
-                cooldown = result.data["secondsToArrival"]
-                await asyncio.sleep(cooldown)
+        nav = await ship.navigate(waypoint=destination)
+        if isinstance(nav, Error):
+            report_result(result=nav, HappyClass=Nav)
+            # It may already be on its way, find out where to
+            nav = await ship.navigation_status()
+        return nav
+
+    def arrival_wait(self, ship: Ship, nav: Union[Nav, Error]) -> Optional[float]:
+        """
+        Seconds until the ship should be checked on again, None if it is
+        not in transit.
+        """
+        if not isinstance(nav, Nav) or nav.status != "IN_TRANSIT":
+            return None
+        # The arrival time is all we need, one check once it has passed
+        wait = nav.seconds_to_arrival + ARRIVAL_MARGIN
+        self.console.print(
+            f"{blue(ship.symbol)} arriving @ {yellow(nav.waypointSymbol)} in {pink(round(wait))} seconds"
+        )
+        return wait
 
+    def arrived(self, ship: Ship, nav: Union[Nav, Error], destination: str) -> bool:
+        if not isinstance(nav, Nav) or nav.waypointSymbol != destination:
+            report_result(result=nav, HappyClass=Nav)
+            self.console.print(
+                f"{blue(ship.symbol)} did not make it to {yellow(destination)}"
+            )
+            return False
         self.console.print(
             f"{blue(ship.symbol)} arrived @ {yellow(destination)}",
         )
+        return True
+
+    async def dock_and_refuel(
+        self, ship: Ship, dock: Optional[bool] = True, refuel: Optional[bool] = True
+    ) -> Ship:
+        """
+        Dock at the waypoint the ship navigated to, and fill the tank if
+        it is not full and the waypoint sells fuel.
+        """
         if dock:
             self.console.print(f"{blue(ship.symbol)} docking")
             await ship.dock()
-        if refuel and await self.navigate_waypoint.can_refuel():
+        if (
+            refuel
+            and ship.fuel.current < ship.fuel.capacity
+            and await self.navigate_waypoint.can_refuel(agent=ship.agent)
+        ):
             self.console.print(f"{blue(ship.symbol)} refueling")
             result = await ship.refuel()
             match result:
@@ -256,7 +292,7 @@ class AbstractShipJump(ABC):
                     self.console.print(
                         f"{blue(ship.symbol)} jump arriving in {pink(cooldown)} seconds"
                     )
-                    await asyncio.sleep(cooldown)
+                    await ship.wait_for_cooldown()
                     self.console.print(
                         f"{blue(ship.symbol)} arrived @ {yellow(destination)}"
                     )
@@ -290,7 +326,7 @@ class AbstractShipChart(ABC):
                 self.console.print(
                     f"{blue(ship.symbol)} charted {yellow(chart.waypointSymbol)}!"
                 )
-                chart.save()
+                await chart.async_save()
         return ship
 
 
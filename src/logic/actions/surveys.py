@@ -1,14 +1,12 @@
-from datetime import datetime
-from time import sleep
-from typing import List
+from typing import Dict, List, Union
 
 import attrs
 from rich.console import Console
 
+from src.logic.reaper import survey_reaper
 from src.schemas.errors import Error
 from src.schemas.mining import Survey
 from src.schemas.ships import Ship
-from src.support.datetime import local_now
 from src.support.tables import blue, report_result, yellow
 
 from .ships import AbstractShipNavigate
@@ -34,14 +32,20 @@ class SurveyDestinationAction(AbstractShipNavigate):
         """
         Surveys a destination
         """
+        await self.survey_once(ship)
+        # Cooldowns from a survey or its refusal are both recorded
+        await ship.wait_for_cooldown()
+        return ship
+
+    async def survey_once(self, ship: Ship) -> Union[Dict, Error]:
+        """
+        Survey once, saving the surveys worth mining with, without waiting
+        for the cooldown.
+        """
         result = await ship.survey()
         match result:
             case Error():
                 report_result(result, Survey)
-                if result.data:
-                    cooldown = result.data.get("cooldown")
-                    if cooldown:
-                        sleep(cooldown["remainingSeconds"])
             case dict():
                 surveys: List[Survey] = result["surveys"]
                 for survey in surveys:
@@ -49,30 +53,17 @@ class SurveyDestinationAction(AbstractShipNavigate):
                         self.console.print(
                             f"{blue(ship.symbol)} found survey {yellow(survey.signature)} yield {survey.size}"
                         )
-                        survey.save()
+                        await survey.async_save()
                     else:
                         self.console.print("Survey rubbish, discarding...")
-                cooldown = result["cooldown"].remainingSeconds
-                sleep(cooldown)
-        return ship
-
-    def remove_old_surveys(self, current_time: datetime) -> None:
-        current_surveys = Survey.filter(symbol=self.destination)
-        dropped_count: int = 0
-        for survey in current_surveys:
-            if survey.expiration.local_time < current_time:
-                survey.drop()
-                dropped_count += 1
-
-        self.console.print(f"Cleaned up {dropped_count} expired surveys...")
+        return result
 
     async def process(self):
         self.console.rule(self.name)
         ship = await Ship.get(symbol=self.ship_symbol)
         ship = await self.navigate_to(ship, self.destination)
         await ship.orbit()
+        if self.clean_up_old_surveys:
+            survey_reaper.start()
         while True:
-            current_time = local_now()
-            if self.clean_up_old_surveys:
-                self.remove_old_surveys(current_time=current_time)
             ship = await self.survey(ship)
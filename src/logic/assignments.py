@@ -0,0 +1,127 @@
+import asyncio
+import os
+import socket
+from typing import Any, Dict, List, Optional, Set
+from uuid import uuid4
+
+from structlog import get_logger
+
+from src.db.models.ships import ShipAssignmentModel
+from src.settings import config
+
+from .jobs import MiningJob, SurveyJob
+from .scheduler import FleetScheduler, ShipJob
+
+log = get_logger(__name__)
+
+# What a ship can be assigned to do, its parameters are the job's arguments
+JOBS = {"mining": MiningJob, "survey": SurveyJob}
+
+LEASE_SECONDS = config.getfloat("fleet", "lease_seconds", fallback=60.0)
+CLAIM_INTERVAL = config.getfloat("fleet", "claim_interval", fallback=5.0)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+
+
+class AssignmentWorker:
+    """
+    Runs the ships it claims from the assignment table.
+
+    Every `interval` seconds it renews the lease on the ships it holds,
+    stops any it no longer holds, and claims more up to `max_ships`.
+    Ships whose action finishes go back to idle. If the worker dies its
+    leases run out and another worker picks the ships up where they are.
+    """
+
+    def __init__(
+        self,
+        actions: List[str],
+        max_ships: int,
+        idle_action: Optional[str] = None,
+        idle_parameters: Optional[Dict[str, Any]] = None,
+        lease: float = LEASE_SECONDS,
+        interval: float = CLAIM_INTERVAL,
+    ) -> None:
+        self.name = worker_name()
+        self.actions = actions
+        self.max_ships = max_ships
+        self.idle_action = idle_action
+        self.idle_parameters = idle_parameters
+        self.lease = lease
+        self.interval = interval
+        self.scheduler = FleetScheduler(on_finished=self._finished)
+        # Releases of finished ships still being written
+        self.releases: Set[asyncio.Task] = set()
+
+    async def _release(self, ship_symbol: str, finished: bool) -> None:
+        try:
+            await asyncio.to_thread(
+                ShipAssignmentModel.release, self.name, ship_symbol, finished
+            )
+        except Exception:
+            # The lease runs out in the end, and someone claims it again
+            log.exception("Could not release ship", ship=ship_symbol)
+
+    def _finished(self, job: ShipJob) -> None:
+        # Called from the scheduler's worker, which can not wait on it
+        task = asyncio.create_task(self._release(job.ship_symbol, finished=True))
+        self.releases.add(task)
+        task.add_done_callback(self.releases.discard)
+
+    async def _start(self, assignment: ShipAssignmentModel) -> None:
+        job_class = JOBS.get(assignment.action or "")
+        try:
+            if job_class is None:
+                raise TypeError(f"unknown action {assignment.action}")
+            job = job_class(ship_symbol=assignment.ship_symbol, **assignment.parameters)
+        except TypeError as exc:
+            log.error("Bad assignment", ship=assignment.ship_symbol, error=str(exc))
+            # Back to idle rather than failing the same way every claim
+            await self._release(assignment.ship_symbol, finished=True)
+            return
+        log.info("Claimed ship", ship=job.ship_symbol, action=assignment.action)
+        self.scheduler.add(job)
+
+    async def tick(self) -> None:
+        held = list(self.scheduler.jobs)
+        if held:
+            renewed = await asyncio.to_thread(
+                ShipAssignmentModel.renew, self.name, held, self.lease
+            )
+            for symbol in set(held) - set(renewed):
+                log.info("Lost ship", ship=symbol)
+                self.scheduler.remove(symbol)
+        room = self.max_ships - len(self.scheduler.jobs)
+        if room > 0:
+            claimed = await asyncio.to_thread(
+                ShipAssignmentModel.claim,
+                self.name,
+                self.actions,
+                room,
+                self.lease,
+                self.idle_action,
+                self.idle_parameters,
+            )
+            for assignment in claimed:
+                await self._start(assignment)
+
+    async def run(self) -> None:
+        runner = asyncio.create_task(self.scheduler.run(forever=True))
+        try:
+            while not runner.done():
+                await self.tick()
+                await asyncio.sleep(self.interval)
+            runner.result()
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            # Other workers can have them straight away, not when the lease ends
+            await asyncio.gather(
+                *self.releases,
+                *[
+                    self._release(symbol, finished=False)
+                    for symbol in list(self.scheduler.jobs)
+                ],
+            )
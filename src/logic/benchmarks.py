@@ -0,0 +1,86 @@
+import asyncio
+from time import monotonic
+from typing import List
+
+import attrs
+
+from src.db import get_async_db, get_db
+from src.db.models.waypoints import WaypointModel
+from src.schemas.mining import Survey
+from src.schemas.waypoint import Waypoint
+
+# Seconds between the lag monitor's ticks
+TICK = 0.01
+
+
+@attrs.define
+class LoopLag:
+    """
+    How late the event loop ran a timer, over a benchmark run.
+    """
+
+    ships: int
+    queries: int
+    seconds: float
+    samples: List[float] = attrs.field(factory=list)
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    @property
+    def max(self) -> float:
+        return max(self.samples, default=0.0)
+
+
+async def _monitor(lag: LoopLag, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        expected = monotonic() + TICK
+        await asyncio.sleep(TICK)
+        lag.samples.append(max(0.0, monotonic() - expected))
+
+
+async def _ship(destination: str, rounds: int, use_async: bool) -> int:
+    """
+    The database side of a mining ship: look up where it is and the
+    surveys there, as the mining loop does between extractions. The
+    waypoint is read from its table rather than through from_db, whose
+    cache would answer every lookup after the first.
+    """
+    for _ in range(rounds):
+        if use_async:
+            async with get_async_db() as db:
+                if model := await db.get(WaypointModel, destination):
+                    Waypoint.from_model(model)
+            await Survey.async_filter(symbol=destination, size=["MODERATE", "LARGE"])
+        else:
+            with get_db() as db:
+                if model := db.get(WaypointModel, destination):
+                    Waypoint.from_model(model)
+            Survey.filter(symbol=destination, size=["MODERATE", "LARGE"])
+        # Where a ship would wait on the API
+        await asyncio.sleep(0)
+    return rounds * 2
+
+
+async def loop_lag(
+    destination: str, ships: int = 50, rounds: int = 20, use_async: bool = True
+) -> LoopLag:
+    """
+    Run `ships` coroutines making database queries at once and measure
+    how late a timer on the same event loop fires.
+    """
+    lag = LoopLag(ships=ships, queries=0, seconds=0.0)
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor(lag, stop))
+    started = monotonic()
+    queries = await asyncio.gather(
+        *[_ship(destination, rounds, use_async) for _ in range(ships)]
+    )
+    lag.seconds = monotonic() - started
+    lag.queries = sum(queries)
+    stop.set()
+    await monitor
+    return lag
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from typing import Dict, Optional
+
+import attrs
+
+from src.api import cooldowns
+from src.schemas.errors import Error
+from src.schemas.ships import Ship
+from src.support.tables import blue, report_result
+
+from .actions.mining import MiningLoop
+from .actions.ships import AbstractShipNavigate
+from .actions.surveys import SurveyDestinationAction
+from .reaper import survey_reaper
+from .scheduler import ShipJob
+
+# Seconds before trying again after the API refused something
+RETRY_DELAY = 5.0
+
+
+class TravelStates(ShipJob, AbstractShipNavigate):
+    """
+    States for getting the ship to `destination`, docking and refuelling
+    there, one step of navigate_to at a time. Jobs start in `start` and
+    carry on in `work_state` once it has arrived.
+    """
+
+    destination: str
+    work_state: str
+    _ship: Optional[Ship]
+
+    @property
+    def ship(self) -> Ship:
+        assert self._ship is not None, "the ship is loaded in the start state"
+        return self._ship
+
+    async def on_start(self) -> Optional[float]:
+        ship = await Ship.get(self.ship_symbol, cached=True)
+        if isinstance(ship, Error):
+            report_result(ship, Ship)
+            return RETRY_DELAY
+        self._ship = ship
+        return self.goto("travel")
+
+    async def on_travel(self) -> Optional[float]:
+        nav = await self.depart(self.ship, self.destination)
+        return self.goto("arrive", self.arrival_wait(self.ship, nav) or 0.0)
+
+    async def on_arrive(self) -> Optional[float]:
+        nav = await self.ship.navigation_status()
+        if isinstance(nav, Error):
+            report_result(nav, Ship)
+            return RETRY_DELAY
+        if (wait := self.arrival_wait(self.ship, nav)) is not None:
+            return wait
+        if not self.arrived(self.ship, nav, self.destination):
+            return self.goto("travel", RETRY_DELAY)
+        return self.goto("refuel")
+
+    async def on_refuel(self) -> Optional[float]:
+        await self.dock_and_refuel(self.ship)
+        return self.goto(self.work_state)
+
+
+@attrs.define
+class MiningJob(TravelStates, MiningLoop):
+    """
+    MiningLoop as a state machine: mine at the destination until the hold
+    is full, sell it all there, repeat.
+    """
+
+    state: str = "start"
+    work_state: str = "extract"
+    _ship: Optional[Ship] = None
+    mining_results: Dict[str, int] = attrs.field(factory=lambda: defaultdict(int))
+
+    async def on_extract(self) -> Optional[float]:
+        ship = self.ship
+        if not ship.cargo.capacity:
+            self.console.print(f"{blue(ship.symbol)} has no cargo hold to mine into")
+            return None
+        if ship.cargo.units >= ship.cargo.capacity:
+            self.report_mining(ship, self.mining_results)
+            self.mining_results.clear()
+            return self.goto("sell")
+        if remaining := cooldowns.remaining(ship.symbol):
+            # Wait in the timer heap rather than in the request pipeline
+            return remaining
+        await ship.orbit()
+        result = await self.extract(ship, self.destination, self.mining_results)
+        if isinstance(result, Error):
+            if result.code == 4228:
+                # The cargo has been asked for again, the hold is full
+                return 0.0
+            if result.code == 4243:
+                # Not a mining ship, trying again won't change that
+                return None
+            return cooldowns.remaining(ship.symbol) or RETRY_DELAY
+        return cooldowns.remaining(ship.symbol)
+
+    async def on_sell(self) -> Optional[float]:
+        sold = self.cargo_sales
+        ship = await self.sell_cargo(self.ship)
+        self.report_earnings(ship)
+        if self.cargo_sales == sold:
+            # Nothing would sell here, don't go straight back to a full hold
+            return self.goto("extract", RETRY_DELAY)
+        return self.goto("extract")
+
+
+@attrs.define
+class SurveyJob(TravelStates, SurveyDestinationAction):
+    """
+    SurveyDestinationAction as a state machine: survey the destination
+    endlessly, saving the surveys worth using.
+    """
+
+    state: str = "start"
+    work_state: str = "survey"
+    _ship: Optional[Ship] = None
+
+    async def on_survey(self) -> Optional[float]:
+        ship = self.ship
+        if remaining := cooldowns.remaining(ship.symbol):
+            return remaining
+        if self.clean_up_old_surveys:
+            survey_reaper.start()
+        await ship.orbit()
+        result = await self.survey_once(ship)
+        if isinstance(result, Error):
+            return cooldowns.remaining(ship.symbol) or RETRY_DELAY
+        return cooldowns.remaining(ship.symbol)
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+
+import attrs
+from structlog import get_logger
+
+from src.api import request_metrics
+from src.schemas.mining import Survey
+from src.settings import config
+
+log = get_logger(__name__)
+
+
+@attrs.define
+class ReaperStats:
+    """
+    Counters for the survey reaper.
+    """
+
+    runs: int = 0
+    errors: int = 0
+    # Expired surveys deleted, over all runs and on the last one
+    reaped: int = 0
+    last_reaped: int = 0
+    # Surveys left after the last run
+    live: int = 0
+
+
+class SurveyReaper:
+    """
+    Deletes expired surveys every `interval` seconds, all of them in
+    one statement, so surveying ships never have to clean up after
+    themselves.
+    """
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        self.interval = interval or config.getfloat(
+            "database", "survey_reap_interval", fallback=60.0
+        )
+        self.stats = ReaperStats()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """
+        Start reaping in the background, if it is not already.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def reap(self) -> int:
+        reaped = await Survey.async_drop_expired()
+        self.stats.runs += 1
+        self.stats.reaped += reaped
+        self.stats.last_reaped = reaped
+        self.stats.live = await Survey.async_count()
+        if reaped:
+            log.info("Reaped expired surveys", reaped=reaped, live=self.stats.live)
+        return reaped
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reap()
+            except Exception:
+                self.stats.errors += 1
+                log.exception("Could not reap surveys")
+            await asyncio.sleep(self.interval)
+
+
+survey_reaper = SurveyReaper()
+
+request_metrics.stats.gauge(
+    "surveys",
+    "Surveys in the database after the last reap, and expired ones it deleted",
+    lambda: [
+        ({"state": "live"}, survey_reaper.stats.live),
+        ({"state": "expired"}, survey_reaper.stats.last_reaped),
+    ],
+)
+request_metrics.stats.gauge(
+    "surveys_reaped",
+    "Expired surveys deleted by the reaper",
+    lambda: [({}, survey_reaper.stats.reaped)],
+)
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+from abc import ABC
+from itertools import count
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+
+import attrs
+from structlog import get_logger
+
+from src.api import request_metrics
+from src.settings import config
+
+log = get_logger(__name__)
+
+# Seconds before a ship whose step raised starts over, doubling with every
+# failure in a row up to the maximum
+ERROR_BACKOFF = 10.0
+MAX_ERROR_BACKOFF = 600.0
+
+
+@attrs.define
+class SchedulerStats:
+    """
+    Counters for the fleet scheduler.
+    """
+
+    steps: int = 0
+    errors: int = 0
+    finished: int = 0
+    # Seconds between a step being due and a worker starting it
+    total_lag: float = 0.0
+    max_lag: float = 0.0
+
+
+class ShipJob(ABC):
+    """
+    One ship's work as a state machine.
+
+    `step` runs the handler for the current state, `on_<state>`. A handler
+    sends the requests that state needs, moves the job to its next state
+    and returns the seconds until the ship needs looking at again, or None
+    when the job is done. It never waits on the game itself: arrivals and
+    cooldowns are waited out in the scheduler's timer heap.
+    """
+
+    ship_symbol: str
+    state: str
+    # Where the job starts over from if a step raises
+    initial_state: str = "start"
+
+    async def step(self) -> Optional[float]:
+        return await getattr(self, f"on_{self.state}")()
+
+    def goto(self, state: str, delay: float = 0.0) -> float:
+        self.state = state
+        return delay
+
+
+class FleetScheduler:
+    """
+    Runs every ship's job in one process.
+
+    A ship waiting for an arrival or a cooldown is one entry in a timer
+    heap. When it is due it goes to a fixed number of worker tasks, so a
+    bigger fleet costs a heap entry per ship rather than a coroutine
+    sleeping for each. A ship is only ever in the heap or with one worker,
+    so its steps never overlap.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        on_finished: Optional[Callable[[ShipJob], None]] = None,
+    ) -> None:
+        self.workers = workers or config.getint("fleet", "workers", fallback=16)
+        self.on_finished = on_finished
+        self.jobs: Dict[str, ShipJob] = {}
+        self.stats = SchedulerStats()
+        # Failures in a row, by ship
+        self._failures: Dict[str, int] = {}
+        self._timers: List[Tuple[float, int, ShipJob]] = []
+        self._order = count()
+        self._ready: Optional[asyncio.Queue] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def add(self, job: ShipJob, delay: float = 0.0) -> None:
+        self.jobs[job.ship_symbol] = job
+        self._schedule(job, delay)
+
+    def remove(self, ship_symbol: str) -> None:
+        """
+        Stop running a ship's job. A step already under way is let finish.
+        """
+        self.jobs.pop(ship_symbol, None)
+
+    def _current(self, job: ShipJob) -> bool:
+        return self.jobs.get(job.ship_symbol) is job
+
+    def states(self) -> Dict[str, int]:
+        states: Dict[str, int] = {}
+        for job in list(self.jobs.values()):
+            states[job.state] = states.get(job.state, 0) + 1
+        return states
+
+    def _schedule(self, job: ShipJob, delay: float) -> None:
+        heapq.heappush(self._timers, (monotonic() + delay, next(self._order), job))
+        if self._wake:
+            self._wake.set()
+
+    async def run(self, forever: bool = False) -> None:
+        """
+        Run the jobs until all of them are done, or with `forever` until
+        cancelled, for a scheduler that is handed more ships as it goes.
+        """
+        self._ready = asyncio.Queue()
+        self._wake = asyncio.Event()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            while self.jobs or forever:
+                now = monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    due, _, job = heapq.heappop(self._timers)
+                    if self._current(job):
+                        self._ready.put_nowait((due, job))
+                timeout = self._timers[0][0] - now if self._timers else None
+                self._wake.clear()
+                # Not wait_for, which can swallow our own cancellation if the
+                # event is set at the same moment
+                try:
+                    async with asyncio.timeout(timeout):
+                        await self._wake.wait()
+                except TimeoutError:
+                    pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._wake = None
+
+    async def _worker(self) -> None:
+        assert self._ready is not None
+        while True:
+            due, job = await self._ready.get()
+            lag = max(0.0, monotonic() - due)
+            self.stats.steps += 1
+            self.stats.total_lag += lag
+            self.stats.max_lag = max(self.stats.max_lag, lag)
+            state = job.state
+            try:
+                delay = await job.step()
+                if state != job.initial_state or delay is None:
+                    # Not for starting over, which every failure is followed by
+                    self._failures.pop(job.ship_symbol, None)
+            except Exception:
+                log.exception("Ship step failed", ship=job.ship_symbol, state=job.state)
+                self.stats.errors += 1
+                failures = self._failures.get(job.ship_symbol, 0) + 1
+                self._failures[job.ship_symbol] = failures
+                delay = min(ERROR_BACKOFF * 2 ** (failures - 1), MAX_ERROR_BACKOFF)
+                job.state = job.initial_state
+            if not self._current(job):
+                # Removed while it was running
+                continue
+            if delay is None:
+                del self.jobs[job.ship_symbol]
+                self.stats.finished += 1
+                if self.on_finished:
+                    self.on_finished(job)
+                if self._wake:
+                    self._wake.set()
+            else:
+                self._schedule(job, delay)
+
+
+def register_gauges(scheduler: FleetScheduler) -> None:
+    request_metrics.stats.gauge(
+        "fleet_ships",
+        "Ships run by the fleet scheduler, by the state they are in",
+        lambda: [({"state": s}, n) for s, n in scheduler.states().items()],
+    )
+    request_metrics.stats.gauge(
+        "fleet_timers",
+        "Ships waiting in the scheduler's timer heap",
+        lambda: [({}, len(scheduler._timers))],
+    )
@@ -0,0 +1,192 @@
+import asyncio
+import multiprocessing
+from multiprocessing.context import SpawnContext, SpawnProcess
+from queue import Empty
+from time import sleep
+from typing import Callable, Dict, List, Optional
+
+from structlog import get_logger
+
+from src.api.limiter import SharedTokenBucket, TokenBucket
+from src.db.writer import writer
+
+from .scheduler import FleetScheduler, ShipJob
+
+log = get_logger(__name__)
+
+# Seconds between checks that every worker process is still alive
+HEALTH_CHECK_INTERVAL = 1.0
+
+# Builds a ship's action as a job from its symbol, e.g. a MiningJob, which is
+# MiningLoop run one step at a time
+JobFactory = Callable[..., ShipJob]
+
+
+def _worker_main(
+    index: int,
+    make_job: JobFactory,
+    inbox: multiprocessing.Queue,
+    done: multiprocessing.Queue,
+    limiters: Dict[str, TokenBucket],
+) -> None:
+    """
+    A worker process: runs the actions of the ships it is handed in its
+    own scheduler, taking tokens from the rate limiters every worker
+    shares, and reports each ship whose job has finished.
+    """
+    from src.api import agent_pool
+
+    agent_pool.share_limiters(limiters)
+    asyncio.run(_run_worker(index, make_job, inbox, done))
+
+
+async def _run_worker(
+    index: int,
+    make_job: JobFactory,
+    inbox: multiprocessing.Queue,
+    done: multiprocessing.Queue,
+) -> None:
+    scheduler = FleetScheduler(
+        on_finished=lambda job: done.put((index, job.ship_symbol))
+    )
+    loop = asyncio.get_running_loop()
+    runner = asyncio.create_task(scheduler.run(forever=True))
+    try:
+        while True:
+            try:
+                symbol = await loop.run_in_executor(
+                    None, inbox.get, True, HEALTH_CHECK_INTERVAL
+                )
+            except Empty:
+                if runner.done():
+                    return runner.result()
+                continue
+            if symbol is None:
+                return
+            log.info("Worker took ship", worker=index, ship=symbol)
+            scheduler.add(make_job(ship_symbol=symbol))
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+        await writer.close()
+
+
+class FleetShards:
+    """
+    Splits a fleet across worker processes, each running the action
+    classes for its ships as scheduler jobs.
+
+    Every ship belongs to exactly one live worker. The parent hands ships
+    out through each worker's inbox and, when a worker dies, gives its
+    ships to the workers still running. The workers share one rate limiter
+    per agent, so the fleet as a whole stays inside each token's budget.
+    """
+
+    def __init__(self, make_job: JobFactory, processes: int) -> None:
+        self.make_job = make_job
+        self.processes = processes
+        self.context: SpawnContext = multiprocessing.get_context("spawn")
+        self.workers: Dict[int, SpawnProcess] = {}
+        self.inboxes: Dict[int, multiprocessing.Queue] = {}
+        # (worker index, ship) for each job a worker has finished
+        self.done: Optional[multiprocessing.Queue] = None
+        # Worker index to the ships it owns and has not finished
+        self.owned: Dict[int, List[str]] = {}
+        self.limiters: Dict[str, TokenBucket] = {}
+
+    def _shared_limiters(self) -> Dict[str, TokenBucket]:
+        from src.api import agent_pool
+
+        return {
+            symbol: SharedTokenBucket(
+                rate=budget.limiter.rate,
+                burst=budget.limiter.burst,
+                context=self.context,
+            )
+            for symbol, budget in agent_pool.agents.items()
+        }
+
+    def start(self, ship_symbols: List[str]) -> None:
+        self.limiters = self._shared_limiters()
+        self.done = self.context.Queue()
+        for index in range(self.processes):
+            inbox = self.context.Queue()
+            worker = self.context.Process(
+                target=_worker_main,
+                args=(index, self.make_job, inbox, self.done, self.limiters),
+                name=f"fleet-worker-{index}",
+            )
+            worker.start()
+            self.workers[index] = worker
+            self.inboxes[index] = inbox
+            self.owned[index] = []
+        for symbol in ship_symbols:
+            self._give(symbol)
+
+    def _give(self, symbol: str, exclude: Optional[int] = None) -> bool:
+        alive = [i for i, w in self.workers.items() if i != exclude and w.is_alive()]
+        if not alive:
+            return False
+        index = min(alive, key=lambda i: len(self.owned[i]))
+        self.owned[index].append(symbol)
+        self.inboxes[index].put(symbol)
+        return True
+
+    def finished(self) -> None:
+        """
+        Forget the ships whose jobs the workers have finished, so they are
+        not started again if their worker dies.
+        """
+        if self.done is None:
+            return
+        while True:
+            try:
+                index, symbol = self.done.get_nowait()
+            except Empty:
+                return
+            if symbol in self.owned.get(index, []):
+                self.owned[index].remove(symbol)
+
+    def rebalance(self) -> None:
+        """
+        Hand the unfinished ships of any worker that has died to the ones
+        still alive.
+        """
+        self.finished()
+        for index, worker in list(self.workers.items()):
+            if worker.is_alive() or not self.owned[index]:
+                continue
+            ships, self.owned[index] = self.owned[index], []
+            log.warning(
+                "Worker died, moving its ships",
+                worker=index,
+                exitcode=worker.exitcode,
+                ships=len(ships),
+            )
+            for symbol in ships:
+                if not self._give(symbol, exclude=index):
+                    log.error("No workers left to take ship", ship=symbol)
+
+    def alive(self) -> bool:
+        return any(w.is_alive() for w in self.workers.values())
+
+    def run(self, ship_symbols: List[str]) -> None:
+        """
+        Start the workers and look after them until they have all stopped.
+        """
+        self.start(ship_symbols)
+        try:
+            while self.alive():
+                self.rebalance()
+                sleep(HEALTH_CHECK_INTERVAL)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        for index, worker in self.workers.items():
+            if worker.is_alive():
+                self.inboxes[index].put(None)
+        for worker in self.workers.values():
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
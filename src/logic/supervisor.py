@@ -0,0 +1,190 @@
+import asyncio
+from collections import Counter
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from rich.console import Console
+from structlog import get_logger
+
+from src.api import agent_pool, request_metrics
+from src.schemas.agent import Agent
+from src.schemas.errors import Error
+from src.schemas.fleet import fleet
+from src.schemas.ships import Ship, ShipsManager
+from src.schemas.systems import SystemWaypoints
+from src.support.tables import blue, pink, yellow
+
+from .jobs import MiningJob, SurveyJob
+from .reaper import survey_reaper
+from .scheduler import ERROR_BACKOFF, MAX_ERROR_BACKOFF, FleetScheduler
+
+log = get_logger(__name__)
+
+ROLES = ("miner", "surveyor", "probe", "hauler")
+
+# Seconds between a probe finishing an exploration and starting the next
+EXPLORE_PAUSE = 60.0
+
+
+def ship_role(ship: Ship) -> str:
+    """
+    What a ship is good for, going by its frame and mounts.
+    """
+    mounts = [m.symbol for m in ship.mounts]
+    if ship.frame.symbol == "FRAME_PROBE":
+        return "probe"
+    if any(m.startswith("MOUNT_MINING_LASER") for m in mounts):
+        return "miner"
+    if any(m.startswith("MOUNT_SURVEYOR") for m in mounts):
+        return "surveyor"
+    return "hauler"
+
+
+class FleetSupervisor:
+    """
+    Runs every ship of every agent we hold a token for from one event loop,
+    each on the action for its role.
+
+    Miners and surveyors work the asteroid field in their system, on
+    MiningLoop and SurveyDestinationAction run as jobs through the fleet
+    scheduler. Probes explore in tasks of their own, restarted
+    with backoff if they crash. There is nothing for haulers to do yet.
+    Instead of every event, a one line summary is printed every `interval`.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        interval: float,
+        destination: Optional[str] = None,
+    ) -> None:
+        self.console = console
+        self.interval = interval
+        self.destination = destination
+        self.scheduler = FleetScheduler()
+        self.roles: Counter = Counter()
+        self.restarts = 0
+        self._sites: Dict[str, Optional[str]] = {}
+        # Quiet: the summary replaces the per event output
+        self._job_console = Console(quiet=True)
+
+    async def mining_site(self, system: str) -> Optional[str]:
+        if self.destination:
+            return self.destination
+        if system not in self._sites:
+            result = await SystemWaypoints.get(symbol=system)
+            self._sites[system] = None
+            if not isinstance(result, Error):
+                for waypoint in result.waypoints:
+                    if waypoint.type == "ASTEROID_FIELD":
+                        self._sites[system] = waypoint.symbol
+                        break
+        return self._sites[system]
+
+    async def supervise(
+        self, name: str, make_task: Callable[[], Awaitable[None]]
+    ) -> None:
+        """
+        Run a task again and again, backing off while it keeps crashing.
+        """
+        failures = 0
+        while True:
+            try:
+                await make_task()
+                failures = 0
+                await asyncio.sleep(EXPLORE_PAUSE)
+            except Exception:
+                failures += 1
+                self.restarts += 1
+                delay = min(ERROR_BACKOFF * 2 ** (failures - 1), MAX_ERROR_BACKOFF)
+                log.exception("Ship task crashed", ship=name, restart_in=delay)
+                await asyncio.sleep(delay)
+
+    async def ships(self) -> List[Ship]:
+        """
+        Every agent's ships, each routed to its owner.
+        """
+        ships: Dict[str, Ship] = {}
+        for agent in list(agent_pool.agents):
+            result = await ShipsManager.all(agent=agent or None)
+            if isinstance(result, Error):
+                raise RuntimeError(
+                    f"Could not load the fleet of {agent or 'the default agent'}: "
+                    f"{result.message}"
+                )
+            for ship in result.ships:
+                # The default token can be listed under [agents] as well
+                ships.setdefault(ship.symbol, ship)
+        return list(ships.values())
+
+    async def start(self) -> List[asyncio.Task]:
+        from .actions.explore import ShipExplore
+
+        tasks = []
+        for ship in await self.ships():
+            role = ship_role(ship)
+            self.roles[role] += 1
+            if role in ("miner", "surveyor"):
+                site = await self.mining_site(ship.nav.systemSymbol)
+                if site is None:
+                    self.console.print(
+                        f"{blue(ship.symbol)} has no asteroid field in {yellow(ship.nav.systemSymbol)}"
+                    )
+                    continue
+                job_class = MiningJob if role == "miner" else SurveyJob
+                self.scheduler.add(
+                    job_class(
+                        ship_symbol=ship.symbol,
+                        destination=site,
+                        console=self._job_console,
+                    )
+                )
+            elif role == "probe":
+                explore = ShipExplore(
+                    ship_symbol=ship.symbol, console=self._job_console
+                )
+                tasks.append(
+                    asyncio.create_task(self.supervise(ship.symbol, explore.process))
+                )
+        return tasks
+
+    async def report(self) -> None:
+        started = monotonic()
+        starting_credits = self.credits()
+        last_requests = request_metrics.stats.total().requests
+        last = started
+        while True:
+            await asyncio.sleep(self.interval)
+            now = monotonic()
+            requests = request_metrics.stats.total().requests
+            hours = (now - started) / 3600
+            per_hour = (self.credits() - starting_credits) / hours if hours else 0
+            per_minute = (requests - last_requests) / ((now - last) / 60)
+            last, last_requests = now, requests
+            roles = ", ".join(f"{r} {self.roles[r]}" for r in ROLES if self.roles[r])
+            states = ", ".join(
+                f"{s} {n}" for s, n in sorted(self.scheduler.states().items())
+            )
+            self.console.print(
+                f"{sum(self.roles.values())} ships ({roles}) | "
+                f"credits {pink(f'{self.credits():,}')} ({pink(f'{per_hour:+,.0f}')}/h) | "
+                f"{per_minute:.1f} requests/min | {states} | "
+                f"{self.scheduler.stats.errors + self.restarts} crashes"
+            )
+
+    def credits(self) -> int:
+        return sum(agent.credits for agent in fleet.agents.values())
+
+    async def run(self) -> None:
+        for agent in list(agent_pool.agents):
+            await Agent.me(agent=agent or None)
+        survey_reaper.start()
+        tasks = await self.start()
+        reporter = asyncio.create_task(self.report())
+        try:
+            await asyncio.gather(self.scheduler.run(forever=True), *tasks)
+        finally:
+            reporter.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(reporter, *tasks, return_exceptions=True)
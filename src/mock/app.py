@@ -0,0 +1,318 @@
+"""
+A local stand-in for the SpaceTraders API, to run fleets against offline.
+
+Serves the endpoints in `src.api.paths` under /v2 from an in-memory
+Universe, with the same x-ratelimit-* headers and 429 errors as the real
+API. Point `[api] base_path` at it to use it.
+"""
+import math
+import threading
+from datetime import timedelta
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from flask import Blueprint, Flask, g, jsonify, request
+
+from src.mock.universe import Agent, GameError, Universe, now, timestamp
+
+DEFAULT_AGENT = "MOCK"
+
+
+class RateLimit:
+    """
+    Per token bucket that answers with 429s, like the real API.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> Tuple[bool, float, float]:
+        """
+        Take a token for `key`. Returns if it was allowed, the tokens left,
+        and the seconds until the next token.
+        """
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(self.burst), monotonic()))
+            current = monotonic()
+            tokens = min(self.burst, tokens + (current - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, current)
+            return allowed, tokens, max(0.0, (1 - tokens) / self.rate)
+
+
+def create_app(
+    universe: Universe,
+    rate_limit: Optional[RateLimit] = None,
+    strict_auth: bool = False,
+) -> Flask:
+    """
+    Build the mock server. Without `strict_auth` any unknown token
+    is treated as the default agent, so the configured key just works.
+    """
+    app = Flask(__name__)
+    routes = Blueprint("mock", __name__, url_prefix="/v2")
+
+    def default_agent() -> Optional[Agent]:
+        agents = universe.agents.values()
+        return next((a for a in agents if a.symbol == DEFAULT_AGENT), None)
+
+    @routes.before_request
+    def authenticate():
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        g.agent = universe.agents.get(token)
+        if g.agent is None and not strict_auth:
+            g.agent = default_agent()
+        if rate_limit is None:
+            return None
+        allowed, remaining, retry_after = rate_limit.take(token)
+        g.rate_headers = {
+            "x-ratelimit-type": "IP-based",
+            "x-ratelimit-limit-per-second": str(rate_limit.rate),
+            "x-ratelimit-limit-burst": str(rate_limit.burst),
+            "x-ratelimit-remaining": str(math.floor(remaining)),
+            "x-ratelimit-reset": timestamp(now() + timedelta(seconds=retry_after)),
+        }
+        if not allowed:
+            error = GameError(
+                "You have reached your API limit.",
+                429,
+                status=429,
+                data=dict(
+                    type="IP-based rate limiting",
+                    retryAfter=retry_after,
+                    limitBurst=rate_limit.burst,
+                    limitPerSecond=rate_limit.rate,
+                    remaining=0,
+                    reset=g.rate_headers["x-ratelimit-reset"],
+                ),
+            )
+            return jsonify(error.payload()), error.status
+        return None
+
+    @routes.after_request
+    def rate_headers(response):
+        response.headers.update(g.get("rate_headers", {}))
+        return response
+
+    @routes.errorhandler(GameError)
+    def game_error(error: GameError):
+        return jsonify(error.payload()), error.status
+
+    def agent() -> Agent:
+        if g.agent is None:
+            raise GameError("Missing or invalid agent token", 4100, status=401)
+        return g.agent
+
+    def body() -> Dict:
+        return request.get_json(silent=True) or {}
+
+    def data(payload, status: int = 200):
+        return jsonify(data=payload), status
+
+    def paginated(items):
+        page = request.args.get("page", 1, type=int)
+        limit = min(20, request.args.get("limit", 10, type=int))
+        start = (page - 1) * limit
+        return jsonify(
+            data=items[start : start + limit],
+            meta=dict(total=len(items), page=page, limit=limit),
+        )
+
+    @routes.get("")
+    def server_status():
+        return jsonify(
+            status="SpaceTraders mock server is online",
+            version="mock",
+            stats=dict(
+                agents=len(universe.agents),
+                ships=len(universe.ships),
+                systems=len(universe.systems),
+                waypoints=len(universe.waypoints),
+            ),
+        )
+
+    @routes.post("/register")
+    def register():
+        payload = body()
+        registered = universe.register(
+            payload.get("symbol", ""), ships=payload.get("ships", 2)
+        )
+        return data(
+            dict(
+                token=registered.token,
+                agent=registered.payload(),
+                contract=universe.agent_contracts(registered)[0],
+                faction={"symbol": payload.get("faction", "COSMIC")},
+                ship=universe.agent_ships(registered)[0],
+            ),
+            status=201,
+        )
+
+    @routes.get("/my/agent")
+    def my_agent():
+        return data(agent().payload())
+
+    @routes.get("/my/ships")
+    def my_ships():
+        with universe.lock:
+            return paginated(universe.agent_ships(agent()))
+
+    @routes.post("/my/ships")
+    def buy_ship():
+        return data(universe.buy_ship(agent(), body().get("waypointSymbol", "")), 201)
+
+    @routes.get("/my/ships/<symbol>")
+    def ship(symbol):
+        with universe.lock:
+            return data(universe.ship(agent(), symbol))
+
+    @routes.get("/my/ships/<symbol>/nav")
+    def ship_nav(symbol):
+        with universe.lock:
+            return data(universe.ship(agent(), symbol)["nav"])
+
+    @routes.patch("/my/ships/<symbol>/nav")
+    def ship_flight_mode(symbol):
+        flight_mode = body().get("flightMode", "CRUISE")
+        return data(universe.set_flight_mode(agent(), symbol, flight_mode))
+
+    @routes.get("/my/ships/<symbol>/cargo")
+    def ship_cargo(symbol):
+        with universe.lock:
+            return data(universe.ship(agent(), symbol)["cargo"])
+
+    @routes.get("/my/ships/<symbol>/cooldown")
+    def ship_cooldown(symbol):
+        with universe.lock:
+            cooldown = universe.cooldown(agent(), symbol)
+        if cooldown is None:
+            return "", 204
+        return data(cooldown)
+
+    @routes.post("/my/ships/<symbol>/orbit")
+    def ship_orbit(symbol):
+        return data(universe.orbit(agent(), symbol))
+
+    @routes.post("/my/ships/<symbol>/dock")
+    def ship_dock(symbol):
+        return data(universe.dock(agent(), symbol))
+
+    @routes.post("/my/ships/<symbol>/navigate")
+    def ship_navigate(symbol):
+        waypoint = body().get("waypointSymbol", "")
+        return data(universe.navigate(agent(), symbol, waypoint))
+
+    @routes.post("/my/ships/<symbol>/jump")
+    def ship_jump(symbol):
+        system = body().get("systemSymbol", "")
+        return data(universe.jump(agent(), symbol, system))
+
+    @routes.post("/my/ships/<symbol>/refuel")
+    def ship_refuel(symbol):
+        return data(universe.refuel(agent(), symbol))
+
+    @routes.post("/my/ships/<symbol>/sell")
+    def ship_sell(symbol):
+        payload = body()
+        return data(
+            universe.sell(
+                agent(), symbol, payload.get("symbol", ""), int(payload.get("units", 0))
+            ),
+            201,
+        )
+
+    @routes.post("/my/ships/<symbol>/extract")
+    def ship_extract(symbol):
+        return data(universe.extract(agent(), symbol, body().get("survey")), 201)
+
+    @routes.post("/my/ships/<symbol>/survey")
+    def ship_survey(symbol):
+        return data(universe.survey(agent(), symbol), 201)
+
+    @routes.post("/my/ships/<symbol>/chart")
+    def ship_chart(symbol):
+        return data(universe.chart(agent(), symbol), 201)
+
+    @routes.post("/my/ships/<symbol>/negotiate/contract")
+    def ship_negotiate_contract(symbol):
+        with universe.lock:
+            universe.ship(agent(), symbol)
+            return data(dict(contract=universe.new_contract(agent())), 201)
+
+    @routes.get("/my/contracts")
+    def my_contracts():
+        return paginated(universe.agent_contracts(agent()))
+
+    @routes.get("/my/contracts/<contract_id>")
+    def contract(contract_id):
+        return data(universe.contract(agent(), contract_id))
+
+    @routes.post("/my/contracts/<contract_id>/accept")
+    def contract_accept(contract_id):
+        return data(universe.accept(agent(), contract_id))
+
+    @routes.post("/my/contracts/<contract_id>/deliver")
+    def contract_deliver(contract_id):
+        payload = body()
+        return data(
+            universe.deliver(
+                agent(),
+                contract_id,
+                payload.get("shipSymbol", ""),
+                payload.get("tradeSymbol", ""),
+                int(payload.get("units", 0)),
+            )
+        )
+
+    @routes.post("/my/contracts/<contract_id>/fulfill")
+    def contract_fulfill(contract_id):
+        return data(universe.fulfill(agent(), contract_id))
+
+    @routes.get("/factions")
+    @routes.get("/my/factions")
+    def factions():
+        return paginated(
+            [
+                dict(
+                    symbol="COSMIC",
+                    name="Cosmic Engineers",
+                    description="Cosmic Engineers",
+                    headquarters=g.agent.headquarters if g.agent else "",
+                    traits=[],
+                    isRecruiting=True,
+                )
+            ]
+        )
+
+    @routes.get("/systems/<symbol>")
+    def system(symbol):
+        return data(universe.system(symbol))
+
+    @routes.get("/systems/<symbol>/waypoints")
+    def system_waypoints(symbol):
+        system = universe.system(symbol)
+        return paginated([universe.waypoint(w["symbol"]) for w in system["waypoints"]])
+
+    @routes.get("/systems/<symbol>/waypoints/<waypoint>")
+    def waypoint(symbol, waypoint):
+        return data(universe.waypoint(waypoint))
+
+    @routes.get("/systems/<symbol>/waypoints/<waypoint>/market")
+    def market(symbol, waypoint):
+        return data(universe.market(waypoint))
+
+    @routes.get("/systems/<symbol>/waypoints/<waypoint>/shipyard")
+    def shipyard(symbol, waypoint):
+        return data(universe.shipyard(waypoint))
+
+    @routes.get("/systems/<symbol>/waypoints/<waypoint>/jump-gate")
+    def jump_gate(symbol, waypoint):
+        return data(universe.jump_gate(waypoint))
+
+    app.register_blueprint(routes)
+    return app
@@ -0,0 +1,878 @@
+"""
+In-memory game state and mechanics for the mock SpaceTraders server.
+
+Everything is kept in the same shape as the API's JSON so the handlers can
+return it as it is. All durations (travel, cooldowns, survey lifetimes)
+are multiplied by `time_scale`, so a fleet can be run faster than real time.
+"""
+import math
+import random
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import attrs
+
+SECTOR = "X1"
+FACTION = "COSMIC"
+
+ORES = ["IRON_ORE", "COPPER_ORE", "ALUMINUM_ORE", "SILICON_CRYSTALS", "QUARTZ_SAND"]
+GOODS = ORES + ["FUEL", "ICE_WATER", "PRECIOUS_STONES"]
+BASE_PRICES = {
+    "IRON_ORE": 40,
+    "COPPER_ORE": 45,
+    "ALUMINUM_ORE": 50,
+    "SILICON_CRYSTALS": 35,
+    "QUARTZ_SAND": 20,
+    "FUEL": 70,
+    "ICE_WATER": 15,
+    "PRECIOUS_STONES": 90,
+}
+# Seconds per unit of distance for each flight mode, as the real API
+FLIGHT_MODE_MULTIPLIER = {"CRUISE": 25, "BURN": 12.5, "DRIFT": 250, "STEALTH": 30}
+FUEL_MULTIPLIER = {"CRUISE": 1, "BURN": 2, "DRIFT": 0, "STEALTH": 1}
+EXTRACT_COOLDOWN = 70
+SURVEY_COOLDOWN = 70
+JUMP_COOLDOWN = 60
+SURVEY_LIFETIME = 15 * 60
+SURVEY_EXHAUSTION_CHANCE = 0.05
+SHIP_PRICE = 80_000
+
+
+class GameError(Exception):
+    """
+    Raised by the mechanics, returned to the client as an API error.
+    """
+
+    def __init__(
+        self, message: str, code: int, status: int = 400, data: Optional[Dict] = None
+    ) -> None:
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+        self.data = data
+
+    def payload(self) -> Dict:
+        error: Dict[str, Any] = {"message": self.message, "code": self.code}
+        if self.data:
+            error["data"] = self.data
+        return {"error": error}
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def timestamp(at: datetime) -> str:
+    return at.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def distance(a: Dict, b: Dict) -> float:
+    return math.dist([a["x"], a["y"]], [b["x"], b["y"]])
+
+
+def display_name(symbol: str) -> str:
+    return symbol.replace("_", " ").title()
+
+
+@attrs.define
+class Agent:
+    token: str
+    symbol: str
+    credits: int
+    headquarters: str
+    ship_count: int = 0
+
+    def payload(self) -> Dict:
+        return dict(
+            accountId=f"mock-{self.symbol.lower()}",
+            symbol=self.symbol,
+            headquarters=self.headquarters,
+            credits=self.credits,
+            startingFaction=FACTION,
+        )
+
+
+@attrs.define
+class Universe:
+    time_scale: float = 1.0
+    seed: int = 1
+    systems: Dict[str, Dict] = attrs.field(factory=dict)
+    waypoints: Dict[str, Dict] = attrs.field(factory=dict)
+    markets: Dict[str, Dict] = attrs.field(factory=dict)
+    agents: Dict[str, Agent] = attrs.field(factory=dict)
+    ships: Dict[str, Dict] = attrs.field(factory=dict)
+    ship_owner: Dict[str, str] = attrs.field(factory=dict)
+    cooldowns: Dict[str, datetime] = attrs.field(factory=dict)
+    surveys: Dict[str, Dict] = attrs.field(factory=dict)
+    contracts: Dict[str, Dict] = attrs.field(factory=dict)
+    lock: threading.RLock = attrs.field(factory=threading.RLock)
+
+    @classmethod
+    def generate(
+        cls, systems: int = 20, time_scale: float = 1.0, seed: int = 1
+    ) -> "Universe":
+        universe = cls(time_scale=time_scale, seed=seed)
+        rng = random.Random(seed)
+        for n in range(systems):
+            universe._generate_system(rng, f"{SECTOR}-{chr(65 + n % 26)}{n:02d}")
+        return universe
+
+    def seconds(self, seconds: float) -> float:
+        return max(1.0, seconds * self.time_scale)
+
+    # Universe generation
+
+    def _generate_system(self, rng: random.Random, symbol: str) -> None:
+        system = dict(
+            symbol=symbol,
+            sectorSymbol=SECTOR,
+            type=rng.choice(["RED_STAR", "ORANGE_STAR", "BLUE_STAR", "YOUNG_STAR"]),
+            x=rng.randint(-1500, 1500),
+            y=rng.randint(-1500, 1500),
+            waypoints=[],
+            factions=[{"symbol": FACTION}],
+        )
+        types = ["PLANET", "ASTEROID_FIELD", "JUMP_GATE", "MOON", "ORBITAL_STATION"]
+        types += [rng.choice(["PLANET", "MOON", "ASTEROID_FIELD"]) for _ in range(5)]
+        for i, waypoint_type in enumerate(types):
+            waypoint_symbol = f"{symbol}-{i:02d}{chr(65 + i)}"
+            traits = []
+            if waypoint_type in ["PLANET", "ORBITAL_STATION", "ASTEROID_FIELD"]:
+                traits.append(self._trait("MARKETPLACE"))
+            if waypoint_type == "ORBITAL_STATION":
+                traits.append(self._trait("SHIPYARD"))
+            waypoint = dict(
+                systemSymbol=symbol,
+                symbol=waypoint_symbol,
+                type=waypoint_type,
+                x=rng.randint(-80, 80),
+                y=rng.randint(-80, 80),
+                orbitals=[],
+                traits=traits,
+                chart={
+                    "waypointSymbol": waypoint_symbol,
+                    "submittedBy": FACTION,
+                    "submittedOn": timestamp(now()),
+                },
+                faction={"symbol": FACTION},
+            )
+            self.waypoints[waypoint_symbol] = waypoint
+            system["waypoints"].append(
+                dict(
+                    symbol=waypoint_symbol,
+                    type=waypoint_type,
+                    x=waypoint["x"],
+                    y=waypoint["y"],
+                    orbitals=[],
+                )
+            )
+            if any(t["symbol"] == "MARKETPLACE" for t in traits):
+                self.markets[waypoint_symbol] = self._generate_market(
+                    rng, waypoint_symbol
+                )
+        self.systems[symbol] = system
+
+    def _trait(self, symbol: str) -> Dict:
+        return dict(
+            symbol=symbol, name=display_name(symbol), description=display_name(symbol)
+        )
+
+    def _generate_market(self, rng: random.Random, symbol: str) -> Dict:
+        goods = {}
+        for good in GOODS:
+            price = int(BASE_PRICES[good] * rng.uniform(0.8, 1.2))
+            goods[good] = dict(symbol=good, base=price, sold=0.0, updated_at=now())
+        return dict(symbol=symbol, goods=goods, transactions=[])
+
+    # Agents and ships
+
+    def register(self, symbol: str, ships: int = 2) -> Agent:
+        with self.lock:
+            if any(a.symbol == symbol for a in self.agents.values()):
+                raise GameError(f"Agent symbol {symbol} has already been claimed", 4111)
+            headquarters = self._shipyard_waypoints()[0]
+            agent = Agent(
+                token=secrets.token_hex(16),
+                symbol=symbol,
+                credits=150_000,
+                headquarters=headquarters,
+            )
+            self.agents[agent.token] = agent
+            for n in range(ships):
+                self.new_ship(
+                    agent, headquarters, role=["miner", "surveyor", "probe"][n % 3]
+                )
+            self.new_contract(agent)
+            return agent
+
+    def _shipyard_waypoints(self) -> List[str]:
+        return [
+            w["symbol"]
+            for w in self.waypoints.values()
+            if any(t["symbol"] == "SHIPYARD" for t in w["traits"])
+        ]
+
+    def new_ship(self, agent: Agent, waypoint_symbol: str, role: str = "miner") -> Dict:
+        agent.ship_count += 1
+        symbol = f"{agent.symbol}-{agent.ship_count:X}"
+        waypoint = self.waypoints[waypoint_symbol]
+        probe = role == "probe"
+        if role == "miner":
+            mounts = [self._mount("MOUNT_MINING_LASER_I", strength=10)]
+        elif role == "surveyor":
+            mounts = [self._mount("MOUNT_SURVEYOR_I", strength=1, deposits=ORES)]
+        else:
+            mounts = []
+        location = dict(
+            symbol=waypoint_symbol,
+            type=waypoint["type"],
+            systemSymbol=waypoint["systemSymbol"],
+            x=waypoint["x"],
+            y=waypoint["y"],
+        )
+        at = timestamp(now())
+        ship = dict(
+            symbol=symbol,
+            registration=dict(
+                name=symbol,
+                factionSymbol=FACTION,
+                role="SATELLITE" if probe else "EXCAVATOR",
+            ),
+            nav=dict(
+                systemSymbol=waypoint["systemSymbol"],
+                waypointSymbol=waypoint_symbol,
+                route=dict(
+                    departure=location,
+                    origin=location,
+                    destination=location,
+                    arrival=at,
+                    departureTime=at,
+                ),
+                status="DOCKED",
+                flightMode="CRUISE",
+            ),
+            crew=dict(
+                current=0 if probe else 20,
+                capacity=0 if probe else 40,
+                required=0,
+                rotation="STRICT",
+                morale=100,
+                wages=0,
+            ),
+            frame=dict(
+                symbol="FRAME_PROBE" if probe else "FRAME_MINER",
+                name="Frame",
+                description="Frame",
+                moduleSlots=0 if probe else 2,
+                mountingPoints=0 if probe else 2,
+                fuelCapacity=0 if probe else 400,
+                condition=100,
+                requirements={},
+            ),
+            reactor=dict(
+                symbol="REACTOR_SOLAR_I" if probe else "REACTOR_FISSION_I",
+                name="Reactor",
+                description="Reactor",
+                condition=100,
+                powerOutput=3 if probe else 31,
+                requirements={},
+            ),
+            engine=dict(
+                symbol="ENGINE_IMPULSE_DRIVE_I",
+                name="Engine",
+                description="Engine",
+                condition=100,
+                speed=2 if probe else 10,
+                requirements={},
+            ),
+            modules=[]
+            if probe
+            else [
+                dict(
+                    symbol="MODULE_CARGO_HOLD_I",
+                    name="Cargo Hold",
+                    description="Cargo Hold",
+                    capacity=30,
+                    requirements={},
+                )
+            ],
+            mounts=mounts,
+            cargo=dict(capacity=0 if probe else 30, units=0, inventory=[]),
+            fuel=dict(
+                current=0 if probe else 400,
+                capacity=0 if probe else 400,
+                consumed=dict(amount=0, timestamp=at),
+            ),
+        )
+        self.ships[symbol] = ship
+        self.ship_owner[symbol] = agent.token
+        return ship
+
+    def _mount(
+        self, symbol: str, strength: int, deposits: Optional[List[str]] = None
+    ) -> Dict:
+        mount: Dict[str, Any] = dict(
+            symbol=symbol,
+            name=display_name(symbol),
+            description=display_name(symbol),
+            strength=strength,
+            requirements={},
+        )
+        if deposits:
+            mount["deposits"] = deposits
+        return mount
+
+    def ship(self, agent: Agent, symbol: str) -> Dict:
+        ship = self.ships.get(symbol)
+        if ship is None or self.ship_owner[symbol] != agent.token:
+            raise GameError(f"Ship {symbol} not found", 404, status=404)
+        self._update_nav(ship)
+        return ship
+
+    def agent_ships(self, agent: Agent) -> List[Dict]:
+        ships = [s for s, t in self.ship_owner.items() if t == agent.token]
+        return [self.ship(agent, s) for s in ships]
+
+    def buy_ship(self, agent: Agent, waypoint_symbol: str) -> Dict:
+        with self.lock:
+            if waypoint_symbol not in self._shipyard_waypoints():
+                raise GameError("Waypoint does not have a shipyard", 4601)
+            if not any(
+                s["nav"]["waypointSymbol"] == waypoint_symbol
+                and s["nav"]["status"] == "DOCKED"
+                for s in self.agent_ships(agent)
+            ):
+                raise GameError("You need a ship docked at the shipyard", 4603)
+            if agent.credits < SHIP_PRICE:
+                raise GameError("Insufficient funds", 4216)
+            agent.credits -= SHIP_PRICE
+            ship = self.new_ship(agent, waypoint_symbol)
+            return dict(
+                agent=agent.payload(),
+                ship=ship,
+                transaction=dict(
+                    waypointSymbol=waypoint_symbol,
+                    shipSymbol=ship["symbol"],
+                    price=SHIP_PRICE,
+                    agentSymbol=agent.symbol,
+                    timestamp=timestamp(now()),
+                ),
+            )
+
+    # Navigation
+
+    def _update_nav(self, ship: Dict) -> None:
+        nav = ship["nav"]
+        if nav["status"] == "IN_TRANSIT":
+            if parse_timestamp(nav["route"]["arrival"]) <= now():
+                nav["status"] = "IN_ORBIT"
+
+    def _require_status(self, ship: Dict, status: str) -> None:
+        current = ship["nav"]["status"]
+        if current == "IN_TRANSIT":
+            seconds = (parse_timestamp(ship["nav"]["route"]["arrival"]) - now()).seconds
+            raise GameError(
+                f"Ship {ship['symbol']} is currently in-transit",
+                4214,
+                data={"secondsToArrival": seconds},
+            )
+        if current != status:
+            code = 4236 if status == "IN_ORBIT" else 4244
+            raise GameError(
+                f"Ship {ship['symbol']} must be {status.lower()} for this action", code
+            )
+
+    def orbit(self, agent: Agent, symbol: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            if ship["nav"]["status"] == "DOCKED":
+                ship["nav"]["status"] = "IN_ORBIT"
+            self._require_status(ship, "IN_ORBIT")
+            return dict(nav=ship["nav"])
+
+    def dock(self, agent: Agent, symbol: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            if ship["nav"]["status"] == "IN_ORBIT":
+                ship["nav"]["status"] = "DOCKED"
+            self._require_status(ship, "DOCKED")
+            return dict(nav=ship["nav"])
+
+    def set_flight_mode(self, agent: Agent, symbol: str, flight_mode: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            if flight_mode not in FLIGHT_MODE_MULTIPLIER:
+                raise GameError(f"Unknown flight mode {flight_mode}", 4000, status=422)
+            ship["nav"]["flightMode"] = flight_mode
+            return ship["nav"]
+
+    def navigate(self, agent: Agent, symbol: str, waypoint_symbol: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            self._require_status(ship, "IN_ORBIT")
+            destination = self.waypoints.get(waypoint_symbol)
+            if destination is None:
+                raise GameError(f"Waypoint {waypoint_symbol} not found", 404, 404)
+            origin = self.waypoints[ship["nav"]["waypointSymbol"]]
+            if destination["systemSymbol"] != origin["systemSymbol"]:
+                raise GameError("Navigation is only possible within a system", 4202)
+            if waypoint_symbol == origin["symbol"]:
+                raise GameError("Ship is already at the destination", 4204)
+            mode = ship["nav"]["flightMode"]
+            length = max(1, round(distance(origin, destination)))
+            fuel_needed = length * FUEL_MULTIPLIER[mode]
+            if ship["fuel"]["capacity"] and ship["fuel"]["current"] < fuel_needed:
+                raise GameError(
+                    "Ship has insufficient fuel",
+                    4203,
+                    data={
+                        "fuelRequired": fuel_needed,
+                        "fuelAvailable": ship["fuel"]["current"],
+                    },
+                )
+            if ship["fuel"]["capacity"]:
+                ship["fuel"]["current"] -= fuel_needed
+                ship["fuel"]["consumed"] = dict(
+                    amount=fuel_needed, timestamp=timestamp(now())
+                )
+            travel = length * FLIGHT_MODE_MULTIPLIER[mode] / ship["engine"]["speed"]
+            departed = now()
+            arrival = departed + timedelta(seconds=self.seconds(travel + 15))
+            ship["nav"].update(
+                waypointSymbol=waypoint_symbol,
+                status="IN_TRANSIT",
+                route=dict(
+                    departure=self._location(origin),
+                    origin=self._location(origin),
+                    destination=self._location(destination),
+                    arrival=timestamp(arrival),
+                    departureTime=timestamp(departed),
+                ),
+            )
+            return dict(fuel=ship["fuel"], nav=ship["nav"])
+
+    def _location(self, waypoint: Dict) -> Dict:
+        return dict(
+            symbol=waypoint["symbol"],
+            type=waypoint["type"],
+            systemSymbol=waypoint["systemSymbol"],
+            x=waypoint["x"],
+            y=waypoint["y"],
+        )
+
+    def jump(self, agent: Agent, symbol: str, system: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            self._require_status(ship, "IN_ORBIT")
+            self._check_cooldown(symbol)
+            origin = self.waypoints[ship["nav"]["waypointSymbol"]]
+            has_drive = any(
+                m["symbol"] == "MODULE_JUMP_DRIVE_I" for m in ship["modules"]
+            )
+            if origin["type"] != "JUMP_GATE" and not has_drive:
+                raise GameError("Ship is not at a jump gate", 4208)
+            target = self.systems.get(system)
+            if target is None:
+                raise GameError(f"System {system} not found", 404, 404)
+            gate = next(
+                w["symbol"] for w in target["waypoints"] if w["type"] == "JUMP_GATE"
+            )
+            destination = self.waypoints[gate]
+            at = timestamp(now())
+            ship["nav"].update(
+                systemSymbol=system,
+                waypointSymbol=gate,
+                status="IN_ORBIT",
+                route=dict(
+                    departure=self._location(origin),
+                    origin=self._location(origin),
+                    destination=self._location(destination),
+                    arrival=at,
+                    departureTime=at,
+                ),
+            )
+            return dict(
+                cooldown=self._start_cooldown(symbol, JUMP_COOLDOWN), nav=ship["nav"]
+            )
+
+    # Cooldowns
+
+    def _check_cooldown(self, symbol: str) -> None:
+        expiration = self.cooldowns.get(symbol)
+        if expiration and expiration > now():
+            raise GameError(
+                "Ship action is still on cooldown",
+                4000,
+                status=409,
+                data={"cooldown": self._cooldown(symbol, expiration, 0)},
+            )
+
+    def _start_cooldown(self, symbol: str, seconds: float) -> Dict:
+        total = self.seconds(seconds)
+        expiration = now() + timedelta(seconds=total)
+        self.cooldowns[symbol] = expiration
+        return self._cooldown(symbol, expiration, total)
+
+    def _cooldown(self, symbol: str, expiration: datetime, total: float) -> Dict:
+        remaining = max(0, math.ceil((expiration - now()).total_seconds()))
+        return dict(
+            shipSymbol=symbol,
+            totalSeconds=math.ceil(total) or remaining,
+            remainingSeconds=remaining,
+            expiration=timestamp(expiration),
+        )
+
+    def cooldown(self, agent: Agent, symbol: str) -> Optional[Dict]:
+        self.ship(agent, symbol)
+        expiration = self.cooldowns.get(symbol)
+        if expiration and expiration > now():
+            return self._cooldown(symbol, expiration, 0)
+        return None
+
+    # Mining
+
+    def survey(self, agent: Agent, symbol: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            self._require_status(ship, "IN_ORBIT")
+            if not any(
+                m["symbol"].startswith("MOUNT_SURVEYOR") for m in ship["mounts"]
+            ):
+                raise GameError("Ship does not have a surveyor mount", 4223)
+            waypoint = self.waypoints[ship["nav"]["waypointSymbol"]]
+            if waypoint["type"] != "ASTEROID_FIELD":
+                raise GameError("Waypoint is not an asteroid field", 4222)
+            self._check_cooldown(symbol)
+            expiration = timestamp(
+                now() + timedelta(seconds=self.seconds(SURVEY_LIFETIME))
+            )
+            surveys = []
+            for _ in range(random.randint(1, 3)):
+                survey = dict(
+                    signature=f"{waypoint['symbol']}-{secrets.token_hex(3).upper()}",
+                    symbol=waypoint["symbol"],
+                    deposits=[
+                        {"symbol": random.choice(ORES)}
+                        for _ in range(random.randint(3, 7))
+                    ],
+                    expiration=expiration,
+                    size=random.choice(["SMALL", "MODERATE", "LARGE"]),
+                )
+                self.surveys[survey["signature"]] = survey
+                surveys.append(survey)
+            return dict(
+                surveys=surveys, cooldown=self._start_cooldown(symbol, SURVEY_COOLDOWN)
+            )
+
+    def extract(self, agent: Agent, symbol: str, survey: Optional[Dict]) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            self._require_status(ship, "IN_ORBIT")
+            if not any(m["symbol"].startswith("MOUNT_MINING") for m in ship["mounts"]):
+                raise GameError("Ship does not have a mining mount", 4243)
+            waypoint = self.waypoints[ship["nav"]["waypointSymbol"]]
+            if waypoint["type"] != "ASTEROID_FIELD":
+                raise GameError("Waypoint is not an asteroid field", 4205)
+            self._check_cooldown(symbol)
+            cargo = ship["cargo"]
+            space = cargo["capacity"] - cargo["units"]
+            if space <= 0:
+                raise GameError("Ship cargo is full", 4228)
+            deposits = ORES
+            units = random.randint(1, 7)
+            if survey:
+                known = self.surveys.get(survey.get("signature", ""))
+                if known is None or known["symbol"] != waypoint["symbol"]:
+                    raise GameError("Survey is not valid for this waypoint", 4220)
+                if parse_timestamp(known["expiration"]) < now():
+                    raise GameError("Survey has expired", 4221)
+                if random.random() < SURVEY_EXHAUSTION_CHANCE:
+                    del self.surveys[known["signature"]]
+                    raise GameError("Survey has been exhausted", 4224)
+                deposits = [d["symbol"] for d in known["deposits"]]
+                units += {"SMALL": 0, "MODERATE": 2, "LARGE": 4}[known["size"]]
+            units = min(units, space)
+            good = random.choice(deposits)
+            self._add_cargo(ship, good, units)
+            return dict(
+                extraction=dict(
+                    shipSymbol=symbol, **{"yield": dict(symbol=good, units=units)}
+                ),
+                cooldown=self._start_cooldown(symbol, EXTRACT_COOLDOWN),
+                cargo=cargo,
+            )
+
+    def _add_cargo(self, ship: Dict, good: str, units: int) -> None:
+        cargo = ship["cargo"]
+        for item in cargo["inventory"]:
+            if item["symbol"] == good:
+                item["units"] += units
+                break
+        else:
+            cargo["inventory"].append(
+                dict(
+                    symbol=good,
+                    name=display_name(good),
+                    description=display_name(good),
+                    units=units,
+                )
+            )
+        cargo["units"] += units
+
+    def _remove_cargo(self, ship: Dict, good: str, units: int) -> None:
+        cargo = ship["cargo"]
+        for item in cargo["inventory"]:
+            if item["symbol"] == good:
+                if item["units"] < units:
+                    break
+                item["units"] -= units
+                cargo["units"] -= units
+                cargo["inventory"] = [i for i in cargo["inventory"] if i["units"] > 0]
+                return
+        raise GameError(f"Ship does not have {units} units of {good}", 4219)
+
+    # Markets
+
+    def _price(self, good: Dict) -> Tuple[int, int]:
+        # Prices recover as the market absorbs what was sold
+        elapsed = (now() - good["updated_at"]).total_seconds()
+        good["sold"] = max(0.0, good["sold"] - elapsed / self.seconds(60) * 10)
+        good["updated_at"] = now()
+        sell = max(1, int(good["base"] * (1 - min(good["sold"], 400) / 500)))
+        return sell, int(sell * 1.1) + 1
+
+    def market(self, waypoint_symbol: str) -> Dict:
+        with self.lock:
+            market = self.markets.get(waypoint_symbol)
+            if market is None:
+                raise GameError("Waypoint does not have a marketplace", 4603, 404)
+            commodities = [
+                dict(
+                    symbol=g,
+                    name=display_name(g),
+                    description=display_name(g),
+                )
+                for g in market["goods"]
+            ]
+            trade_goods = []
+            for good in market["goods"].values():
+                sell, purchase = self._price(good)
+                supply = "ABUNDANT" if good["sold"] > 200 else "MODERATE"
+                trade_goods.append(
+                    dict(
+                        symbol=good["symbol"],
+                        tradeVolume=100,
+                        supply=supply,
+                        purchasePrice=purchase,
+                        sellPrice=sell,
+                    )
+                )
+            return dict(
+                symbol=waypoint_symbol,
+                imports=commodities[:3],
+                exports=commodities[3:5],
+                exchange=commodities[5:],
+                transactions=market["transactions"][-20:],
+                tradeGoods=trade_goods,
+            )
+
+    def _market_here(self, ship: Dict) -> Dict:
+        market = self.markets.get(ship["nav"]["waypointSymbol"])
+        if market is None:
+            raise GameError("Waypoint does not have a marketplace", 4603)
+        return market
+
+    def _transaction(
+        self, ship: Dict, good: str, kind: str, units: int, price: int
+    ) -> Dict:
+        transaction = dict(
+            waypointSymbol=ship["nav"]["waypointSymbol"],
+            shipSymbol=ship["symbol"],
+            tradeSymbol=good,
+            type=kind,
+            units=units,
+            pricePerUnit=price,
+            totalPrice=units * price,
+            timestamp=timestamp(now()),
+        )
+        self.markets[ship["nav"]["waypointSymbol"]]["transactions"].append(transaction)
+        return transaction
+
+    def sell(self, agent: Agent, symbol: str, good: str, units: int) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            self._require_status(ship, "DOCKED")
+            market = self._market_here(ship)
+            if good not in market["goods"]:
+                raise GameError(f"Market does not trade {good}", 4602)
+            self._remove_cargo(ship, good, units)
+            sell, _ = self._price(market["goods"][good])
+            market["goods"][good]["sold"] += units
+            transaction = self._transaction(ship, good, "SELL", units, sell)
+            agent.credits += transaction["totalPrice"]
+            return dict(
+                agent=agent.payload(), cargo=ship["cargo"], transaction=transaction
+            )
+
+    def refuel(self, agent: Agent, symbol: str) -> Dict:
+        with self.lock:
+            ship = self.ship(agent, symbol)
+            self._require_status(ship, "DOCKED")
+            market = self._market_here(ship)
+            fuel = ship["fuel"]
+            # Fuel is bought in units of 100
+            units = math.ceil((fuel["capacity"] - fuel["current"]) / 100)
+            _, price = self._price(market["goods"]["FUEL"])
+            if agent.credits < units * price:
+                raise GameError("Insufficient funds", 4216)
+            fuel["current"] = fuel["capacity"]
+            transaction = self._transaction(ship, "FUEL", "PURCHASE", units, price)
+            agent.credits -= transaction["totalPrice"]
+            return dict(agent=agent.payload(), fuel=fuel, transaction=transaction)
+
+    # Contracts
+
+    def new_contract(self, agent: Agent) -> Dict:
+        contract_id = secrets.token_hex(12)
+        deadline = timestamp(now() + timedelta(days=7))
+        contract = dict(
+            id=contract_id,
+            factionSymbol=FACTION,
+            type="PROCUREMENT",
+            terms=dict(
+                deadline=deadline,
+                payment=dict(onAccepted=5_000, onFulfilled=50_000),
+                deliver=[
+                    dict(
+                        tradeSymbol=random.choice(ORES),
+                        destinationSymbol=agent.headquarters,
+                        unitsRequired=100,
+                        unitsFulfilled=0,
+                    )
+                ],
+            ),
+            accepted=False,
+            fulfilled=False,
+            expiration=deadline,
+            deadlineToAccept=deadline,
+        )
+        self.contracts[contract_id] = dict(owner=agent.token, contract=contract)
+        return contract
+
+    def agent_contracts(self, agent: Agent) -> List[Dict]:
+        return [
+            c["contract"] for c in self.contracts.values() if c["owner"] == agent.token
+        ]
+
+    def contract(self, agent: Agent, contract_id: str) -> Dict:
+        stored = self.contracts.get(contract_id)
+        if stored is None or stored["owner"] != agent.token:
+            raise GameError(f"Contract {contract_id} not found", 404, 404)
+        return stored["contract"]
+
+    def accept(self, agent: Agent, contract_id: str) -> Dict:
+        with self.lock:
+            contract = self.contract(agent, contract_id)
+            if contract["accepted"]:
+                raise GameError("Contract has already been accepted", 4501)
+            contract["accepted"] = True
+            agent.credits += contract["terms"]["payment"]["onAccepted"]
+            return dict(agent=agent.payload(), contract=contract)
+
+    def deliver(
+        self, agent: Agent, contract_id: str, ship_symbol: str, good: str, units: int
+    ) -> Dict:
+        with self.lock:
+            contract = self.contract(agent, contract_id)
+            ship = self.ship(agent, ship_symbol)
+            self._require_status(ship, "DOCKED")
+            term = next(
+                (d for d in contract["terms"]["deliver"] if d["tradeSymbol"] == good),
+                None,
+            )
+            if term is None or not contract["accepted"]:
+                raise GameError(f"Contract does not need {good}", 4508)
+            if ship["nav"]["waypointSymbol"] != term["destinationSymbol"]:
+                raise GameError("Ship is not at the delivery destination", 4510)
+            units = min(units, term["unitsRequired"] - term["unitsFulfilled"])
+            self._remove_cargo(ship, good, units)
+            term["unitsFulfilled"] += units
+            return dict(contract=contract, cargo=ship["cargo"])
+
+    def fulfill(self, agent: Agent, contract_id: str) -> Dict:
+        with self.lock:
+            contract = self.contract(agent, contract_id)
+            if any(
+                d["unitsFulfilled"] < d["unitsRequired"]
+                for d in contract["terms"]["deliver"]
+            ):
+                raise GameError("Contract terms have not been met", 4502)
+            if contract["fulfilled"]:
+                raise GameError("Contract has already been fulfilled", 4504)
+            contract["fulfilled"] = True
+            agent.credits += contract["terms"]["payment"]["onFulfilled"]
+            return dict(agent=agent.payload(), contract=contract)
+
+    # Systems
+
+    def system(self, symbol: str) -> Dict:
+        system = self.systems.get(symbol)
+        if system is None:
+            raise GameError(f"System {symbol} not found", 404, 404)
+        return system
+
+    def waypoint(self, symbol: str) -> Dict:
+        waypoint = self.waypoints.get(symbol)
+        if waypoint is None:
+            raise GameError(f"Waypoint {symbol} not found", 404, 404)
+        return waypoint
+
+    def chart(self, agent: Agent, symbol: str) -> Dict:
+        ship = self.ship(agent, symbol)
+        self._require_status(ship, "IN_ORBIT")
+        waypoint = self.waypoints[ship["nav"]["waypointSymbol"]]
+        raise GameError(
+            "Waypoint already charted",
+            4230,
+            data={"waypointSymbol": waypoint["symbol"]},
+        )
+
+    def shipyard(self, symbol: str) -> Dict:
+        if symbol not in self._shipyard_waypoints():
+            raise GameError("Waypoint does not have a shipyard", 4601, 404)
+        return dict(
+            symbol=symbol,
+            shipTypes=[{"type": "SHIP_MINING_DRONE"}, {"type": "SHIP_PROBE"}],
+            transactions=[],
+            ships=[],
+            modificationsFee=100,
+        )
+
+    def jump_gate(self, symbol: str) -> Dict:
+        waypoint = self.waypoint(symbol)
+        if waypoint["type"] != "JUMP_GATE":
+            raise GameError("Waypoint is not a jump gate", 4206, 404)
+        here = self.systems[waypoint["systemSymbol"]]
+        connected = []
+        for system in self.systems.values():
+            length = round(distance(here, system))
+            if system is not here and length <= 2000:
+                connected.append(
+                    dict(
+                        symbol=system["symbol"],
+                        sectorSymbol=SECTOR,
+                        type=system["type"],
+                        factionSymbol=FACTION,
+                        x=system["x"],
+                        y=system["y"],
+                        distance=length,
+                    )
+                )
+        return dict(jumpRange=2000, factionSymbol=FACTION, connectedSystems=connected)
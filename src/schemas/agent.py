@@ -2,12 +2,12 @@ from typing import Optional, Self, Union
 
 import attrs
 
-from src.api import PATHS, bare_client, safe_get, sync_get
-from src.api.utils import data_or_error
+from src.api import PATHS, Priority, agent_pool, safe_get, sync_get, sync_post
 
 from .contracts import Contract
 from .errors import Error
 from .factions import Faction
+from .fleet import fleet
 from .ships import Ship
 
 
@@ -23,23 +23,25 @@ class Agent:
     startingFaction: str
 
     @classmethod
-    def me_sync(cls) -> Self | Error:
-        result = sync_get(path=PATHS.MY_AGENT)
+    def me_sync(cls, agent: Optional[str] = None) -> Self | Error:
+        result = sync_get(path=PATHS.MY_AGENT, agent=agent)
         match result:
             case dict():
-                return cls(**result)
+                return fleet.track_agent(cls(**result))
             case _:
                 return result
 
     @classmethod
-    async def me(cls) -> Union[Self, Error]:
+    async def me(cls, agent: Optional[str] = None) -> Union[Self, Error]:
         """
-        Returns the "you" version of an Agent
+        Returns the "you" version of an Agent, or of `agent` if we run several.
         """
-        result = await safe_get(path=PATHS.MY_AGENT)
+        result = await safe_get(
+            path=PATHS.MY_AGENT, priority=Priority.MARKET, agent=agent
+        )
         match result:
             case dict():
-                return cls(**result)
+                return fleet.track_agent(cls(**result))
             case _:
                 return result
 
@@ -56,12 +58,15 @@ class AgentManager:
     def register_new(
         cls, symbol: str, faction: str, email: Optional[str] = None
     ) -> Union[Self, Error]:
-        api_response = bare_client.post(
-            PATHS.REGISTER, data={"symbol": symbol, "faction": faction, "email": email}
+        result = sync_post(
+            path=PATHS.REGISTER,
+            data={"symbol": symbol, "faction": faction, "email": email},
+            authenticated=False,
         )
-        result = data_or_error(api_response=api_response)
         match result:
             case dict():
+                # Start sending requests for its ships with its own token
+                agent_pool.add(result["agent"]["symbol"], result["token"])
                 return cls(
                     token=result["token"],
                     agent=Agent(**result["agent"]),
@@ -1,11 +1,12 @@
-from typing import Dict, List, Self, Union
+from typing import Dict, List, Optional, Self, Union
 
 import attrs
 from structlog import get_logger
 
-from src.api import PATHS, client, safe_get, safe_post
+from src.api import PATHS, Paginator, Priority, agent_pool, safe_get, safe_post
 
 from .errors import Error
+from .fleet import fleet
 from .ships import Cargo
 
 log = get_logger(__name__)
@@ -39,7 +40,9 @@ class Contract:
 
     @classmethod
     async def get(cls, contract_id: str) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.contract(contract_id=contract_id))
+        result = await safe_get(
+            path=PATHS.contract(contract_id=contract_id), priority=Priority.MARKET
+        )
         match result:
             case dict():
                 return cls.build(result)
@@ -63,7 +66,7 @@ class Contract:
                 self.fulfilled = True
                 return dict(
                     contract=Contract.build(result["contract"]),
-                    agent=Agent(**result["agent"]),
+                    agent=fleet.track_agent(Agent(**result["agent"])),
                 )
             case _:
                 return result
@@ -80,7 +83,7 @@ class Contract:
                 self.accepted = True
                 return dict(
                     contract=Contract.build(result["contract"]),
-                    agent=Agent(**result["agent"]),
+                    agent=fleet.track_agent(Agent(**result["agent"])),
                 )
             case _:
                 return result
@@ -98,9 +101,11 @@ class Contract:
         )
         match result:
             case dict():
+                cargo = Cargo.build(result["cargo"])
+                fleet.update_ship(ship_symbol, cargo=cargo)
                 return dict(
                     contract=Contract.build(result["contract"]),
-                    cargo=Cargo.build(result["cargo"]),
+                    cargo=cargo,
                 )
             case _:
                 return result
@@ -118,17 +123,25 @@ class ContractManager:
     contracts: List[Contract]
 
     @classmethod
-    def all(cls) -> Self:
+    async def all(cls, agent: Optional[str] = None) -> Union[Self, Error]:
         """
-        Returns all contracts available to use
+        Returns all contracts available to use, or to `agent` if we run several
         """
-        api_response = client.get(PATHS.MY_CONTRACTS)
-        api_response.raise_for_status()
-        meta = api_response.json()["meta"]
-        contracts = [Contract.build(x) for x in api_response.json()["data"]]
-        return cls(
-            total=meta["total"],
-            page=meta["page"],
-            limit=meta["limit"],
-            contracts=contracts,
+        paginator = Paginator(
+            path=PATHS.MY_CONTRACTS, priority=Priority.MARKET, agent=agent
         )
+        result = await paginator.all()
+        match result:
+            case list():
+                contracts = [Contract.build(x) for x in result]
+                if agent:
+                    for contract in contracts:
+                        agent_pool.assign(contract.id, agent)
+                return cls(
+                    total=len(contracts),
+                    page=1,
+                    limit=len(contracts),
+                    contracts=contracts,
+                )
+            case _:
+                return result
@@ -2,14 +2,16 @@ from typing import Dict, List, Self, Union
 
 import attrs
 
-from src.api import PATHS, safe_get
+from src.api import PATHS, Paginator, Priority
 
 from .errors import Error
 
+
 @attrs.define
 class FactionSummary:
     symbol: str
 
+
 @attrs.define
 class Faction:
     symbol: str
@@ -26,18 +28,18 @@ class FactionsManager:
 
     @classmethod
     async def mine(cls) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.MY_FACTIONS)
+        result = await Paginator(path=PATHS.MY_FACTIONS, priority=Priority.BULK).all()
         match result:
-            case dict():
+            case list():
                 return cls(factions=[Faction(**x) for x in result])
             case _:
                 return result
 
     @classmethod
     async def all(cls) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.FACTIONS)
+        result = await Paginator(path=PATHS.FACTIONS, priority=Priority.BULK).all()
         match result:
-            case dict():
+            case list():
                 return cls(factions=[Faction(**x) for x in result])
             case _:
                 return result
@@ -0,0 +1,88 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import attrs
+
+from src.api import request_metrics
+
+if TYPE_CHECKING:
+    from .agent import Agent
+    from .ships import Ship
+
+
+@attrs.define
+class FleetStats:
+    """
+    Counters for the fleet state store.
+    """
+
+    # Partial updates taken from action responses
+    updates: int = 0
+    # Full ship and agent refreshes from a GET
+    refreshes: int = 0
+    # Orbit and dock requests not sent, the ship was already there
+    skipped_transitions: int = 0
+
+
+class FleetState:
+    """
+    The latest known state of our ships and agents.
+
+    There is a single Ship and Agent object per symbol. Responses to
+    actions already carry the new cargo, nav, fuel or agent, so those
+    are applied to the objects here instead of asking for them again.
+    """
+
+    def __init__(self) -> None:
+        self.ships: Dict[str, "Ship"] = {}
+        self.agents: Dict[str, "Agent"] = {}
+        self.stats = FleetStats()
+
+    def ship(self, symbol: str) -> Optional["Ship"]:
+        return self.ships.get(symbol)
+
+    def agent(self, symbol: str) -> Optional["Agent"]:
+        return self.agents.get(symbol)
+
+    def track_ship(self, ship: "Ship") -> "Ship":
+        """
+        Store a freshly fetched ship and return the one object for it.
+        """
+        self.stats.refreshes += 1
+        return _track(self.ships, ship.symbol, ship)
+
+    def track_agent(self, agent: "Agent") -> "Agent":
+        """
+        Store a fresh copy of an agent and return the one object for it.
+        """
+        self.stats.refreshes += 1
+        return _track(self.agents, agent.symbol, agent)
+
+    def update_ship(self, symbol: str, **parts: Any) -> None:
+        """
+        Apply part of a ship, like its `cargo` or `nav`, from an action response.
+        """
+        ship = self.ships.get(symbol)
+        if ship is None:
+            return
+        self.stats.updates += 1
+        for name, value in parts.items():
+            setattr(ship, name, value)
+
+
+def _track(objects: Dict[str, Any], symbol: str, fresh: Any) -> Any:
+    existing = objects.get(symbol)
+    if existing is None or existing is fresh:
+        objects[symbol] = fresh
+        return fresh
+    for field in attrs.fields(type(fresh)):
+        setattr(existing, field.name, getattr(fresh, field.name))
+    return existing
+
+
+fleet = FleetState()
+
+request_metrics.stats.gauge(
+    "ship_transitions_skipped",
+    "Orbit and dock requests not sent because the ship was already there",
+    lambda: [({}, fleet.stats.skipped_transitions)],
+)
@@ -1,8 +1,8 @@
-from typing import Dict, List, Self, Union
+from typing import Dict, List, Optional, Self, Union
 
 import attrs
 
-from src.api import PATHS, safe_get, sync_get
+from src.api import PATHS, Priority, safe_get, sync_get
 
 from .errors import Error
 from .transactions import Transaction
@@ -50,8 +50,14 @@ class Market:
         )
 
     @classmethod
-    async def get(cls, symbol: str) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.market(symbol=symbol))
+    async def get(cls, symbol: str, agent: Optional[str] = None) -> Union[Self, Error]:
+        """
+        The market as `agent` sees it: prices are only shown to an agent
+        with a ship there.
+        """
+        result = await safe_get(
+            path=PATHS.market(symbol=symbol), priority=Priority.MARKET, agent=agent
+        )
         match result:
             case dict():
                 return cls.build(result)
@@ -59,8 +65,8 @@ class Market:
                 return result
             
     @classmethod
-    def sync_get(cls, symbol: str) -> Union[Self, Error]:
-        result = sync_get(path=PATHS.market(symbol=symbol))
+    def sync_get(cls, symbol: str, agent: Optional[str] = None) -> Union[Self, Error]:
+        result = sync_get(path=PATHS.market(symbol=symbol), agent=agent)
         match result:
             case dict():
                 return cls.build(result)
@@ -1,10 +1,16 @@
-from typing import Dict, List, Optional, Self
+from typing import Dict, List, Optional, Self, Sequence
 
 import attrs
+from sqlalchemy import Select, case, cast, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import JSONB
 
-from src.db import get_db
+from src.db import get_async_db, get_db
 from src.db.models.surveys import SurveyModel
-from src.support.datetime import DateTime
+from src.db.writer import row_values, upsert, writer
+from src.support.datetime import DateTime, server_clock
+
+# Best first
+SURVEY_SIZES = ["LARGE", "MODERATE", "SMALL"]
 
 
 @attrs.define
@@ -32,6 +38,35 @@ class Survey:
             db.delete(survey_model)
             db.commit()
 
+    async def async_drop(self) -> None:
+        """
+        Remove from the database, without blocking the event loop
+        """
+        # Or a save still waiting to be written would put it back
+        await writer.flush()
+        async with get_async_db() as db:
+            await db.execute(
+                delete(SurveyModel).where(SurveyModel.signature == self.signature)
+            )
+            await db.commit()
+
+    @classmethod
+    async def async_drop_expired(cls) -> int:
+        """
+        Remove every expired survey in one statement, returns how many
+        """
+        async with get_async_db() as db:
+            result = await db.execute(
+                delete(SurveyModel).where(SurveyModel.expiration <= server_clock.now())
+            )
+            await db.commit()
+        return result.rowcount
+
+    @classmethod
+    async def async_count(cls) -> int:
+        async with get_async_db() as db:
+            return await db.scalar(select(func.count()).select_from(SurveyModel))
+
     def payload(self) -> Dict:
         """
         Like attrs.asdict but formats the datetime value properly
@@ -56,51 +91,125 @@ class Survey:
             if size:
                 survey_models = survey_models.filter(SurveyModel.size.in_(size))
 
-        return [
-            cls(
-                signature=s.signature,
-                symbol=s.symbol,
-                deposits=s.deposits,
-                expiration=DateTime.build(datetime_string=s.expiration),
-                size=s.size,
+        return [cls.from_model(s) for s in survey_models]
+
+    @classmethod
+    async def async_filter(
+        cls, symbol: str, size: Optional[List[str]] = None
+    ) -> List[Self]:
+        """
+        Like filter, without blocking the event loop
+        """
+        query = select(SurveyModel).where(SurveyModel.symbol == symbol)
+        if size:
+            query = query.where(SurveyModel.size.in_(size))
+        async with get_async_db() as db:
+            survey_models = (await db.scalars(query)).all()
+
+        return [cls.from_model(s) for s in survey_models]
+
+    @staticmethod
+    def best_query(
+        symbol: str, size: Sequence[str], deposits: Optional[Sequence[str]]
+    ) -> Select:
+        query = select(SurveyModel).where(
+            SurveyModel.symbol == symbol,
+            SurveyModel.size.in_(size),
+            # Expirations are the server's time
+            SurveyModel.expiration > server_clock.now(),
+        )
+        if deposits:
+            query = query.where(
+                or_(
+                    *[
+                        cast(SurveyModel.deposits, JSONB).contains([{"symbol": d}])
+                        for d in deposits
+                    ]
+                )
             )
-            for s in survey_models
-        ]
+        rank = case(
+            {s: i for i, s in enumerate(SURVEY_SIZES)},
+            value=SurveyModel.size,
+            else_=len(SURVEY_SIZES),
+        )
+        return query.order_by(rank, SurveyModel.expiration.desc()).limit(1)
 
     @classmethod
-    def from_db(cls, signature: str) -> Self:
+    def best(
+        cls,
+        symbol: str,
+        size: Sequence[str] = ("MODERATE", "LARGE"),
+        deposits: Optional[Sequence[str]] = None,
+    ) -> Optional[Self]:
         """
-        Get a persisted instance of this from the database.
+        The biggest unexpired survey of a waypoint, and the one with the
+        longest left of those, if any yield one of `deposits`.
         """
         with get_db() as db:
-            survey_model: SurveyModel = (
-                db.query(SurveyModel).filter(SurveyModel.signature == signature).one()
-            )
+            survey_model = db.scalar(cls.best_query(symbol, size, deposits))
+
+        return cls.from_model(survey_model) if survey_model else None
 
+    @classmethod
+    async def async_best(
+        cls,
+        symbol: str,
+        size: Sequence[str] = ("MODERATE", "LARGE"),
+        deposits: Optional[Sequence[str]] = None,
+    ) -> Optional[Self]:
+        """
+        Like best, without blocking the event loop
+        """
+        async with get_async_db() as db:
+            survey_model = await db.scalar(cls.best_query(symbol, size, deposits))
+
+        return cls.from_model(survey_model) if survey_model else None
+
+    @classmethod
+    def from_model(cls, survey_model: SurveyModel) -> Self:
         return cls(
             signature=survey_model.signature,
             symbol=survey_model.symbol,
             deposits=survey_model.deposits,
-            expiration=DateTime.build(datetime_string=survey_model.expiration),
+            expiration=DateTime.from_datetime(survey_model.expiration),
             size=survey_model.size,
         )
 
-    def save(self):
+    @classmethod
+    def from_db(cls, signature: str) -> Self:
         """
-        Persist in the database
+        Get a persisted instance of this from the database.
         """
-        survey_model = SurveyModel(
+        with get_db() as db:
+            survey_model: SurveyModel = (
+                db.query(SurveyModel).filter(SurveyModel.signature == signature).one()
+            )
+
+        return cls.from_model(survey_model)
+
+    def to_model(self) -> SurveyModel:
+        return SurveyModel(
             signature=self.signature,
             symbol=self.symbol,
             deposits=self.deposits,
-            expiration=self.expiration.raw,
+            expiration=self.expiration.utc_time,
             size=self.size,
         )
 
+    def save(self):
+        """
+        Persist in the database
+        """
         with get_db() as db:
-            db.add(survey_model)
+            db.execute(upsert(SurveyModel, [row_values(self.to_model())]))
             db.commit()
 
+    async def async_save(self) -> None:
+        """
+        Queue to be persisted with the next batch
+        """
+        await writer.put(self.to_model())
+
 
 @attrs.define
 class Extraction:
@@ -3,6 +3,8 @@ from typing import Any, Dict, Self
 import attrs
 from structlog import get_logger
 
+from src.support.datetime import DateTime, server_clock
+
 log = get_logger(__name__)
 
 
@@ -27,3 +29,21 @@ class Nav:
     def build(cls, data: Dict) -> Self:
         route = Route(**data.pop("route"))
         return cls(**data, route=route)
+
+    @property
+    def seconds_to_arrival(self) -> float:
+        """
+        Seconds until the ship arrives, by the server's clock.
+        """
+        arrival = DateTime.build(self.route.arrival).utc_time
+        return max(0.0, server_clock.seconds_until(arrival))
+
+    @property
+    def current_status(self) -> str:
+        """
+        The status now, without asking: a ship in transit is in orbit
+        at its destination once the arrival time has passed.
+        """
+        if self.status == "IN_TRANSIT" and not self.seconds_to_arrival:
+            return "IN_ORBIT"
+        return self.status
@@ -2,9 +2,21 @@ from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Self, Unio
 
 import attrs
 
-from src.api import PATHS, client, safe_get, safe_patch, safe_post, sync_get
+from src.api import (
+    PATHS,
+    Paginator,
+    Priority,
+    agent_pool,
+    cooldowns,
+    safe_get,
+    safe_patch,
+    safe_post,
+    sync_get,
+    sync_paginate,
+)
 
 from .errors import Error
+from .fleet import fleet
 from .generic import Cooldown
 from .mining import Extraction, Survey
 from .nav import Nav
@@ -154,34 +166,71 @@ class Ship:
             nav=nav,
         )
 
+    @property
+    def agent(self) -> Optional[str]:
+        """
+        The agent that owns this ship, None for the default one.
+        """
+        return agent_pool.owner(self.symbol)
+
     @classmethod
-    async def get(cls, symbol: str) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.ship(symbol=symbol))
+    async def get(cls, symbol: str, cached: bool = False) -> Union[Self, Error]:
+        """
+        The ship, refreshed from the API. With `cached`, the ship as the
+        fleet state last knew it, if it knows it.
+        """
+        if cached and (ship := fleet.ship(symbol)):
+            return ship
+        result = await safe_get(
+            path=PATHS.ship(symbol=symbol), priority=Priority.SHIP_ACTION
+        )
         match result:
             case dict():
-                return cls.build(result)
+                return fleet.track_ship(cls.build(result))
             case _:
                 return result
-            
+
     @classmethod
     def sync_get(cls, symbol: str) -> Union[Self, Error]:
         result = sync_get(path=PATHS.ship(symbol=symbol))
         match result:
             case dict():
-                return cls.build(result)
+                return fleet.track_ship(cls.build(result))
             case _:
                 return result
 
+    def _update(self, **parts: Any) -> None:
+        """
+        Apply parts of this ship from an action response,
+        here and in the fleet state.
+        """
+        for name, value in parts.items():
+            setattr(self, name, value)
+        fleet.update_ship(self.symbol, **parts)
+
+    async def wait_for_cooldown(self) -> float:
+        """
+        Wait, without blocking, until this ship's reactor is ready again.
+        Reactor actions wait for it anyway, this is for doing it up front.
+        """
+        return await cooldowns.wait(self.symbol)
+
     async def navigation_status(self) -> Union[Nav, Error]:
-        result = await safe_get(path=PATHS.ship_nav(self.symbol))
+        result = await safe_get(
+            path=PATHS.ship_nav(self.symbol), priority=Priority.SHIP_ACTION
+        )
         match result:
             case dict():
-                return Nav(**result)
+                nav = Nav.build(result)
+                self._update(nav=nav)
+                return nav
             case _:
                 return result
 
     async def chart(self) -> Union[dict, Error]:
-        result = await safe_post(path=PATHS.ship_chart(self.symbol))
+        result = await safe_post(
+            path=PATHS.ship_chart(self.symbol), priority=Priority.BULK
+        )
         match result:
             case dict():
                 return dict(
@@ -198,15 +247,21 @@ class Ship:
         result = await safe_patch(path=PATHS.ship_nav(self.symbol), data=data)
         match result:
             case dict():
-                return Nav(**result)
+                nav = Nav.build(result)
+                self._update(nav=nav)
+                return nav
             case _:
                 return result
 
     async def cargo_status(self) -> Union[Cargo, Error]:
-        result = await safe_get(path=PATHS.ship_cargo(self.symbol))
+        result = await safe_get(
+            path=PATHS.ship_cargo(self.symbol), priority=Priority.SHIP_ACTION
+        )
         match result:
             case dict():
-                return Cargo.build(result)
+                cargo = Cargo.build(result)
+                self._update(cargo=cargo)
+                return cargo
             case _:
                 return result
 
@@ -219,30 +274,39 @@ class Ship:
         )
         match result:
             case dict():
-                return Nav(**result["nav"])
+                nav = Nav.build(result["nav"])
+                self._update(nav=nav, fuel=Fuel(**result["fuel"]))
+                return nav
             case _:
                 return result
 
     async def orbit(self) -> Union[Nav, Error]:
         """
-        Put ship in orbit
+        Put ship in orbit, unless it already is
         """
-        result = await safe_post(path=PATHS.ship_orbit(self.symbol))
-        match result:
-            case dict():
-                return Nav(**result["nav"])
-            case _:
-                return result
+        return await self._transition("IN_ORBIT", PATHS.ship_orbit(self.symbol))
 
     async def dock(self) -> Union[Nav, Error]:
         """
-        Dock ship
+        Dock ship, unless it already is
         """
-        result = await safe_post(path=PATHS.ship_dock(self.symbol))
+        return await self._transition("DOCKED", PATHS.ship_dock(self.symbol))
+
+    async def _transition(self, status: str, path: str) -> Union[Nav, Error]:
+        if self.nav.current_status == status:
+            # Our nav comes from every response that changes it, so trust it
+            self.nav.status = status
+            fleet.stats.skipped_transitions += 1
+            return self.nav
+        result = await safe_post(path=path)
         match result:
             case dict():
-                return Nav(**result["nav"])
+                nav = Nav.build(result["nav"])
+                self._update(nav=nav)
+                return nav
             case _:
+                # Something else moved the ship, find out where it is
+                await self.navigation_status()
                 return result
 
     async def negotiate_contract(self) -> Union["Contract", Error]:
@@ -267,9 +331,11 @@ class Ship:
         result = await safe_post(path=PATHS.ship_refuel(self.symbol))
         match result:
             case dict():
+                fuel = Fuel(**result["fuel"])
+                self._update(fuel=fuel)
                 return dict(
-                    agent=Agent(**result["agent"]),
-                    fuel=Fuel(**result["fuel"]),
+                    agent=fleet.track_agent(Agent(**result["agent"])),
+                    fuel=fuel,
                     transaction=Transaction(**result["transaction"]),
                 )
             case _:
@@ -287,10 +353,12 @@ class Ship:
         match result:
             case dict():
                 yield_ = result["extraction"].pop("yield")
+                cargo = Cargo.build(result["cargo"])
+                self._update(cargo=cargo)
                 return dict(
                     extraction=Extraction(**result["extraction"], yield_=yield_),
                     cooldown=Cooldown(**result["cooldown"]),
-                    cargo=Cargo.build(result["cargo"]),
+                    cargo=cargo,
                 )
             case Error():
                 # See if the result is a survey exhaustion
@@ -326,9 +394,11 @@ class Ship:
         )
         match result:
             case dict():
+                cargo = Cargo.build(result["cargo"])
+                self._update(cargo=cargo)
                 return dict(
-                    agent=Agent(**result["agent"]),
-                    cargo=Cargo.build(result["cargo"]),
+                    agent=fleet.track_agent(Agent(**result["agent"])),
+                    cargo=cargo,
                     transaction=Transaction(**result["transaction"]),
                 )
             case _:
@@ -340,9 +410,9 @@ class Ship:
         )
         match result:
             case dict():
-                return dict(
-                    cooldown=Cooldown(**result["cooldown"]), nav=Nav(**result["nav"])
-                )
+                nav = Nav.build(result["nav"])
+                self._update(nav=nav)
+                return dict(cooldown=Cooldown(**result["cooldown"]), nav=nav)
             case _:
                 return result
 
@@ -355,24 +425,51 @@ class ShipsManager:
     ships: List[Ship]
 
     @classmethod
-    def all(cls) -> Self:
-        api_result = client.get(PATHS.MY_SHIPS)
-        api_result.raise_for_status()
-        meta = api_result.json()["meta"]
-        ships = [Ship.build(d) for d in api_result.json()["data"]]
-        return cls(
-            total=meta["total"], page=meta["page"], limit=meta["limit"], ships=ships
+    async def all(cls, agent: Optional[str] = None) -> Union[Self, Error]:
+        """
+        Every ship in the fleet, across all pages.
+        With `agent`, that agent's fleet, and its ships are routed to it.
+        """
+        paginator = Paginator(
+            path=PATHS.MY_SHIPS, priority=Priority.SHIP_ACTION, agent=agent
         )
+        result = await paginator.all()
+        match result:
+            case list():
+                return cls._build(result, agent)
+            case _:
+                return result
+
+    @classmethod
+    def sync_all(cls, agent: Optional[str] = None) -> Union[Self, Error]:
+        result = sync_paginate(path=PATHS.MY_SHIPS, agent=agent)
+        match result:
+            case list():
+                return cls._build(result, agent)
+            case _:
+                return result
+
+    @classmethod
+    def _build(cls, data: List[Dict], agent: Optional[str]) -> Self:
+        ships = [fleet.track_ship(Ship.build(d)) for d in data]
+        if agent:
+            for ship in ships:
+                agent_pool.assign(ship.symbol, agent)
+        return cls(total=len(ships), page=1, limit=len(ships), ships=ships)
 
     @staticmethod
-    async def buy_ship(ship_type: str, waypoint_symbol: str) -> Union[Ship, Error]:
+    async def buy_ship(
+        ship_type: str, waypoint_symbol: str, agent: Optional[str] = None
+    ) -> Union[Ship, Error]:
         """
-        Purchase a ship
+        Purchase a ship, as `agent` if we run several
         """
         post_data = dict(shipType=ship_type, waypointSymbol=waypoint_symbol)
-        result = await safe_post(path=PATHS.MY_SHIPS, data=post_data)
+        result = await safe_post(path=PATHS.MY_SHIPS, data=post_data, agent=agent)
         match result:
             case dict():
-                return Ship(**result["ship"])
+                if agent:
+                    agent_pool.assign(result["ship"]["symbol"], agent)
+                return fleet.track_ship(Ship.build(result["ship"]))
             case _:
                 return result
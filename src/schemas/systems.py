@@ -3,10 +3,12 @@ from typing import Dict, List, Optional, Self, Union
 import attrs
 from sqlalchemy import update
 
-from src.api import PATHS, client, safe_get, sync_get
-from src.db import get_db
+from src.api import PATHS, Paginator, Priority, safe_get, sync_get, sync_paginate
+from src.db import get_async_db, get_db
+from src.db.cache import db_cache
 from src.db.models.systems import SystemMappingStatusModel, SystemModel
 from src.db.models.waypoints import MappedEnum
+from src.db.writer import row_values, upsert, writer
 from src.schemas.errors import Error
 
 from .factions import FactionSummary
@@ -21,18 +23,38 @@ class SystemWaypoints:
     waypoints: List[Waypoint]
 
     @classmethod
-    def get(cls, symbol: str) -> Self:
-        api_response = client.get(PATHS.system_waypoints(symbol=symbol))
-        api_response.raise_for_status()
-        meta = api_response.json()["meta"]
-        waypoints = [Waypoint(**x) for x in api_response.json()["data"]]
-
-        return cls(
-            total=meta["total"],
-            page=meta["page"],
-            limit=meta["limit"],
-            waypoints=waypoints,
-        )
+    async def get(cls, symbol: str) -> Union[Self, Error]:
+        """
+        Every waypoint in the system, across all pages.
+        """
+        paginator = Paginator(path=PATHS.system_waypoints(symbol=symbol))
+        result = await paginator.all()
+        match result:
+            case list():
+                waypoints = [Waypoint(**x) for x in result]
+                return cls(
+                    total=len(waypoints),
+                    page=1,
+                    limit=len(waypoints),
+                    waypoints=waypoints,
+                )
+            case _:
+                return result
+
+    @classmethod
+    def sync_get(cls, symbol: str) -> Union[Self, Error]:
+        result = sync_paginate(path=PATHS.system_waypoints(symbol=symbol))
+        match result:
+            case list():
+                waypoints = [Waypoint(**x) for x in result]
+                return cls(
+                    total=len(waypoints),
+                    page=1,
+                    limit=len(waypoints),
+                    waypoints=waypoints,
+                )
+            case _:
+                return result
 
 
 @attrs.define
@@ -46,11 +68,10 @@ class System:
     factions: List[FactionSummary]
     mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED
 
-    def save(self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED) -> None:
-        """
-        Persist in the database
-        """
-        model = SystemModel(
+    def to_model(
+        self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED
+    ) -> SystemModel:
+        return SystemModel(
             sectorSymbol=self.sectorSymbol,
             symbol=self.symbol,
             mapped=mapped,
@@ -61,10 +82,27 @@ class System:
             factions=[attrs.asdict(f) for f in self.factions],
         )
 
+    def save(self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED) -> None:
+        """
+        Persist in the database
+        """
         with get_db() as db:
-            db.add(model)
+            db.execute(
+                upsert(
+                    SystemModel, [row_values(self.to_model(mapped))], keep=["mapped"]
+                )
+            )
             db.commit()
 
+    async def async_save(
+        self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED
+    ) -> None:
+        """
+        Queue to be persisted with the next batch.
+        If it is already in the database it stays as mapped as it was.
+        """
+        await writer.put(self.to_model(mapped), keep=["mapped"])
+
     def mapping_in_progress(self, ship_symbol: str) -> None:
         with get_db() as db:
             db.execute(
@@ -77,9 +115,41 @@ class System:
                 mapped=MappedEnum.INCOMPLETE,
                 ship_symbol=ship_symbol,
             )
+            for statement in db_cache.notifications("system", self.symbol):
+                db.execute(statement)
             db.commit()
+        db_cache.delete("system", self.symbol)
         self.mapped = MappedEnum.INCOMPLETE
 
+    async def async_mapping_in_progress(self, ship_symbol: str) -> None:
+        await self._async_set_mapping(
+            ship_symbol, mapped=MappedEnum.INCOMPLETE, only_from=None
+        )
+
+    async def async_mapping_complete(self, ship_symbol: str) -> None:
+        await self._async_set_mapping(
+            ship_symbol, mapped=MappedEnum.MAPPED, only_from=MappedEnum.INCOMPLETE
+        )
+
+    async def _async_set_mapping(
+        self, ship_symbol: str, mapped: MappedEnum, only_from: Optional[MappedEnum]
+    ) -> None:
+        # It might still be waiting to be written
+        await writer.flush()
+        query = update(SystemModel).where(SystemModel.symbol == self.symbol)
+        if only_from:
+            query = query.where(SystemModel.mapped == only_from)
+        async with get_async_db() as db:
+            await db.execute(query.values(mapped=mapped))
+            await SystemMappingStatusModel.async_set_mapping(
+                db, symbol=self.symbol, mapped=mapped, ship_symbol=ship_symbol
+            )
+            for statement in db_cache.notifications("system", self.symbol):
+                await db.execute(statement)
+            await db.commit()
+        db_cache.delete("system", self.symbol)
+        self.mapped = mapped
+
     def mapping_complete(self, ship_symbol: str) -> None:
         with get_db() as db:
             db.execute(
@@ -95,7 +165,10 @@ class System:
                 mapped=MappedEnum.MAPPED,
                 ship_symbol=ship_symbol,
             )
+            for statement in db_cache.notifications("system", self.symbol):
+                db.execute(statement)
             db.commit()
+        db_cache.delete("system", self.symbol)
         self.mapped = MappedEnum.MAPPED
 
     @classmethod
@@ -103,17 +176,42 @@ class System:
         """
         Get a persisted instance of this from the database, if one exists.
         """
+        if cached := db_cache.get("system", symbol):
+            return cached
         with get_db() as db:
             system_model: SystemModel = (
                 db.query(SystemModel).filter(SystemModel.symbol == symbol).one_or_none()
             )
 
         if system_model:
-            data = system_model.__dict__
-            data.pop("_sa_instance_state")
-            return cls.build(data)
+            result = cls.from_model(system_model)
+            db_cache.set("system", symbol, result)
+            return result
         return None
 
+    @classmethod
+    async def async_from_db(cls, symbol: str) -> Optional[Self]:
+        """
+        Like from_db, without blocking the event loop.
+        """
+        db_cache.listen()
+        if cached := db_cache.get("system", symbol):
+            return cached
+        async with get_async_db() as db:
+            system_model = await db.get(SystemModel, symbol)
+
+        if system_model:
+            result = cls.from_model(system_model)
+            db_cache.set("system", symbol, result)
+            return result
+        return None
+
+    @classmethod
+    def from_model(cls, system_model: SystemModel) -> Self:
+        data = system_model.__dict__
+        data.pop("_sa_instance_state")
+        return cls.build(data)
+
     @classmethod
     def build(cls, data: Dict) -> Self:
         waypoints = [WaypointSummary(**x) for x in data.pop("waypoints")]
@@ -122,14 +220,15 @@ class System:
 
     @classmethod
     async def get(cls, symbol: str) -> Union[Self, Error]:
-        db_result = cls.from_db(symbol=symbol)
+        db_result = await cls.async_from_db(symbol=symbol)
         if db_result:
             return db_result
-        result = await safe_get(path=PATHS.system(symbol))
+        result = await safe_get(path=PATHS.system(symbol), priority=Priority.BULK)
         match result:
             case dict():
                 api_result = cls.build(result)
-                api_result.save()
+                await api_result.async_save()
+                db_cache.set("system", symbol, api_result)
                 return api_result
             case _:
                 return result
@@ -144,6 +243,7 @@ class System:
             case dict():
                 api_result = cls.build(result)
                 api_result.save()
+                db_cache.set("system", symbol, api_result)
                 return api_result
             case _:
                 return result
@@ -179,7 +279,7 @@ class JumpGate:
 
     @classmethod
     async def get(cls, symbol: str) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.jumpgate(symbol))
+        result = await safe_get(path=PATHS.jumpgate(symbol), priority=Priority.BULK)
         match result:
             case dict():
                 return cls.build(result)
@@ -3,10 +3,12 @@ from typing import Any, Dict, List, Optional, Self, Union
 import attrs
 from sqlalchemy import update
 
-from src.api import PATHS, safe_get, sync_get
-from src.db import get_db
+from src.api import PATHS, Priority, safe_get, sync_get
+from src.db import get_async_db, get_db
+from src.db.cache import db_cache
 from src.db.models.charts import ChartModel
 from src.db.models.waypoints import MappedEnum, WaypointModel
+from src.db.writer import row_values, upsert, writer
 from src.schemas.errors import Error
 from src.schemas.markets import Market
 from src.support.datetime import DateTime
@@ -38,21 +40,27 @@ class Chart:
             submittedOn=DateTime.build(data.get("submittedOn", "")),
         )
 
-    @classmethod
-    def save(self) -> Optional[Self]:
-        """
-        Save this chart to the database.
-        """
-        chart_model = ChartModel(
+    def to_model(self) -> ChartModel:
+        return ChartModel(
             waypointSymbol=self.waypointSymbol,
             submittedBy=self.submittedBy,
             submittedOn=self.submittedOn.raw,
         )
 
+    def save(self) -> None:
+        """
+        Save this chart to the database.
+        """
         with get_db() as db:
-            db.add(chart_model)
+            db.execute(upsert(ChartModel, [row_values(self.to_model())]))
             db.commit()
 
+    async def async_save(self) -> None:
+        """
+        Queue this chart to be saved with the next batch.
+        """
+        await writer.put(self.to_model())
+
 
 @attrs.define
 class Trait:
@@ -91,11 +99,10 @@ class Waypoint:
     mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED
     orbits: Optional[str] = ""
 
-    def save(self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED) -> None:
-        """
-        Persist in the database
-        """
-        model = WaypointModel(
+    def to_model(
+        self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED
+    ) -> WaypointModel:
+        return WaypointModel(
             systemSymbol=self.systemSymbol,
             symbol=self.symbol,
             mapped=mapped,
@@ -108,10 +115,27 @@ class Waypoint:
             chart=self.chart.asdict(),
         )
 
+    def save(self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED) -> None:
+        """
+        Persist in the database
+        """
         with get_db() as db:
-            db.add(model)
+            db.execute(
+                upsert(
+                    WaypointModel, [row_values(self.to_model(mapped))], keep=["mapped"]
+                )
+            )
             db.commit()
 
+    async def async_save(
+        self, mapped: Optional[MappedEnum] = MappedEnum.UN_MAPPED
+    ) -> None:
+        """
+        Queue to be persisted with the next batch.
+        If it is already in the database it stays as mapped as it was.
+        """
+        await writer.put(self.to_model(mapped), keep=["mapped"])
+
     def set_mapped(self) -> None:
         with get_db() as db:
             db.execute(
@@ -119,7 +143,25 @@ class Waypoint:
                 .where(WaypointModel.symbol == self.symbol)
                 .values(mapped=MappedEnum.MAPPED)
             )
+            for statement in db_cache.notifications("waypoint", self.symbol):
+                db.execute(statement)
             db.commit()
+        db_cache.delete("waypoint", self.symbol)
+        self.mapped = MappedEnum.MAPPED
+
+    async def async_set_mapped(self) -> None:
+        # It might still be waiting to be written
+        await writer.flush()
+        async with get_async_db() as db:
+            await db.execute(
+                update(WaypointModel)
+                .where(WaypointModel.symbol == self.symbol)
+                .values(mapped=MappedEnum.MAPPED)
+            )
+            for statement in db_cache.notifications("waypoint", self.symbol):
+                await db.execute(statement)
+            await db.commit()
+        db_cache.delete("waypoint", self.symbol)
         self.mapped = MappedEnum.MAPPED
 
     @classmethod
@@ -127,6 +169,8 @@ class Waypoint:
         """
         Get a persisted instance of this from the database, if one exists.
         """
+        if cached := db_cache.get("waypoint", symbol):
+            return cached
         with get_db() as db:
             waypoint_model: WaypointModel = (
                 db.query(WaypointModel)
@@ -135,19 +179,42 @@ class Waypoint:
             )
 
         if waypoint_model:
-            data = waypoint_model.__dict__
-            data.pop("_sa_instance_state")
-            return cls.build(data)
+            result = cls.from_model(waypoint_model)
+            db_cache.set("waypoint", symbol, result)
+            return result
         return None
 
-    async def can_refuel(self) -> bool:
+    @classmethod
+    async def async_from_db(cls, symbol: str) -> Optional[Self]:
+        """
+        Like from_db, without blocking the event loop.
+        """
+        db_cache.listen()
+        if cached := db_cache.get("waypoint", symbol):
+            return cached
+        async with get_async_db() as db:
+            waypoint_model = await db.get(WaypointModel, symbol)
+
+        if waypoint_model:
+            result = cls.from_model(waypoint_model)
+            db_cache.set("waypoint", symbol, result)
+            return result
+        return None
+
+    @classmethod
+    def from_model(cls, waypoint_model: WaypointModel) -> Self:
+        data = waypoint_model.__dict__
+        data.pop("_sa_instance_state")
+        return cls.build(data)
+
+    async def can_refuel(self, agent: Optional[str] = None) -> bool:
         """
         True if this Waypoint has a market place and that
-        market place sells fuel
+        market place sells fuel, as seen by the `agent` with a ship here
         """
         has_market_place = any([t.symbol == "MARKETPLACE" for t in self.traits])
         if has_market_place:
-            marketplace = await Market.get(self.symbol)
+            marketplace = await Market.get(self.symbol, agent=agent)
             if isinstance(marketplace, Market):
                 # Note we use tradeGoods because we should be at this location to see them.
                 sells_fuel = any([c.symbol == "FUEL" for c in marketplace.tradeGoods])
@@ -183,21 +250,25 @@ class Waypoint:
                 case dict():
                     api_result = cls.build(result)
                     api_result.save()
+                    db_cache.set("waypoint", symbol, api_result)
                     return api_result
                 case _:
                     return result
 
     @classmethod
     async def get(cls, symbol: str) -> Union[Self, Error]:
-        db_result = cls.from_db(symbol=symbol)
+        db_result = await cls.async_from_db(symbol=symbol)
         if db_result:
             return db_result
         else:
-            result = await safe_get(path=PATHS.waypoint(symbol=symbol))
+            result = await safe_get(
+                path=PATHS.waypoint(symbol=symbol), priority=Priority.BULK
+            )
             match result:
                 case dict():
                     api_result = cls.build(result)
-                    api_result.save()
+                    await api_result.async_save()
+                    db_cache.set("waypoint", symbol, api_result)
                     return api_result
                 case _:
                     return result
@@ -221,8 +292,8 @@ class Shipyard:
         return cls(**data)
     
     @classmethod
-    def sync_get(cls, symbol: str) -> Self | Error:
-        result = sync_get(path=PATHS.shipyard(symbol=symbol))
+    def sync_get(cls, symbol: str, agent: Optional[str] = None) -> Self | Error:
+        result = sync_get(path=PATHS.shipyard(symbol=symbol), agent=agent)
         match result:
             case dict():
                 return cls.build(result)
@@ -230,8 +301,14 @@ class Shipyard:
                 return result
 
     @classmethod
-    async def get(cls, symbol: str) -> Union[Self, Error]:
-        result = await safe_get(path=PATHS.shipyard(symbol=symbol))
+    async def get(cls, symbol: str, agent: Optional[str] = None) -> Union[Self, Error]:
+        """
+        The shipyard as `agent` sees it: prices are only shown to an agent
+        with a ship there.
+        """
+        result = await safe_get(
+            path=PATHS.shipyard(symbol=symbol), priority=Priority.MARKET, agent=agent
+        )
         match result:
             case dict():
                 return cls.build(result)
@@ -68,22 +68,4 @@ class SpaceTradersConfig(ConfigParser):
         return files
 
 
-class SpaceTradersCache:
-    def __init__(self):
-        self.cache = {}
-
-    def get(self, key):
-        return self.cache.get(key)
-
-    def set(self, key, value):
-        self.cache[key] = value
-
-    def delete(self, key):
-        if key in self.cache:
-            del self.cache[key]
-
-    def clear(self):
-        self.cache.clear()
-
-
 config = SpaceTradersConfig(config_path=CONFIG_ROOT)
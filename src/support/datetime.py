@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Self
+from datetime import datetime, timedelta
+from typing import Optional, Self
 
 import attrs
 import pytz
@@ -17,6 +17,59 @@ def local_now():
     return datetime.now().astimezone(tz=pytz.timezone(LOCAL_TZ))
 
 
+class ServerClock:
+    """
+    How far the API's clock is ahead of ours, worked out from the Date
+    header of its responses.
+
+    The header only has whole seconds, so each response gives a window
+    the offset must be in. Every response narrows the window and we use
+    its middle.
+    """
+
+    def __init__(self) -> None:
+        self.low: Optional[float] = None
+        self.high: Optional[float] = None
+
+    @property
+    def offset(self) -> float:
+        if self.low is None or self.high is None:
+            return 0.0
+        return (self.low + self.high) / 2
+
+    @property
+    def uncertainty(self) -> float:
+        """
+        How far off `offset` may be, in seconds.
+        """
+        if self.low is None or self.high is None:
+            return 0.5
+        return (self.high - self.low) / 2
+
+    def observe(self, date: datetime, sent: float, received: float) -> None:
+        """
+        A response stamped `date`, for a request sent and received at
+        these local timestamps.
+        """
+        server = date.timestamp()
+        low, high = server - received, server + 1 - sent
+        known = self.low is not None and self.high is not None
+        if not known or low > self.high or high < self.low:
+            # Our first response, or one of the clocks has jumped
+            self.low, self.high = low, high
+        else:
+            self.low, self.high = max(self.low, low), min(self.high, high)
+
+    def now(self) -> datetime:
+        return utc_now() + timedelta(seconds=self.offset)
+
+    def seconds_until(self, moment: datetime) -> float:
+        return (moment - self.now()).total_seconds()
+
+
+server_clock = ServerClock()
+
+
 @attrs.define
 class DateTime:
     """
@@ -34,3 +87,12 @@ class DateTime:
             local_timezone = utc_time.astimezone(tz=pytz.timezone(LOCAL_TZ))
             return cls(raw=datetime_string, utc_time=utc_time, local_time=local_timezone)
         return cls()
+
+    @classmethod
+    def from_datetime(cls, moment: datetime) -> Self:
+        """
+        From an aware datetime, with `raw` formatted the way the API does.
+        """
+        utc_time = moment.astimezone(tz=pytz.timezone("utc"))
+        raw = utc_time.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        return cls.build(raw)
@@ -16,3 +16,41 @@ def run():
         port=9000,
         host="0.0.0.0",
     )
+
+
+@app.command(name="mock")
+@click.option("--port", "-p", help="Port to serve on", default=9001)
+@click.option("--ships", "-s", help="Ships for the default agent", default=30)
+@click.option("--systems", help="Systems in the generated universe", default=20)
+@click.option(
+    "--time-scale",
+    "-t",
+    help="Multiplier for travel times and cooldowns, e.g. 0.1 for 10x speed",
+    default=1.0,
+)
+@click.option(
+    "--rate-limit", help="Requests per second per token, 0 for none", default=2.0
+)
+@click.option("--burst", help="Rate limit burst per token", default=10)
+@click.option("--seed", help="Seed for the generated universe", default=1)
+@click.option("--strict-auth", is_flag=True, help="Reject unknown tokens")
+def mock(port, ships, systems, time_scale, rate_limit, burst, seed, strict_auth):
+    """
+    Run a local mock of the SpaceTraders API.
+
+    Set `base_path = http://localhost:<port>/v2` in the [api] config to use it.
+    """
+    from rich.pretty import pprint
+
+    from src.mock.app import DEFAULT_AGENT, RateLimit, create_app
+    from src.mock.universe import Universe
+
+    universe = Universe.generate(systems=systems, time_scale=time_scale, seed=seed)
+    agent = universe.register(DEFAULT_AGENT, ships=ships)
+    pprint(dict(agent=agent.symbol, token=agent.token, ships=ships))
+    app = create_app(
+        universe,
+        rate_limit=RateLimit(rate=rate_limit, burst=burst) if rate_limit else None,
+        strict_auth=strict_auth,
+    )
+    app.run(port=port, host="0.0.0.0", threaded=True)
@@ -1 +1 @@
-from src.web.views import index, htmx  # noqa
+from src.web.views import index, htmx, metrics  # noqa
@@ -18,7 +18,7 @@ routes = Blueprint("index", __name__, url_prefix="/")
 @render_html()
 def base_page():
     agent = Agent.me_sync()
-    ships = ShipsManager.all()
+    ships = ShipsManager.sync_all()
     return dict(agent=agent, ships=ships)
 
 
@@ -32,7 +32,7 @@ def agent():
 @routes.route("/ships")
 @render_html()
 def ships():
-    ships = ShipsManager.all()
+    ships = ShipsManager.sync_all()
     return dict(ships=ships)
 
 
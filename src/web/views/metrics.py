@@ -0,0 +1,21 @@
+"""
+Metrics.py - API request metrics for Prometheus to scrape
+"""
+from flask import Blueprint, Response
+
+from src.api import request_metrics
+from src.api.metrics import render_prometheus
+from src.web.app import app
+
+routes = Blueprint("metrics", __name__, url_prefix="/")
+
+
+@routes.route("/metrics")
+def metrics():
+    return Response(
+        render_prometheus(request_metrics.stats),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+app.register_blueprint(routes)
@@ -0,0 +1,89 @@
+import httpx
+
+from src.api.agents import DEFAULT_AGENT, AgentPool
+from src.api.concurrency import AdaptiveLimit
+from src.api.limiter import TokenBucket
+from src.api.transport import ApiRequest
+
+SYSTEM = "X1-DF55"
+WAYPOINT = f"{SYSTEM}-20250Z"
+
+
+def pool() -> AgentPool:
+    agents = AgentPool(
+        make_limiter=lambda: TokenBucket(rate=2, burst=10),
+        make_concurrency=lambda: AdaptiveLimit(initial=4),
+        make_client=httpx.Client,
+        make_async_client=httpx.AsyncClient,
+    )
+    agents.add(DEFAULT_AGENT, "default-token")
+    agents.add("OTHER", "other-token")
+    return agents
+
+
+def routed(agents: AgentPool, method: str, path: str, **kwargs) -> str:
+    return agents.route(ApiRequest(method, path, **kwargs)).symbol
+
+
+def busy(agents: AgentPool, symbol: str) -> None:
+    for _ in range(10):
+        agents.agents[symbol].limiter.reserve()
+
+
+def test_asked_for_agent():
+    agents = pool()
+    assert routed(agents, "GET", "/my/agent", agent="OTHER") == "OTHER"
+    # One we don't have a token for
+    assert routed(agents, "GET", "/my/agent", agent="NOBODY") == DEFAULT_AGENT
+
+
+def test_ships_go_to_their_owner():
+    agents = pool()
+    assert routed(agents, "POST", "/my/ships/OTHER-1/extract") == "OTHER"
+    assert routed(agents, "POST", "/my/ships/MOCK-1/extract") == DEFAULT_AGENT
+    agents.assign("MOCK-2", "OTHER")
+    assert routed(agents, "GET", "/my/ships/MOCK-2") == "OTHER"
+
+
+def test_contracts_go_to_their_owner():
+    agents = pool()
+    agents.assign("contract-1", "OTHER")
+    assert routed(agents, "POST", "/my/contracts/contract-1/accept") == "OTHER"
+
+
+def test_ship_in_the_body():
+    agents = pool()
+    data = {"shipSymbol": "OTHER-1", "waypointSymbol": WAYPOINT}
+    assert routed(agents, "POST", "/my/surveys", data=data) == "OTHER"
+
+
+def test_own_data_and_registration_use_the_default():
+    agents = pool()
+    busy(agents, DEFAULT_AGENT)
+    assert routed(agents, "GET", "/my/agent") == DEFAULT_AGENT
+    assert routed(agents, "POST", "/register", authenticated=False) == DEFAULT_AGENT
+
+
+def test_public_data_goes_to_the_least_busy():
+    agents = pool()
+    busy(agents, DEFAULT_AGENT)
+    assert routed(agents, "GET", f"/systems/{SYSTEM}") == "OTHER"
+    busy(agents, "OTHER")
+    busy(agents, "OTHER")
+    assert routed(agents, "GET", f"/systems/{SYSTEM}") == DEFAULT_AGENT
+
+
+def test_markets_always_ask_as_the_same_agent():
+    agents = pool()
+    busy(agents, DEFAULT_AGENT)
+    path = f"/systems/{SYSTEM}/waypoints/{WAYPOINT}/market"
+    assert routed(agents, "GET", path) == DEFAULT_AGENT
+    assert routed(agents, "GET", path, agent="OTHER") == "OTHER"
+
+
+def test_route_is_remembered():
+    agents = pool()
+    request = ApiRequest("GET", f"/systems/{SYSTEM}")
+    first = agents.route(request)
+    busy(agents, first.symbol)
+    assert agents.route(request) is first
@@ -0,0 +1,106 @@
+import pytest
+
+from src.api import cache
+from src.api.cache import ResponseCache, cache_rule
+from src.api.paths import PATHS
+
+WAYPOINT = "X1-AB12-C34"
+
+# A market as an agent with a ship there sees it
+MARKET = {"data": {"symbol": WAYPOINT, "tradeGoods": []}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    return now
+
+
+def test_rules():
+    assert cache_rule(PATHS.MY_SHIPS).ttl == 0
+    assert cache_rule(PATHS.market(symbol=WAYPOINT)).per_agent
+    assert not cache_rule(PATHS.waypoint(symbol=WAYPOINT)).per_agent
+    assert cache_rule(PATHS.system_waypoints(symbol=WAYPOINT) + "?page=2").name == (
+        "system_waypoints"
+    )
+    assert cache_rule("/nowhere") is None
+
+
+def test_hit_is_a_copy():
+    responses = ResponseCache()
+    path = PATHS.waypoint(symbol=WAYPOINT)
+    responses.set(path, {"traits": []}, size=10)
+    first = responses.get(path)
+    first["traits"].append("changed")
+    assert responses.get(path) == {"traits": []}
+    assert responses.stats.hits == 2
+
+
+def test_never_caches_our_ships():
+    responses = ResponseCache()
+    responses.set(PATHS.MY_SHIPS, {}, size=10)
+    assert responses.get(PATHS.MY_SHIPS) is None
+    assert not responses.entries
+
+
+def test_expires(clock):
+    responses = ResponseCache()
+    path = PATHS.market(symbol=WAYPOINT)
+    responses.set(path, MARKET, size=10, agent="A")
+    clock[0] += cache_rule(path).ttl + 1
+    assert responses.get(path, agent="A") is None
+    assert responses.stats.expirations == 1
+    assert responses.stats.size == 0
+
+
+def test_markets_are_kept_per_agent():
+    responses = ResponseCache()
+    path = PATHS.market(symbol=WAYPOINT)
+    responses.set(path, MARKET, size=10, agent="A")
+    assert responses.get(path, agent="A") == MARKET
+    assert responses.get(path, agent="B") is None
+
+
+def test_market_without_prices_is_not_kept():
+    responses = ResponseCache()
+    path = PATHS.market(symbol=WAYPOINT)
+    # Seen from afar: once a ship arrives this would hide the prices
+    responses.set(path, {"data": {"symbol": WAYPOINT}}, size=10, agent="A")
+    assert responses.get(path, agent="A") is None
+    assert not responses.entries
+
+
+def test_evicts_least_recently_used():
+    responses = ResponseCache(max_size=25)
+    paths = [PATHS.waypoint(symbol=f"{WAYPOINT}{i}") for i in range(3)]
+    responses.set(paths[0], {}, size=10)
+    responses.set(paths[1], {}, size=10)
+    responses.get(paths[0])
+    responses.set(paths[2], {}, size=10)
+    assert responses.get(paths[1]) is None
+    assert responses.get(paths[0]) == {}
+    assert responses.stats.evictions == 1
+    assert responses.stats.size == 20
+
+
+def test_post_drops_every_page_and_agent():
+    responses = ResponseCache()
+    market = PATHS.market(symbol=WAYPOINT)
+    pages = PATHS.system_waypoints(symbol=WAYPOINT)
+    responses.set(market, MARKET, size=10, agent="A")
+    responses.set(market, MARKET, size=10, agent="B")
+    responses.set(f"{pages}?page=1", {}, size=10)
+    responses.set(f"{pages}?page=2", {}, size=10)
+    responses.invalidate_after_post(
+        PATHS.waypoint(symbol=WAYPOINT) + "/chart",
+        None,
+        {
+            "transaction": {"waypointSymbol": WAYPOINT},
+            "waypoint": {"symbol": WAYPOINT},
+        },
+    )
+    assert not responses.entries
+    assert not responses.keys
+    assert responses.stats.invalidations == 4
+    assert responses.stats.size == 0
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Dict, List
+
+from src.api.coalesce import SingleFlight
+
+
+class Endpoint:
+    # Counts the requests that reach it, each taking a little while
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self) -> Dict[str, List[int]]:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"data": [self.calls]}
+
+
+def test_concurrent_requests_share_one_call():
+    async def main() -> List[Dict]:
+        flights = SingleFlight()
+        endpoint = Endpoint()
+        results = await asyncio.gather(
+            *[flights.do("/systems/X1-A", endpoint) for _ in range(5)]
+        )
+        assert endpoint.calls == 1
+        assert flights.stats.sent == 1
+        assert flights.stats.coalesced == 4
+        return results
+
+    results = asyncio.run(main())
+    assert all(result == {"data": [1]} for result in results)
+    # Everyone gets their own copy to pop keys out of
+    results[0]["data"].append(2)
+    assert results[1] == {"data": [1]}
+
+
+def test_different_keys_are_sent_separately():
+    async def main() -> int:
+        flights = SingleFlight()
+        endpoint = Endpoint()
+        await asyncio.gather(
+            flights.do("/systems/X1-A", endpoint),
+            flights.do("/systems/X1-B", endpoint),
+        )
+        return endpoint.calls
+
+    assert asyncio.run(main()) == 2
+
+
+def test_later_requests_are_sent_again():
+    async def main() -> SingleFlight:
+        flights = SingleFlight()
+        endpoint = Endpoint()
+        assert await flights.do("/systems/X1-A", endpoint) == {"data": [1]}
+        assert await flights.do("/systems/X1-A", endpoint) == {"data": [2]}
+        return flights
+
+    flights = asyncio.run(main())
+    assert flights.stats.sent == 2
+    assert flights.in_flight == {}
+
+
+def test_giving_up_does_not_cancel_the_others():
+    async def main() -> Dict:
+        flights = SingleFlight()
+        endpoint = Endpoint()
+        impatient = asyncio.create_task(flights.do("/systems/X1-A", endpoint))
+        patient = asyncio.create_task(flights.do("/systems/X1-A", endpoint))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == {"data": [1]}
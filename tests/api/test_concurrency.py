@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from src.api import concurrency
+from src.api.concurrency import LATENCY_WARMUP, AdaptiveLimit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(concurrency, "monotonic", lambda: now[0])
+    return now
+
+
+def busy(initial: int = 4) -> AdaptiveLimit:
+    limit = AdaptiveLimit(initial=initial)
+    # Using every slot, so healthy responses grow the limit
+    limit.in_flight = initial
+    return limit
+
+
+def test_grows_while_in_use(clock):
+    limit = busy()
+    for _ in range(4):
+        limit.record(0.1)
+    assert limit.limit == pytest.approx(5.0, abs=0.1)
+
+
+def test_does_not_grow_when_idle(clock):
+    limit = AdaptiveLimit(initial=4)
+    for _ in range(10):
+        limit.record(0.1)
+    assert limit.limit == 4.0
+
+
+def test_overload_cuts_once_per_round_trip(clock):
+    limit = busy(initial=16)
+    limit.record(None, overloaded=True)
+    limit.record(None, overloaded=True)
+    assert limit.limit == 8.0
+    clock[0] += 1
+    limit.record(None, overloaded=True)
+    assert limit.limit == 4.0
+    assert limit.stats.decreases == 2
+
+
+def test_never_below_minimum(clock):
+    limit = AdaptiveLimit(initial=2, minimum=1)
+    for _ in range(5):
+        clock[0] += 1
+        limit.record(None, overloaded=True)
+    assert limit.limit == 1.0
+
+
+def test_one_slow_response_is_jitter(clock):
+    limit = busy(initial=16)
+    for _ in range(LATENCY_WARMUP):
+        clock[0] += 1
+        limit.record(0.1)
+    grown = limit.limit
+    clock[0] += 1
+    limit.record(0.5)
+    assert limit.limit >= grown
+    assert limit.stats.decreases == 0
+
+
+def test_sustained_slow_down_cuts(clock):
+    limit = busy(initial=16)
+    for _ in range(LATENCY_WARMUP * 5):
+        clock[0] += 1
+        limit.record(0.1)
+    for _ in range(10):
+        clock[0] += 1
+        limit.record(0.4)
+    assert limit.stats.decreases >= 1
+
+
+def test_waiters_get_released_slots():
+    async def main() -> AdaptiveLimit:
+        limit = AdaptiveLimit(initial=1)
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert limit.queue_depth == 1
+        limit.release()
+        await waiter
+        return limit
+
+    limit = asyncio.run(main())
+    assert limit.in_flight == 1
+    assert limit.stats.queued == 1
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    async def main() -> AdaptiveLimit:
+        limit = AdaptiveLimit(initial=1)
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        # Given the slot and cancelled before it could run
+        limit.release()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return limit
+
+    limit = asyncio.run(main())
+    assert limit.in_flight == 0
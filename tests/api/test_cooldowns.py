@@ -0,0 +1,112 @@
+import asyncio
+from datetime import timedelta
+
+import httpx
+import pytest
+
+from src.api.cooldowns import CooldownRegistry, cooldown_ship
+from src.api.middleware import CooldownMiddleware
+from src.api.transport import ApiRequest, ApiResponse
+from src.support.datetime import ServerClock
+
+SHIP = "MOCK-1"
+
+
+def registry() -> CooldownRegistry:
+    clock = ServerClock()
+    # In step with the server, to the microsecond
+    clock.low = clock.high = 0.0
+    return CooldownRegistry(clock=clock)
+
+
+def cooldown(seconds: float) -> dict:
+    return {"shipSymbol": SHIP, "totalSeconds": 70, "remainingSeconds": seconds}
+
+
+def test_cooldown_ships():
+    assert cooldown_ship("POST", f"/my/ships/{SHIP}/extract") == SHIP
+    assert cooldown_ship("POST", f"/my/ships/{SHIP}/extract/survey") == SHIP
+    assert cooldown_ship("POST", f"/my/ships/{SHIP}/survey") == SHIP
+    assert cooldown_ship("POST", f"/my/ships/{SHIP}/navigate") is None
+    assert cooldown_ship("GET", f"/my/ships/{SHIP}/cooldown") is None
+
+
+def test_remaining_seconds():
+    cooldowns = registry()
+    cooldowns.record(cooldown(30))
+    assert cooldowns.remaining(SHIP) == pytest.approx(30, abs=0.1)
+    assert cooldowns.remaining("MOCK-2") == 0.0
+    assert cooldowns.cooling_down() == 1
+
+
+def test_expiration_wins():
+    cooldowns = registry()
+    expiration = cooldowns.clock.now() + timedelta(seconds=10)
+    cooldowns.record(dict(cooldown(30), expiration=expiration.isoformat()))
+    assert cooldowns.remaining(SHIP) == pytest.approx(10, abs=0.1)
+
+
+def test_ended_cooldowns_are_forgotten():
+    cooldowns = registry()
+    expiration = cooldowns.clock.now() - timedelta(seconds=1)
+    cooldowns.record(dict(cooldown(0), expiration=expiration.isoformat()))
+    assert cooldowns.remaining(SHIP) == 0.0
+    assert cooldowns.expirations == {}
+
+
+def test_clock_uncertainty_errs_late():
+    cooldowns = CooldownRegistry(clock=ServerClock())
+    cooldowns.record(cooldown(30))
+    # Not synced with the server yet, so half a second either way
+    assert cooldowns.remaining(SHIP) == pytest.approx(30.5, abs=0.1)
+
+
+def test_wait():
+    cooldowns = registry()
+    cooldowns.record(cooldown(0.05))
+    assert asyncio.run(cooldowns.wait(SHIP)) == pytest.approx(0.05, abs=0.02)
+    assert cooldowns.remaining(SHIP) == 0.0
+    assert asyncio.run(cooldowns.wait(SHIP)) == 0.0
+
+
+def test_learned_from_actions_and_refusals():
+    cooldowns = registry()
+    middleware = CooldownMiddleware(cooldowns)
+    request = ApiRequest("POST", f"/my/ships/{SHIP}/extract")
+    extracted = {"data": {"cooldown": cooldown(70), "extraction": {}}}
+    middleware.after(request, ApiResponse(status_code=201, body=extracted))
+    assert cooldowns.remaining(SHIP) == pytest.approx(70, abs=0.1)
+    refused = {"error": {"code": 4000, "data": {"cooldown": cooldown(20)}}}
+    middleware.after(request, ApiResponse(status_code=409, body=refused))
+    assert cooldowns.remaining(SHIP) == pytest.approx(20, abs=0.1)
+    assert cooldowns.stats.recorded == 2
+
+
+def test_learned_from_the_cooldown_endpoint():
+    cooldowns = registry()
+    request = ApiRequest("GET", f"/my/ships/{SHIP}/cooldown")
+    response = ApiResponse(status_code=200, body={"data": cooldown(15)})
+    CooldownMiddleware(cooldowns).after(request, response)
+    assert cooldowns.remaining(SHIP) == pytest.approx(15, abs=0.1)
+
+
+def test_requests_are_held_until_ready():
+    cooldowns = registry()
+    cooldowns.record(cooldown(0.05))
+    middleware = CooldownMiddleware(cooldowns)
+    asyncio.run(middleware.acquire(ApiRequest("POST", f"/my/ships/{SHIP}/survey")))
+    assert cooldowns.stats.held == 1
+    assert cooldowns.stats.held_seconds == pytest.approx(0.05, abs=0.02)
+    # Nothing to wait for on other requests
+    asyncio.run(middleware.acquire(ApiRequest("POST", f"/my/ships/{SHIP}/dock")))
+    assert cooldowns.stats.held == 1
+
+
+def test_no_content_is_no_cooldown():
+    cooldowns = registry()
+    request = ApiRequest("GET", f"/my/ships/{SHIP}/cooldown")
+    response = ApiResponse.build(httpx.Response(204))
+    CooldownMiddleware(cooldowns).after(request, response)
+    assert response.result() == {}
+    assert cooldowns.stats.recorded == 0
+    assert cooldowns.remaining(SHIP) == 0.0
@@ -0,0 +1,58 @@
+import multiprocessing
+from multiprocessing.queues import Queue
+from typing import Any
+
+import pytest
+
+from src.api.limiter import SharedTokenBucket
+
+# The same context the sharded fleet starts its workers with
+context = multiprocessing.get_context("spawn")
+
+
+def take(bucket: SharedTokenBucket, tokens: int, results: Queue) -> None:
+    waits = [bucket.reserve() for _ in range(tokens)]
+    results.put((waits, bucket.stats.requests))
+
+
+def learn(bucket: SharedTokenBucket, results: Queue) -> None:
+    bucket.update_from_headers(
+        {"x-ratelimit-limit-per-second": "4", "x-ratelimit-limit-burst": "5"}
+    )
+    results.put(None)
+
+
+def in_another_process(target, *args) -> Any:
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    result = results.get(timeout=30)
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    return result
+
+
+def shared() -> SharedTokenBucket:
+    # Slow enough that the bucket doesn't refill while a process starts
+    return SharedTokenBucket(rate=0.01, burst=10, context=context)
+
+
+def test_tokens_are_shared_between_processes():
+    bucket = shared()
+    for _ in range(4):
+        bucket.reserve()
+    waits, requests = in_another_process(take, bucket, 8)
+    # Only 6 of the 10 were left, the other two wait their turn
+    assert waits[:6] == [0.0] * 6
+    assert waits[6:] == pytest.approx([100, 200], rel=0.1)
+    assert bucket.available() == pytest.approx(-2, abs=0.1)
+    # Each process counts its own requests
+    assert requests == 8
+    assert bucket.stats.requests == 4
+
+
+def test_headers_are_shared_between_processes():
+    bucket = shared()
+    in_another_process(learn, bucket)
+    assert bucket.rate == 4
+    assert bucket.burst == 5
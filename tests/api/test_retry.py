@@ -0,0 +1,103 @@
+from time import monotonic
+
+import pytest
+
+from src.api import retry
+from src.api.retry import CircuitState, RetryEngine, RetryPolicy
+
+
+class Clock:
+    # Starts at the real time, which RetryAttempt.started_at still uses
+    def __init__(self) -> None:
+        self.now = monotonic()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(retry, "monotonic", clock)
+    return clock
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+    for attempt in range(1, 10):
+        assert 0 <= policy.backoff(attempt) <= min(4.0, 2 ** (attempt - 1))
+
+
+def test_gives_up_after_max_attempts(clock):
+    engine = RetryEngine(policy=RetryPolicy(max_attempts=3))
+    attempt = engine.begin()
+    assert attempt.failed(delay=1.0) == 1.0
+    assert attempt.failed(delay=1.0) == 1.0
+    assert attempt.failed(delay=1.0) is None
+    assert engine.stats.retries == 2
+    assert engine.stats.gave_up == 1
+
+
+def test_gives_up_past_the_deadline(clock):
+    engine = RetryEngine(policy=RetryPolicy(deadline=10.0))
+    attempt = engine.begin()
+    clock.now += 8
+    assert attempt.failed(delay=1.0) == 1.0
+    assert attempt.failed(delay=5.0) is None
+
+
+def test_circuit_opens_after_outages_in_a_row(clock):
+    engine = RetryEngine(failure_threshold=3, reset_timeout=15.0)
+    attempt = engine.begin()
+    for _ in range(2):
+        attempt.failed(outage=True)
+    assert engine.state == CircuitState.CLOSED
+    # Failures that are not outages do not count
+    attempt.failed()
+    assert engine.state == CircuitState.CLOSED
+    attempt.failed(outage=True)
+    assert engine.state == CircuitState.OPEN
+    assert engine.circuit_wait() == pytest.approx(15.0)
+
+
+def test_success_resets_the_failure_count(clock):
+    engine = RetryEngine(failure_threshold=2)
+    engine.record_failure()
+    engine.record_success()
+    engine.record_failure()
+    assert engine.state == CircuitState.CLOSED
+
+
+def test_one_probe_when_half_open(clock):
+    engine = RetryEngine(failure_threshold=1, reset_timeout=15.0)
+    engine.record_failure()
+    clock.now += 15
+    assert engine.circuit_wait() == 0.0
+    assert engine.state == CircuitState.HALF_OPEN
+    # Everyone else waits for the probe
+    assert engine.circuit_wait() > 0
+    engine.record_success()
+    assert engine.state == CircuitState.CLOSED
+    assert engine.circuit_wait() == 0.0
+    assert engine.stats.open_seconds == pytest.approx(15.0)
+
+
+def test_failed_probe_opens_again(clock):
+    engine = RetryEngine(failure_threshold=1, reset_timeout=15.0)
+    engine.record_failure()
+    clock.now += 15
+    engine.circuit_wait()
+    engine.record_failure()
+    assert engine.state == CircuitState.OPEN
+    assert engine.circuit_wait() == pytest.approx(15.0)
+    assert engine.stats.circuit_opened == 1
+
+
+def test_lost_probe_is_replaced(clock):
+    engine = RetryEngine(failure_threshold=1, reset_timeout=15.0)
+    engine.record_failure()
+    clock.now += 15
+    engine.circuit_wait()
+    # The probe was cancelled and never reported back
+    clock.now += 16
+    assert engine.circuit_wait() == 0.0
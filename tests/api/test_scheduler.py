@@ -0,0 +1,87 @@
+import asyncio
+from typing import List
+
+from src.api import limiter
+from src.api.limiter import TokenBucket
+from src.api.scheduler import Priority, RequestScheduler
+
+
+def scheduler() -> RequestScheduler:
+    # Enough tokens that nobody waits on the limiter, only on each other
+    return RequestScheduler(TokenBucket(rate=1000, burst=1000))
+
+
+async def send(
+    requests: RequestScheduler, priority: Priority, order: List[Priority]
+) -> None:
+    await requests.acquire(priority)
+    order.append(priority)
+
+
+def test_weighted_round_robin():
+    async def main() -> List[Priority]:
+        requests = scheduler()
+        order: List[Priority] = []
+        await asyncio.gather(
+            *[send(requests, Priority.BULK, order) for _ in range(10)],
+            *[send(requests, Priority.SHIP_ACTION, order) for _ in range(10)],
+        )
+        return order
+
+    order = asyncio.run(main())
+    # Bulk calls queued first, but ship actions get 6 tokens in each round
+    assert order[:7] == [Priority.SHIP_ACTION] * 6 + [Priority.BULK]
+    assert order.count(Priority.BULK) == 10
+
+
+def test_no_class_is_starved():
+    async def main() -> List[Priority]:
+        requests = scheduler()
+        order: List[Priority] = []
+        await asyncio.gather(
+            *[send(requests, p, order) for p in Priority for _ in range(20)]
+        )
+        return order
+
+    order = asyncio.run(main())
+    assert Priority.BULK in order[:10]
+    assert Priority.MARKET in order[:10]
+
+
+def test_cancelled_waiter_is_skipped():
+    async def main() -> RequestScheduler:
+        requests = scheduler()
+        order: List[Priority] = []
+        cancelled = asyncio.create_task(send(requests, Priority.SHIP_ACTION, order))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await send(requests, Priority.BULK, order)
+        assert order == [Priority.BULK]
+        return requests
+
+    requests = asyncio.run(main())
+    assert requests.stats[Priority.SHIP_ACTION].dispatched == 0
+    assert requests.stats[Priority.BULK].dispatched == 1
+    assert requests.queue_depth(Priority.SHIP_ACTION) == 0
+
+
+def test_unused_token_is_given_back(monkeypatch):
+    # Time stands still for the bucket, so only a refund can add a token
+    monkeypatch.setattr(limiter, "monotonic", lambda: 1000.0)
+
+    async def main() -> TokenBucket:
+        bucket = TokenBucket(rate=100, burst=1)
+        requests = RequestScheduler(bucket)
+        bucket.reserve()
+        cancelled = asyncio.create_task(requests.acquire(Priority.BULK))
+        # One step to queue up, one for the dispatcher to start
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        # The dispatcher has reserved a token and is waiting to hand it out
+        cancelled.cancel()
+        await asyncio.sleep(0.05)
+        return bucket
+
+    bucket = asyncio.run(main())
+    assert bucket.available() == 0.0
+    assert bucket.stats.requests == 1
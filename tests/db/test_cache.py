@@ -0,0 +1,58 @@
+from sqlalchemy.dialects import postgresql
+
+from src.db.cache import CHANNEL, ObjectCache
+
+SYSTEM = "X1-DF55"
+WAYPOINT = f"{SYSTEM}-20250Z"
+
+
+def test_hits_and_misses():
+    cache = ObjectCache(max_entries=10, notify=False)
+    assert cache.get("waypoint", WAYPOINT) is None
+    cache.set("waypoint", WAYPOINT, {"symbol": WAYPOINT})
+    assert cache.get("waypoint", WAYPOINT) == {"symbol": WAYPOINT}
+    # Kinds don't share symbols
+    assert cache.get("market", WAYPOINT) is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+
+
+def test_callers_get_their_own_copy():
+    cache = ObjectCache(max_entries=10, notify=False)
+    value = {"symbol": WAYPOINT, "traits": []}
+    cache.set("waypoint", WAYPOINT, value)
+    value["traits"].append("MARKETPLACE")
+    cache.get("waypoint", WAYPOINT)["traits"].append("SHIPYARD")
+    assert cache.get("waypoint", WAYPOINT) == {"symbol": WAYPOINT, "traits": []}
+
+
+def test_least_recently_used_is_evicted():
+    cache = ObjectCache(max_entries=2, notify=False)
+    cache.set("system", "X1-A", 1)
+    cache.set("system", "X1-B", 2)
+    cache.get("system", "X1-A")
+    cache.set("system", "X1-C", 3)
+    assert cache.get("system", "X1-B") is None
+    assert cache.get("system", "X1-A") == 1
+    assert cache.get("system", "X1-C") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_invalidation():
+    cache = ObjectCache(max_entries=10, notify=False)
+    cache.set("waypoint", WAYPOINT, {"symbol": WAYPOINT})
+    cache.delete("waypoint", WAYPOINT)
+    # Nothing there to invalidate
+    cache.delete("waypoint", WAYPOINT)
+    assert cache.get("waypoint", WAYPOINT) is None
+    assert cache.stats.invalidations == 1
+
+
+def test_notifications():
+    assert ObjectCache(max_entries=10, notify=False).notifications("x", "y") == []
+    cache = ObjectCache(max_entries=10, notify=True)
+    [statement] = cache.notifications("waypoint", WAYPOINT)
+    sql = statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    assert f"pg_notify('{CHANNEL}', 'waypoint:{WAYPOINT}')" in str(sql)
@@ -0,0 +1,168 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, List
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.db import writer
+from src.db.models.waypoints import WaypointModel
+from src.db.writer import WriteBehind, upsert
+
+
+class Database:
+    """
+    Stands in for an async session, keeping what it was asked to upsert.
+    """
+
+    def __init__(self, delay: float = 0.0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.written: List[Any] = []
+
+    async def execute(self, statement: Any) -> None:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("database went away")
+        self.written.append(statement)
+
+    async def commit(self) -> None:
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch) -> Database:
+    database = Database()
+
+    @asynccontextmanager
+    async def get_async_db():
+        yield database
+
+    monkeypatch.setattr(writer, "get_async_db", get_async_db)
+    # What would be upserted, rather than the statement
+    monkeypatch.setattr(
+        writer, "upsert", lambda model, rows, keep: (model, rows, tuple(keep))
+    )
+    return database
+
+
+def waypoint(symbol: str, x: int = 0) -> WaypointModel:
+    return WaypointModel(
+        systemSymbol="X1-AB12",
+        symbol=symbol,
+        traits=[],
+        orbitals=[],
+        type="PLANET",
+        x=x,
+        y=0,
+        faction={},
+        chart={},
+    )
+
+
+def test_upsert_keeps_columns():
+    sql = str(
+        upsert(
+            WaypointModel, [writer.row_values(waypoint("A"))], keep=["mapped"]
+        ).compile(dialect=postgresql.dialect())
+    )
+    assert "ON CONFLICT (symbol) DO UPDATE" in sql
+    assert "x = excluded.x" in sql
+    assert "mapped = excluded.mapped" not in sql
+
+
+def test_batches_and_merges(database):
+    async def main() -> WriteBehind:
+        queue = WriteBehind(batch_size=100, interval=60, max_pending=100)
+        await queue.put(waypoint("A", x=1), keep=["mapped"])
+        await queue.put(waypoint("B"), keep=["mapped"])
+        await queue.put(waypoint("A", x=2), keep=["mapped"])
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(main())
+    [(model, rows, keep)] = database.written
+    assert model is WaypointModel
+    assert keep == ("mapped",)
+    # The last one queued for a key wins
+    assert sorted((r["symbol"], r["x"]) for r in rows) == [("A", 2), ("B", 0)]
+    assert queue.stats.merged == 1
+    assert queue.stats.rows == 2
+    assert not queue.pending
+
+
+def test_writes_once_batch_is_full(database):
+    async def main() -> None:
+        queue = WriteBehind(batch_size=2, interval=60, max_pending=100)
+        await queue.put(waypoint("A"))
+        await queue.put(waypoint("B"))
+        await asyncio.sleep(0.01)
+        assert len(database.written) == 1
+        await queue.close()
+
+    asyncio.run(main())
+
+
+def test_waits_when_full(database):
+    async def main() -> WriteBehind:
+        queue = WriteBehind(batch_size=100, interval=60, max_pending=2)
+        for symbol in "ABC":
+            await queue.put(waypoint(symbol))
+        # The third had to wait for the first two to be written
+        assert len(database.written) == 1
+        assert len(queue.pending) == 1
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(main())
+    assert queue.stats.rows == 3
+
+
+def test_close_lets_the_write_in_progress_finish(database):
+    database.delay = 0.05
+
+    async def main() -> WriteBehind:
+        queue = WriteBehind(batch_size=1, interval=60, max_pending=100)
+        await queue.put(waypoint("A"))
+        # The loop has taken the batch and is part way through writing it
+        await asyncio.sleep(0.01)
+        assert not queue.pending
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(main())
+    assert queue.stats.rows == 1
+    assert len(database.written) == 1
+
+
+def test_cancelled_flush_queues_the_batch_again(database):
+    database.delay = 0.05
+
+    async def main() -> WriteBehind:
+        queue = WriteBehind(batch_size=100, interval=60, max_pending=100)
+        await queue.put(waypoint("A"))
+        flush = asyncio.create_task(queue.flush())
+        await asyncio.sleep(0.01)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        assert len(queue.pending) == 1
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(main())
+    assert queue.stats.rows == 1
+
+
+def test_failed_batch_is_counted(database):
+    database.fail = True
+
+    async def main() -> WriteBehind:
+        queue = WriteBehind(batch_size=100, interval=60, max_pending=100)
+        await queue.put(waypoint("A"))
+        await queue.put(waypoint("B"))
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(main())
+    assert queue.stats.failed == 2
+    assert queue.stats.rows == 0
@@ -0,0 +1,77 @@
+import asyncio
+from typing import List, Union
+
+import pytest
+
+from src.logic import reaper
+from src.logic.reaper import SurveyReaper
+
+
+class Surveys:
+    """
+    Stands in for the survey table: each reap deletes the next count in
+    `expired`, or raises it.
+    """
+
+    def __init__(self, expired: List[Union[int, Exception]], live: int) -> None:
+        self.expired = expired
+        self.live = live
+
+    async def drop_expired(self) -> int:
+        reaped = self.expired.pop(0) if self.expired else 0
+        if isinstance(reaped, Exception):
+            raise reaped
+        return reaped
+
+    async def count(self) -> int:
+        return self.live
+
+
+@pytest.fixture
+def surveys(monkeypatch) -> Surveys:
+    surveys = Surveys(expired=[], live=12)
+    monkeypatch.setattr(reaper.Survey, "async_drop_expired", surveys.drop_expired)
+    monkeypatch.setattr(reaper.Survey, "async_count", surveys.count)
+    return surveys
+
+
+def test_reap(surveys):
+    surveys.expired = [3, 0]
+    survey_reaper = SurveyReaper(interval=60)
+    assert asyncio.run(survey_reaper.reap()) == 3
+    assert asyncio.run(survey_reaper.reap()) == 0
+    assert survey_reaper.stats.runs == 2
+    assert survey_reaper.stats.reaped == 3
+    assert survey_reaper.stats.last_reaped == 0
+    assert survey_reaper.stats.live == 12
+
+
+def test_keeps_reaping_after_an_error(surveys):
+    surveys.expired = [ConnectionError("database went away"), 2]
+
+    async def main() -> SurveyReaper:
+        survey_reaper = SurveyReaper(interval=0.01)
+        survey_reaper.start()
+        async with asyncio.timeout(5):
+            while not survey_reaper.stats.runs:
+                await asyncio.sleep(0.01)
+        assert survey_reaper._task is not None
+        survey_reaper._task.cancel()
+        return survey_reaper
+
+    survey_reaper = asyncio.run(main())
+    assert survey_reaper.stats.errors == 1
+    assert survey_reaper.stats.reaped == 2
+
+
+def test_started_once(surveys):
+    async def main() -> None:
+        survey_reaper = SurveyReaper(interval=60)
+        survey_reaper.start()
+        task = survey_reaper._task
+        survey_reaper.start()
+        assert survey_reaper._task is task
+        assert task is not None
+        task.cancel()
+
+    asyncio.run(main())
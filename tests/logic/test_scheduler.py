@@ -0,0 +1,129 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+
+from src.logic import scheduler
+from src.logic.scheduler import FleetScheduler, ShipJob
+
+
+class CountdownJob(ShipJob):
+    # Steps `steps` times, `delay` seconds apart, noting when it ran
+    def __init__(self, symbol: str, steps: int, delay: float, log: List[str]):
+        self.ship_symbol = symbol
+        self.state = "start"
+        self.steps = steps
+        self.delay = delay
+        self.log = log
+
+    async def on_start(self) -> Optional[float]:
+        self.log.append(self.ship_symbol)
+        self.steps -= 1
+        return self.delay if self.steps else None
+
+
+class FailingJob(ShipJob):
+    # Raises in `work` `failures` times before finishing
+    def __init__(self, failures: int) -> None:
+        self.ship_symbol = "MOCK-1"
+        self.state = "start"
+        self.failures = failures
+        self.states: List[str] = []
+
+    async def on_start(self) -> Optional[float]:
+        self.states.append(self.state)
+        return self.goto("work")
+
+    async def on_work(self) -> Optional[float]:
+        self.states.append(self.state)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("the API said no")
+        return None
+
+
+def delays(fleet: FleetScheduler) -> List[float]:
+    # The delay every job is put back in the heap with
+    scheduled: List[float] = []
+    schedule = fleet._schedule
+
+    def record(job: ShipJob, delay: float) -> None:
+        scheduled.append(delay)
+        schedule(job, delay)
+
+    fleet._schedule = record  # type: ignore[method-assign]
+    return scheduled
+
+
+def test_jobs_run_when_due():
+    log: List[str] = []
+    fleet = FleetScheduler(workers=2)
+    fleet.add(CountdownJob("MOCK-3", 1, 0, log), delay=0.03)
+    fleet.add(CountdownJob("MOCK-1", 1, 0, log), delay=0.01)
+    fleet.add(CountdownJob("MOCK-2", 1, 0, log), delay=0.02)
+    asyncio.run(fleet.run())
+    assert log == ["MOCK-1", "MOCK-2", "MOCK-3"]
+    assert fleet.stats.steps == 3
+
+
+def test_ships_wait_between_steps():
+    log: List[str] = []
+    fleet = FleetScheduler(workers=1)
+    fleet.add(CountdownJob("SLOW", 2, 0.05, log))
+    fleet.add(CountdownJob("FAST", 3, 0.01, log))
+    asyncio.run(fleet.run())
+    # One worker, but nobody waits behind a ship that is waiting itself
+    assert log == ["SLOW", "FAST", "FAST", "FAST", "SLOW"]
+
+
+def test_finished_jobs_leave():
+    finished: List[ShipJob] = []
+    fleet = FleetScheduler(workers=4, on_finished=finished.append)
+    job = CountdownJob("MOCK-1", 2, 0.01, [])
+    fleet.add(job)
+    asyncio.run(fleet.run())
+    assert finished == [job]
+    assert fleet.jobs == {}
+    assert fleet.stats.finished == 1
+
+
+def test_removed_jobs_stop():
+    log: List[str] = []
+    fleet = FleetScheduler(workers=1)
+
+    async def main() -> None:
+        fleet.add(CountdownJob("MOCK-1", 100, 0.01, log))
+        running = asyncio.create_task(fleet.run())
+        await asyncio.sleep(0.035)
+        fleet.remove("MOCK-1")
+        await asyncio.wait_for(running, 1)
+
+    asyncio.run(main())
+    assert 1 < len(log) < 10
+    assert fleet.states() == {}
+
+
+def test_errors_back_off_and_start_over(monkeypatch):
+    monkeypatch.setattr(scheduler, "ERROR_BACKOFF", 0.01)
+    fleet = FleetScheduler(workers=1)
+    scheduled = delays(fleet)
+    job = FailingJob(failures=3)
+    fleet.add(job)
+    asyncio.run(fleet.run())
+    assert job.states == ["start", "work"] * 4
+    # Added, then start and a failed work step with a backoff that
+    # doubles every time, starting over doesn't count as getting better
+    expected = [0.0] + [0.0, 0.01, 0.0, 0.02, 0.0, 0.04] + [0.0]
+    assert scheduled == pytest.approx(expected)
+    assert fleet.stats.errors == 3
+    assert fleet.stats.finished == 1
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(scheduler, "ERROR_BACKOFF", 0.01)
+    monkeypatch.setattr(scheduler, "MAX_ERROR_BACKOFF", 0.02)
+    fleet = FleetScheduler(workers=1)
+    scheduled = delays(fleet)
+    fleet.add(FailingJob(failures=4))
+    asyncio.run(fleet.run())
+    assert max(scheduled) == pytest.approx(0.02)
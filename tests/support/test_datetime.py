@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.support.datetime import ServerClock
+
+EPOCH = datetime(2023, 7, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def at(seconds: float) -> float:
+    return EPOCH.timestamp() + seconds
+
+
+def test_unknown_until_observed():
+    clock = ServerClock()
+    assert clock.offset == 0.0
+    assert clock.uncertainty == 0.5
+
+
+def test_window_narrows():
+    clock = ServerClock()
+    # Server 10s ahead: it stamped 12:00:10 while we were around 12:00:00
+    clock.observe(EPOCH + timedelta(seconds=10), sent=at(-0.2), received=at(0.2))
+    assert clock.low == pytest.approx(9.8)
+    assert clock.high == pytest.approx(11.2)
+    clock.observe(EPOCH + timedelta(seconds=11), sent=at(0.9), received=at(1.1))
+    assert clock.low == pytest.approx(9.9)
+    assert clock.high == pytest.approx(11.1)
+    assert clock.offset == pytest.approx(10.5)
+    assert clock.uncertainty == pytest.approx(0.6)
+
+
+def test_jump_starts_over():
+    clock = ServerClock()
+    clock.observe(EPOCH, sent=at(0), received=at(0.1))
+    clock.observe(EPOCH + timedelta(seconds=60), sent=at(1), received=at(1.1))
+    assert clock.offset == pytest.approx(59.45)
+
+
+def test_seconds_until_uses_the_offset():
+    clock = ServerClock()
+    now = datetime.now(tz=timezone.utc)
+    clock.observe(
+        now + timedelta(seconds=30), sent=now.timestamp(), received=now.timestamp()
+    )
+    arrival = now + timedelta(seconds=60)
+    # The header's whole seconds put the server 30 to 31 seconds ahead
+    assert clock.seconds_until(arrival) == pytest.approx(29.5, abs=0.2)